@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+⏱️ Benchmark - fade-moottorin ja muuntimien suorituskykymittaukset
+
+Mittaa samat polut joita palvelin ja Blender-integraatio ajavat:
+
+- fade/...     create_fade_midi steps × kanavat × kesto -ruudukolla
+- preset/...   koko esityksen generointi esitykset.json:sta (generate, ei välimuistia)
+- convert/...  MIDI → keyframet: tiedoston luku, tick → frame ja RGBW-tilat
+               kuten midi_light_controller:n tuonti (vaatii mido + numpy)
+- rgbw/...     rgbw_mixing: sekoitus, purku ja tapahtumista tilat (vaatii numpy)
+
+Jokainen tapaus ajetaan kalibroidulla silmukalla (vähintään --min-time
+sekuntia per toisto) ja raportoidaan toistojen mediaani ja minimi.
+Tulokset tallennetaan JSONiin, ja jos perustaso (baseline) on olemassa,
+tapauksia verrataan siihen: yli --threshold hitaampi = regressio (exit 1).
+Perustaso on konekohtainen - tallenna se samalla koneella jolla vertaat.
+
+Käyttö:
+    python3 benchmark.py --save-baseline            # mittaa ja tallenna perustasoksi
+    python3 benchmark.py                            # mittaa ja vertaa perustasoon
+    python3 benchmark.py --filter fade/ --quick     # vain fade-tapaukset, nopeasti
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from scene_store import load_presets
+from valot_python_backend import create_fade_midi, generate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'blender-integration'))
+
+try:
+    import numpy as np
+    import rgbw_mixing
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import mido
+    MIDO_AVAILABLE = True
+except ImportError:
+    MIDO_AVAILABLE = False
+
+RESULTS_FORMAT = "benchmark-results"
+RESULTS_VERSION = 1
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PRESETS_FILE = os.path.join(SCRIPT_DIR, "esitykset.json")
+DEFAULT_OUTPUT = os.path.join(SCRIPT_DIR, "benchmark_results.json")
+DEFAULT_BASELINE = os.path.join(SCRIPT_DIR, "benchmark_baseline.json")
+
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.05       # s per toisto (silmukka kalibroidaan tähän)
+DEFAULT_THRESHOLD = 0.15      # +15 % mediaanissa = regressio
+
+# create_fade_midi -ruudukko
+FADE_STEPS = (10, 20, 50)
+FADE_CHANNELS = (8, 24, 58)
+FADE_DURATIONS = (1.0, 5.0, 30.0)
+
+# MIDI → keyframe: kanavat 1-40, joista kaksi RGBW-valoa kuten riggissä
+CONVERT_FPS = 24
+CONVERT_LIGHTS = ("RGBW 33-36", "RGBW 37-40")
+CONVERT_STEPS = (20, 50)
+
+# RGBW-taulukot: valot × framet
+RGBW_SHAPES = ((10, 250), (40, 1000))
+
+
+def measure(func, repeat=DEFAULT_REPEAT, min_time=DEFAULT_MIN_TIME):
+    """Ajaa funktion kalibroidulla silmukalla, palauttaa ajat (ms per kutsu)"""
+    def run(loops):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - start
+
+    loops = 1
+    while True:
+        elapsed = run(loops)
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()   # Kuten timeit: roskienkeruu ei satunnaisesti osu mittaukseen
+    try:
+        samples = [run(loops) / loops * 1000.0 for _ in range(repeat)]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return {
+        'median_ms': statistics.median(samples),
+        'min_ms': min(samples),
+        'loops': loops,
+        'repeats': repeat
+    }
+
+
+def fade_cases(workdir):
+    """create_fade_midi steps × kanavat × kesto"""
+    path = os.path.join(workdir, 'bench_fade.mid')
+    for steps in FADE_STEPS:
+        for channels in FADE_CHANNELS:
+            for duration in FADE_DURATIONS:
+                notes = [69 + channel for channel in range(1, channels + 1)]
+                velocities = [(channel * 37) % 127 + 1 for channel in range(1, channels + 1)]
+                params = {'steps': steps, 'channels': channels, 'duration': duration}
+                yield (f"fade/steps={steps},channels={channels},duration={duration:g}", params,
+                       lambda n=notes, v=velocities, d=duration, s=steps: create_fade_midi(path, n, v, d, True, s))
+
+
+def preset_cases(workdir, presets_file):
+    """Koko esityksen generointi (fade-in/out + crossfadet) ilman välimuistia"""
+    for index, preset in enumerate(load_presets(presets_file)):
+        if not preset.get('scenes'):
+            continue
+        data = dict(preset, outputDir=os.path.join(workdir, f'preset_{index}'))
+        data.pop('fade_cache_dir', None)
+        channels = len({channel for scene in preset['scenes'] for channel in scene.get('channels', {})})
+        params = {'scenes': len(preset['scenes']), 'channels': channels}
+        yield f"preset/{preset.get('name', index)}", params, lambda d=data: generate(d)
+
+
+def midi_keyframes(path, fps, rgbw_lights):
+    """
+    MIDI → keyframe-arvot kuten midi_light_controller:n tuonti ilman Blenderiä
+
+    Palauttaa {kanava: [(frame, velocity)]} tavallisille kanaville ja
+    {valo: (frames, rgb, intensity)} RGBW-valoille.
+    """
+    midi = mido.MidiFile(path)
+    ticks, channels, velocities = [], [], []
+    for track in midi.tracks:
+        track_time = 0
+        for msg in track:
+            track_time += msg.time
+            if msg.type == 'note_on':
+                ticks.append(track_time)
+                channels.append(msg.note - 69)
+                velocities.append(msg.velocity)
+
+    frames = (np.asarray(ticks, dtype=np.float64) / midi.ticks_per_beat * fps * 0.5).astype(np.int64)
+    channels = np.asarray(channels, dtype=np.int64)
+    velocities = np.asarray(velocities, dtype=np.int64)
+
+    rgbw = {}
+    grouped = np.zeros(len(channels), dtype=bool)
+    for light in rgbw_lights:
+        group = rgbw_mixing.get_rgbw_channels(light)
+        mask = np.isin(channels, group)
+        grouped |= mask
+        components = np.searchsorted(group, channels[mask])
+        states = rgbw_mixing.rgbw_states_from_events(components, velocities[mask])
+        rgb, intensity = rgbw_mixing.mix_rgbw_to_rgb(states)
+        rgbw[light] = (frames[mask], rgb, intensity)
+
+    plain = {}
+    for frame, channel, velocity in zip(frames[~grouped].tolist(), channels[~grouped].tolist(),
+                                        velocities[~grouped].tolist()):
+        plain.setdefault(channel, []).append((frame, velocity))
+    return plain, rgbw
+
+
+def convert_cases(workdir):
+    """MIDI → keyframet 40 kanavan fade-tiedostosta"""
+    notes = [69 + channel for channel in range(1, 41)]
+    velocities = [(channel * 53) % 127 + 1 for channel in range(1, 41)]
+    for steps in CONVERT_STEPS:
+        path = os.path.join(workdir, f'bench_convert_{steps}.mid')
+        create_fade_midi(path, notes, velocities, 5.0, True, steps)
+        params = {'channels': len(notes), 'steps': steps, 'fps': CONVERT_FPS}
+        yield (f"convert/channels={len(notes)},steps={steps}", params,
+               lambda p=path: midi_keyframes(p, CONVERT_FPS, CONVERT_LIGHTS))
+
+
+def rgbw_cases():
+    """Sekoitus (tuonti), purku (vienti) ja tapahtumista tilat"""
+    rng = np.random.default_rng(0)
+    for lights, frames in RGBW_SHAPES:
+        params = {'lights': lights, 'frames': frames}
+        states = rng.integers(0, 128, size=(lights, frames, 4))
+        colors = rng.random((lights, frames, 3))
+        intensity = rng.random((lights, frames))
+        components = rng.integers(0, 4, size=lights * frames)
+        velocities = rng.integers(0, 128, size=lights * frames)
+
+        yield f"rgbw/mix/lights={lights},frames={frames}", params, lambda s=states: rgbw_mixing.mix_rgbw_to_rgb(s)
+        yield (f"rgbw/decompose/lights={lights},frames={frames}", params,
+               lambda c=colors, i=intensity: rgbw_mixing.levels_to_velocities(
+                   rgbw_mixing.decompose_rgb_to_rgbw(c, i, 0.6)))
+        yield (f"rgbw/states/events={lights * frames}", {'events': lights * frames},
+               lambda c=components, v=velocities: rgbw_mixing.rgbw_states_from_events(c, v))
+
+
+def run_benchmarks(presets_file=DEFAULT_PRESETS_FILE, pattern=None, repeat=DEFAULT_REPEAT,
+                   min_time=DEFAULT_MIN_TIME):
+    """Ajaa kaikki (suodatetut) tapaukset, palauttaa tulossanakirjan"""
+    workdir = tempfile.mkdtemp(prefix='benchmark_')
+    skipped = []
+    try:
+        groups = [fade_cases(workdir), preset_cases(workdir, presets_file)]
+        if NUMPY_AVAILABLE and MIDO_AVAILABLE:
+            groups.append(convert_cases(workdir))
+        else:
+            skipped.append('convert (mido + numpy)')
+        if NUMPY_AVAILABLE:
+            groups.append(rgbw_cases())
+        else:
+            skipped.append('rgbw (numpy)')
+
+        cases = {}
+        for group in groups:
+            for name, params, func in group:
+                if pattern and pattern not in name:
+                    continue
+                result = measure(func, repeat, min_time)
+                result['params'] = params
+                cases[name] = result
+                print(f"⏱️  {name:<48} {result['median_ms']:>10.3f} ms  (min {result['min_ms']:.3f}, "
+                      f"{result['loops']}×{result['repeats']})")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    for name in skipped:
+        print(f"⚠️  Ohitettu: {name} puuttuu")
+
+    return {
+        'format': RESULTS_FORMAT,
+        'version': RESULTS_VERSION,
+        'created_at': datetime.datetime.now().isoformat(),
+        'machine': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__ if NUMPY_AVAILABLE else None
+        },
+        'settings': {'repeat': repeat, 'min_time': min_time},
+        'cases': cases
+    }
+
+
+def compare_results(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Vertaa mediaaneja perustasoon
+
+    Palauttaa listan {"case", "baseline_ms", "current_ms", "ratio", "status"},
+    status: "regression" (> 1 + threshold), "improvement" (< 1 - threshold),
+    "same", "new" (ei perustasossa).
+    """
+    rows = []
+    for name, result in current['cases'].items():
+        before = baseline['cases'].get(name)
+        if before is None:
+            rows.append({'case': name, 'baseline_ms': None, 'current_ms': result['median_ms'],
+                         'ratio': None, 'status': 'new'})
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] > 0 else 1.0
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 - threshold:
+            status = 'improvement'
+        else:
+            status = 'same'
+        rows.append({'case': name, 'baseline_ms': before['median_ms'], 'current_ms': result['median_ms'],
+                     'ratio': ratio, 'status': status})
+    return rows
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('format') != RESULTS_FORMAT:
+        raise ValueError(f"{path} ei ole benchmark-tulostiedosto")
+    return data
+
+
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fade-moottorin ja muuntimien suorituskykymittaukset")
+    parser.add_argument('--presets', default=DEFAULT_PRESETS_FILE, help="Esitystiedosto preset-tapauksille")
+    parser.add_argument('--filter', help="Aja vain tapaukset joiden nimessä on tämä (esim. fade/ tai rgbw/mix)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME, help="Sekuntia per toisto")
+    parser.add_argument('--quick', action='store_true', help="3 toistoa, 0.01 s - suuntaa-antava")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help="Tulostiedosto (JSON)")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Perustaso vertailuun")
+    parser.add_argument('--save-baseline', action='store_true', help="Tallenna tulokset perustasoksi")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Sallittu hidastuminen (0.15 = 15 %%)")
+    args = parser.parse_args()
+
+    repeat, min_time = (3, 0.01) if args.quick else (args.repeat, args.min_time)
+    results = run_benchmarks(args.presets, args.filter, repeat, min_time)
+
+    save_results(args.output, results)
+    print(f"💾 Tulokset: {args.output} ({len(results['cases'])} tapausta)")
+
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print(f"📌 Perustaso tallennettu: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"ℹ️  Ei perustasoa ({args.baseline}) - tallenna: python3 benchmark.py --save-baseline")
+        return 0
+
+    baseline = load_results(args.baseline)
+    if baseline.get('machine') != results['machine']:
+        print("⚠️  Perustaso on mitattu eri koneella/ympäristössä - vertailu on suuntaa-antava")
+
+    rows = compare_results(results, baseline, args.threshold)
+    icons = {'regression': '🐢', 'improvement': '🚀', 'same': '✅', 'new': '🆕'}
+    print(f"\n{'':2} {'tapaus':<48} {'perustaso':>12} {'nyt':>12} {'muutos':>8}")
+    for row in rows:
+        before = f"{row['baseline_ms']:.3f} ms" if row['baseline_ms'] is not None else '-'
+        change = f"{(row['ratio'] - 1) * 100:+.0f} %" if row['ratio'] is not None else '-'
+        print(f"{icons[row['status']]} {row['case']:<48} {before:>12} {row['current_ms']:>9.3f} ms {change:>8}")
+
+    regressions = [row for row in rows if row['status'] == 'regression']
+    if regressions:
+        print(f"\n🐢 {len(regressions)} regressiota (yli {args.threshold * 100:.0f} % hitaampi)")
+        return 1
+    print(f"\n✅ Ei regressioita (raja {args.threshold * 100:.0f} %)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
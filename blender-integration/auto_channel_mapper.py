@@ -17,8 +17,12 @@ Esimerkkejä valojen nimistä:
 """
 
 import bpy
-import json
 import os
+import sys
+
+# Mappaus tallennetaan .blendin kanavamappaukseksi jota tuonti ja vienti lukevat
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import channel_map
 
 def create_channel_mapping():
     """Luo automaattinen channel-mappaus nykyisistä valoista"""
@@ -102,26 +106,23 @@ def create_channel_mapping():
     return channel_mapping, reverse_mapping
 
 def save_mapping_to_file(channel_mapping, reverse_mapping):
-    """Tallentaa mappingin JSON-tiedostoon"""
-    
-    output_path = "/Users/raulivirtanen/Documents/valot/light_channel_mapping.json"
-    
-    mapping_data = {
-        "description": "Automaattisesti generoitu Blender → Scene Setter channel mappaus",
-        "generated_from_blender": True,
-        "total_channels": len(channel_mapping),
-        "scene_setter_max": 40,
-        "channel_to_light": channel_mapping,
-        "light_to_channel": reverse_mapping,
-        "midi_notes": {
-            str(channel): channel + 69 for channel in channel_mapping.keys()
-        }
-    }
+    """
+    Tallentaa mappingin .blendin kanavamappaukseksi (<blend>.channels.json)
+
+    Tuonti ja vienti lukevat tiedoston kunnes valojen nimet muuttuvat.
+    """
+    
+    output_path = channel_map.channel_map_path()
+    if not output_path:
+        print("❌ Tallenna .blend-tiedosto ensin - mappaus tallennetaan sen viereen")
+        return None
     
     try:
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(mapping_data, f, indent=2, ensure_ascii=False)
+        channel_map.store_scene_map(
+            {light_name: [channel] for light_name, channel in reverse_mapping.items()},
+            source="auto_channel_mapper",
+            path=output_path
+        )
         
         print(f"\n💾 Mappaus tallennettu: {output_path}")
         return output_path
@@ -14,13 +14,29 @@ RGBW-ryhmäsi:
 - jne...
 
 Yksittäiset valot: nimeä numeroilla (esim. "21" = kanava 21)
+
+LIVE LINK (ei JSON-tiedostoja):
+    start_live_link()   # valojen muutokset → käynnissä oleva server.py
+    stop_live_link()
+Muutokset kootaan (debounce) ja palvelimelle lähetetään vain muuttuneet
+kanavat. Palvelin generoi kohtauksen MIDI:t heti uudelleen.
 """
 
 import bpy
 import json
 import os
+import sys
+import time
+import urllib.request
 from mathutils import Vector
 
+# Yhteinen vektoroitu RGBW-moduuli samasta hakemistosta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
+import rgbw_mixing
+import channel_map
+from fast_light_exporter import FastLightExporter
+
 # 🎛️ ASETUKSET (muokkaa tarpeen mukaan)
 OUTPUT_FILE = "/Users/raulivirtanen/Documents/valot/BlenderLive_Setup.json"
 SCENE_NAME = "BlenderLive"
@@ -28,6 +44,14 @@ DEFAULT_FADE_IN = 2.0    # Fade-in aika sekunteina
 DEFAULT_FADE_OUT = 3.0   # Fade-out aika sekunteina
 DEFAULT_STEPS = 20       # MIDI-portaiden määrä
 MAX_WATTAGE = 300        # Maksimi energia Blenderissä
+# MIDI-osoitus yli 40 kanavan riggeille (None = kanavat 1-40), esim.
+# {"mode": "banked", "midi_channels": 2} tai polku addressing.json:iin (midi_addressing.py)
+ADDRESSING = None
+
+# 🔗 LIVE LINK -asetukset
+LIVE_SERVER_URL = "http://localhost:8000"   # Käynnissä oleva server.py
+LIVE_DEBOUNCE_SECONDS = 0.15                 # Odota näin kauan viimeisestä muutoksesta
+LIVE_PLAY = False                            # True = palvelin soittaa muutoksen heti (live-tila)
 
 # 🌈 RGBW-mappings (sinun Scene Setter -järjestelmäsi)
 RGBW_GROUPS = {
@@ -80,25 +104,15 @@ def analyze_rgbw_color(color, energy):
     Jakaa RGB-värin + energian → RGBW-kanaviin
     Käyttää heuristiikkaa white-kanavan arvaamiseen
     """
-    r, g, b = color[:3]
-    
-    # Arvaa white-taso (konservatiivinen: pienin RGB-arvo * kerroin)
-    white_component = min(r, g, b) * 0.6
-    
-    # "Puhdas" RGB (vähennetään white)
-    pure_r = max(0.0, r - white_component)
-    pure_g = max(0.0, g - white_component) 
-    pure_b = max(0.0, b - white_component)
-    
-    # Skaalaa energian mukaan
-    energy_factor = min(1.0, energy / MAX_WATTAGE)
-    
-    return [
-        pure_r * energy_factor,       # R-kanava
-        pure_g * energy_factor,       # G-kanava
-        pure_b * energy_factor,       # B-kanava  
-        white_component * energy_factor  # W-kanava
-    ]
+    return analyze_rgbw_colors([color], [energy])[0].tolist()
+
+def analyze_rgbw_colors(colors, energies):
+    """
+    Jakaa useiden valojen RGB-värit + energiat → RGBW-tasoiksi kerralla (n, 4)
+    White-taso arvataan konservatiivisesti: pienin RGB-arvo * 0.6
+    """
+    energy_factors = rgbw_mixing.energy_factors(energies, MAX_WATTAGE)
+    return rgbw_mixing.decompose_rgb_to_rgbw(colors, energy_factors, white_factor=0.6)
 
 def scan_blender_lights():
     """Skannaa kaikki Blenderin valot ja palauttaa kanavadatan"""
@@ -110,6 +124,14 @@ def scan_blender_lights():
     rgbw_count = 0
     single_count = 0
     
+    # RGBW-ryhmät kerätään ja puretaan kerralla
+    rgbw_lights = []
+    rgbw_colors = []
+    rgbw_energies = []
+    
+    # Kanavat .blendin kanavamappauksesta (päivittyy vain kun nimet muuttuvat)
+    scene_map = channel_map.load_scene_map(max_channel=channel_map.channel_limit(ADDRESSING))
+    
     for obj in bpy.data.objects:
         if obj.type != 'LIGHT':
             continue
@@ -125,23 +147,15 @@ def scan_blender_lights():
         color = list(light_data.color)  # RGB-tupla
         
         # Hae kanavat
-        channel_list = get_channels_from_name(light_name)
+        channel_list = scene_map.channels_for(light_name)
         if not channel_list:
             continue
             
         if len(channel_list) == 4:
             # 🌈 RGBW-ryhmä
-            rgbw_values = analyze_rgbw_color(color, energy)
-            
-            for i, channel in enumerate(channel_list):
-                # Laske MIDI velocity tälle kanavalle
-                channel_energy = rgbw_values[i] * MAX_WATTAGE
-                velocity = energy_to_velocity(channel_energy)
-                
-                if velocity > 0:
-                    channels[str(channel)] = velocity
-            
-            print(f"🌈 {light_name}: {energy:.1f}W, RGB{color[:3]} → RGBW {[f'{v:.2f}' for v in rgbw_values]}")
+            rgbw_lights.append((light_name, channel_list))
+            rgbw_colors.append(color[:3])
+            rgbw_energies.append(energy)
             rgbw_count += 1
             
         elif len(channel_list) == 1:
@@ -155,6 +169,20 @@ def scan_blender_lights():
         
         processed += 1
     
+    if rgbw_lights:
+        rgbw_values = analyze_rgbw_colors(rgbw_colors, rgbw_energies)
+        
+        # Sama kuin energy_to_velocity: 0 jos ei energiaa, muuten 1-127
+        velocities = np.where(rgbw_values > 0,
+                              np.clip(rgbw_mixing.levels_to_velocities(rgbw_values), 1, 127), 0)
+        
+        for (light_name, channel_list), values, light_velocities in zip(rgbw_lights, rgbw_values, velocities):
+            for channel, velocity in zip(channel_list, light_velocities):
+                if velocity > 0:
+                    channels[str(channel)] = int(velocity)
+            
+            print(f"🌈 {light_name}: RGBW {[f'{v:.2f}' for v in values]}")
+    
     print(f"📊 Löydettiin {processed} valoa: {rgbw_count} RGBW-ryhmää + {single_count} yksittäistä")
     print(f"🎛️  Päällä olevat kanavat: {sorted([int(k) for k in channels.keys()])}")
     
@@ -207,6 +235,104 @@ def print_multiplay_instructions(json_path):
     print(f"5. Yhdistä Scene Setter USB-porttiin")
     print(f"6. Toista MIDI → valot syttyvät! 🌈")
 
+# 🔗 LIVE LINK
+# Sama muunnos kuin scan_blender_lights, mutta foreach_get-vientinä ilman tulosteita
+live_exporter = FastLightExporter(max_wattage=MAX_WATTAGE, white_factor=0.6,
+                                  energy_threshold=0.001, min_velocity=1,
+                                  max_channel=channel_map.channel_limit(ADDRESSING))
+
+# Viimeksi palvelimelle viety kanavakartta ja debounce-tila
+live_link_state = {
+    'last_channels': {},
+    'last_change': 0.0,
+    'timer_pending': False
+}
+
+def diff_channels(previous, current):
+    """Palauttaa muuttuneet kanavat {"kanava": velocity}, sammuneet velocityllä 0"""
+    changes = {channel: velocity for channel, velocity in current.items()
+               if previous.get(channel) != velocity}
+    for channel in previous:
+        if channel not in current:
+            changes[channel] = 0
+    return changes
+
+def push_live_changes(changes, scene_name=SCENE_NAME):
+    """Lähettää muuttuneet kanavat palvelimen /live/scene-reitille"""
+    payload = {
+        "scene": scene_name,
+        "changes": changes,
+        "fade_in_duration": DEFAULT_FADE_IN,
+        "fade_out_duration": DEFAULT_FADE_OUT,
+        "steps": DEFAULT_STEPS,
+        "play": LIVE_PLAY
+    }
+    if ADDRESSING:
+        payload["addressing"] = ADDRESSING
+    request = urllib.request.Request(
+        f"{LIVE_SERVER_URL}/live/scene",
+        data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'},
+        method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=1.0) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+def live_link_flush():
+    """Debounce-ajastin: vie muutokset kun valot ovat olleet hetken paikallaan"""
+    remaining = LIVE_DEBOUNCE_SECONDS - (time.monotonic() - live_link_state['last_change'])
+    if remaining > 0:
+        return remaining  # Muutoksia tulee vielä - ajastin uudelleen
+    
+    live_link_state['timer_pending'] = False
+    
+    current = live_exporter.scan()
+    changes = diff_channels(live_link_state['last_channels'], current)
+    if not changes:
+        return None
+    
+    try:
+        result = push_live_changes(changes)
+        live_link_state['last_channels'] = current
+        print(f"🔗 Live: {len(changes)} kanavaa → {result.get('fade_in_file', 'palvelin')}")
+    except Exception as e:
+        # Ei päivitetä last_channels: seuraava muutos lähettää myös nämä
+        print(f"❌ Live link: palvelin ei vastaa ({e})")
+    
+    return None  # Ajastin pois
+
+def live_link_depsgraph_handler(scene, depsgraph=None):
+    """depsgraph_update_post: reagoi vain valojen energia/väri-muutoksiin"""
+    if depsgraph is None:
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+    if not depsgraph.id_type_updated('LIGHT'):
+        return
+    
+    live_link_state['last_change'] = time.monotonic()
+    if not live_link_state['timer_pending']:
+        live_link_state['timer_pending'] = True
+        bpy.app.timers.register(live_link_flush, first_interval=LIVE_DEBOUNCE_SECONDS)
+
+def start_live_link():
+    """Käynnistää live linkin: nykyinen tila lähetetään heti, sitten vain muutokset"""
+    stop_live_link()
+    live_link_state['last_channels'] = {}
+    live_link_state['last_change'] = 0.0
+    live_link_state['timer_pending'] = True
+    bpy.app.timers.register(live_link_flush, first_interval=0.0)
+    bpy.app.handlers.depsgraph_update_post.append(live_link_depsgraph_handler)
+    print(f"🔗 Live link päällä → {LIVE_SERVER_URL} (debounce {LIVE_DEBOUNCE_SECONDS}s)")
+
+def stop_live_link():
+    """Pysäyttää live linkin"""
+    handlers = bpy.app.handlers.depsgraph_update_post
+    for handler in list(handlers):
+        if getattr(handler, '__name__', '') == 'live_link_depsgraph_handler':
+            handlers.remove(handler)
+    if bpy.app.timers.is_registered(live_link_flush):
+        bpy.app.timers.unregister(live_link_flush)
+    live_link_state['timer_pending'] = False
+
 # 🚀 PÄÄOHJELMA
 def export_current_setup():
     """Päävie-funktio"""
@@ -17,7 +17,15 @@ Tulos: JSON-tiedosto joka voidaan ladata MIDI-generaattoriin
 import bpy
 import json
 import os
+import sys
 import mathutils
+import numpy as np
+
+# Yhteiset vientimoduulit samasta hakemistosta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from fast_light_exporter import FastLightExporter
+import channel_map
+import cue_detection
 
 # ASETUKSET - Muokkaa näitä
 OUTPUT_PATH = "/Users/raulivirtanen/Documents/MIDI-Fade-Generator/exported_scene.json"
@@ -26,6 +34,12 @@ DEFAULT_FADE_IN = 2.0  # sekuntia
 DEFAULT_FADE_OUT = 3.0  # sekuntia
 DEFAULT_STEPS = 20
 MAX_WATTAGE = 300
+SAMPLE_RATE = 1  # Animaatioviennin näytteistys: joka N. frame (F-curve-vienti)
+CUE_TOLERANCE = 2  # Cue-viennissä: velocity-muutos jota pienempää ei viedä uutena kohtauksena
+CUE_MIN_HOLD = 0.5  # Cue-viennissä: sekuntia paikallaan ennen kuin ramppi päättyy (hitaat fadet yhtenä)
+# MIDI-osoitus yli 40 kanavan riggeille (None = kanavat 1-40), esim.
+# {"mode": "banked", "midi_channels": 2} tai polku addressing.json:iin (midi_addressing.py)
+ADDRESSING = None
 
 def energy_to_velocity(energy):
     """Muuntaa Blenderin energian MIDI velocity-arvoksi"""
@@ -144,46 +158,23 @@ def get_channel_from_light_name(light_name):
     print(f"⚠️  Ei voitu päätellä kanavaa valolle: {light_name}")
     return None
 
+# Nopea vienti: kanavat .blendin kanavamappauksesta (channel_map.py),
+# mappaus ladataan uudelleen vain kun valojen nimet muuttuvat
+light_exporter = FastLightExporter(
+    max_wattage=MAX_WATTAGE,
+    white_factor=1.0,       # Koko yhteinen RGB-osuus valkoiselle kanavalle
+    energy_threshold=0.0,
+    min_velocity=0,
+    max_channel=channel_map.channel_limit(ADDRESSING)
+)
+
 def scan_current_lights():
     """Skannaa kaikki valot nykyisestä scenestä - RGBW-tuki"""
     
-    lights_data = {}
-    processed_lights = 0
+    # Kaikki valot kerralla foreach_get:llä, RGBW puretaan vektoroidusti
+    lights_data = light_exporter.scan()
     
-    for obj in bpy.data.objects:
-        if obj.type != 'LIGHT':
-            continue
-        
-        # Tarkista onko RGBW-valo
-        rgbw_channels = export_rgbw_light_to_channels(
-            obj.name, 
-            obj.data.color, 
-            obj.data.energy
-        )
-        
-        if rgbw_channels:
-            # RGBW-valo: vie kaikki kanavat
-            for channel, velocity in rgbw_channels.items():
-                if velocity > 0:
-                    lights_data[str(channel)] = velocity
-                    processed_lights += 1
-            print(f"🎨 RGBW: {obj.name} → {len(rgbw_channels)} kanavaa")
-        else:
-            # Tavallinen valo: yksittäinen kanava
-            channel = get_channel_from_light_name(obj.name)
-            if channel is None or channel < 1 or channel > 40:
-                print(f"🚫 Ohitetaan valo: {obj.name} (virheellinen kanava)")
-                continue
-            
-            energy = obj.data.energy
-            velocity = energy_to_velocity(energy)
-            
-            if velocity > 0:
-                lights_data[str(channel)] = velocity
-                processed_lights += 1
-                print(f"💡 Normal: {obj.name} → kanava {channel}: {energy:.1f}W = velocity {velocity}")
-    
-    print(f"📊 Löydettiin {processed_lights} päällä olevaa kanavaa")
+    print(f"📊 Löydettiin {len(lights_data)} päällä olevaa kanavaa")
     return lights_data
 
 def export_scene_to_json(output_path, scene_name=None):
@@ -277,6 +268,110 @@ def export_multiple_frames_to_json(output_path, frame_range=None):
         print(f"❌ Virhe: {e}")
         return False
 
+def export_animation_keyframes(output_path, frame_range=None, sample_rate=SAMPLE_RATE):
+    """
+    Vie animaation JSON-kohtauksiksi suoraan valojen F-curveista
+    
+    Toisin kuin export_multiple_frames_to_json, ei kutsu frame_set:iä eikä
+    skannaa valoja uudelleen joka framelle: energiat ja värit evaluoidaan
+    F-curveista kerralla, joten jokainenkin frame voidaan viedä edullisesti.
+    """
+    
+    if frame_range is None:
+        start_frame = bpy.context.scene.frame_start
+        end_frame = bpy.context.scene.frame_end
+    else:
+        start_frame, end_frame = frame_range
+    
+    sample_rate = max(1, int(sample_rate))
+    frames = np.arange(start_frame, end_frame + 1, sample_rate)
+    
+    print(f"🎬 Viedään framet {start_frame}-{end_frame} F-curveista (joka {sample_rate}. frame)")
+    
+    channels, matrix = light_exporter.sample_channels(frames)
+    
+    scenes_data = []
+    for frame, frame_velocities in zip(frames.tolist(), matrix):
+        active = frame_velocities > 0
+        if not active.any():  # Tallenna vain jos valoja on päällä
+            continue
+        
+        scenes_data.append({
+            "name": f"Frame_{frame}",
+            "channels": {
+                str(channel): int(velocity)
+                for channel, velocity in zip(channels[active].tolist(), frame_velocities[active].tolist())
+            },
+            "fade_in_duration": DEFAULT_FADE_IN,
+            "fade_out_duration": DEFAULT_FADE_OUT,
+            "steps": DEFAULT_STEPS
+        })
+    
+    if not scenes_data:
+        print("❌ Ei löytynyt kohtauksia vietäväksi!")
+        return False
+    
+    # Tallenna JSON
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(scenes_data, f, indent=2, ensure_ascii=False)
+        
+        print(f"✅ {len(scenes_data)} kohtausta viety tiedostoon: {output_path}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Virhe: {e}")
+        return False
+
+def export_animation_cues(output_path, frame_range=None, tolerance=CUE_TOLERANCE,
+                          sample_rate=SAMPLE_RATE, min_hold=CUE_MIN_HOLD):
+    """
+    Vie animaation minimaalisena cue-listana: vain kohdat joissa valot oikeasti muuttuvat
+    
+    Jokainen interpolaatiojakso (valot liikkuvat) tuottaa yhden kohtauksen,
+    jonka fade-in on jakson pituinen. Muutokset alle toleranssin ohitetaan.
+    """
+    
+    if frame_range is None:
+        start_frame = bpy.context.scene.frame_start
+        end_frame = bpy.context.scene.frame_end
+    else:
+        start_frame, end_frame = frame_range
+    
+    sample_rate = max(1, int(sample_rate))
+    frames = np.arange(start_frame, end_frame + 1, sample_rate)
+    fps = bpy.context.scene.render.fps / bpy.context.scene.render.fps_base
+    
+    print(f"🎯 Tunnistetaan cuet frameista {start_frame}-{end_frame} (toleranssi {tolerance})")
+    
+    channels, matrix = light_exporter.sample_channels(frames)
+    scenes_data = cue_detection.detect_cues(
+        frames, channels, matrix, fps,
+        tolerance=tolerance,
+        min_hold=min_hold,
+        default_fade_in=DEFAULT_FADE_IN,
+        default_fade_out=DEFAULT_FADE_OUT,
+        steps=DEFAULT_STEPS
+    )
+    
+    if not scenes_data:
+        print("❌ Ei löytynyt kohtauksia vietäväksi!")
+        return False
+    
+    print(f"📉 {len(frames)} framea → {len(scenes_data)} kohtausta ({2 * len(scenes_data)} MIDI-tiedostoa)")
+    
+    # Tallenna JSON
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(scenes_data, f, indent=2, ensure_ascii=False)
+        
+        print(f"✅ {len(scenes_data)} kohtausta viety tiedostoon: {output_path}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Virhe: {e}")
+        return False
+
 # Aja vienti jos skripti ajetaan
 if __name__ == "__main__":
     result = export_scene_to_json(OUTPUT_PATH)
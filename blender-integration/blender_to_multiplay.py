@@ -14,9 +14,15 @@ import bpy
 import json
 import os
 import sys
-import subprocess
 from pathlib import Path
 
+# Yhteinen vektoroitu RGBW-moduuli samasta hakemistosta
+sys.path.append(str(Path(__file__).parent))
+import numpy as np
+import rgbw_mixing
+import generation_client
+import channel_map
+
 # ASETUKSET
 OUTPUT_DIR = "/Users/raulivirtanen/Documents/MIDI-Export"
 SCENE_NAME = "BlenderLive"
@@ -24,6 +30,9 @@ DEFAULT_FADE_IN = 2.0
 DEFAULT_FADE_OUT = 3.0
 DEFAULT_STEPS = 20
 MAX_WATTAGE = 300
+# MIDI-osoitus yli 58 kanavan riggeille (None = nuotti 69 + kanava), esim.
+# {"mode": "banked", "midi_channels": 2} tai polku addressing.json:iin (midi_addressing.py)
+ADDRESSING = None
 
 # RGBW-mappings (sinun järjestelmäsi)
 rgbw_map = {
@@ -58,7 +67,7 @@ def get_channel_from_light_name(light_name):
     # Yksittäiset kanavat: "21" → kanava 21
     try:
         channel = int(light_name)
-        if 1 <= channel <= 40:
+        if 1 <= channel <= channel_map.channel_limit(ADDRESSING):
             return [channel]  # Palauttaa listan yhden kanavan kanssa
     except ValueError:
         pass
@@ -71,25 +80,16 @@ def analyze_rgbw_color(color, energy):
     Analysoi RGBW-valon väri ja energia → jakaa R, G, B, W kanaviin
     Tämä on heuristiikka joka yrittää päätellä alkuperäiset RGBW-arvot
     """
-    r, g, b = color[:3]  # RGB-komponentit
-    
-    # Arvaa white-komponentti (minimi kaikista väreistä)
-    white_level = min(r, g, b) * 0.7  # Konservatiivinen arvaus
-    
-    # Vähennä white muista väreistä
-    pure_r = max(0, r - white_level)
-    pure_g = max(0, g - white_level)
-    pure_b = max(0, b - white_level)
-    
-    # Skaalaa energian mukaan
-    energy_factor = energy / MAX_WATTAGE
-    
-    return [
-        pure_r * energy_factor,      # R-kanava
-        pure_g * energy_factor,      # G-kanava  
-        pure_b * energy_factor,      # B-kanava
-        white_level * energy_factor  # W-kanava
-    ]
+    return analyze_rgbw_colors([color], [energy])[0].tolist()
+
+def analyze_rgbw_colors(colors, energies):
+    """
+    Analysoi useiden RGBW-valojen värit kerralla → (n, 4) tasot
+    White-komponentti arvataan konservatiivisesti: pienin väri * 0.7
+    """
+    # Skaalaa energian mukaan (ei rajoitusta 1.0:aan, kuten ennenkin)
+    energy_factors = np.asarray(energies, dtype=np.float64) / MAX_WATTAGE
+    return rgbw_mixing.decompose_rgb_to_rgbw(colors, energy_factors, white_factor=0.7)
 
 def scan_current_blender_setup():
     """Skannaa Blenderin nykyiset valoasetukset"""
@@ -100,6 +100,11 @@ def scan_current_blender_setup():
     processed_lights = 0
     rgbw_groups = 0
     
+    # RGBW-ryhmät puretaan kerralla silmukan jälkeen
+    rgbw_lights = []
+    rgbw_colors = []
+    rgbw_energies = []
+    
     for obj in bpy.data.objects:
         if obj.type != 'LIGHT' or obj.data.energy <= 0:
             continue  # Ohita sammuneet valot
@@ -116,15 +121,10 @@ def scan_current_blender_setup():
         
         if len(channels) == 4:
             # RGBW-ryhmä
-            rgbw_values = analyze_rgbw_color(color, energy)
-            
-            for i, channel in enumerate(channels):
-                velocity = energy_to_velocity(rgbw_values[i] * MAX_WATTAGE)
-                if velocity > 0:
-                    channels_data[str(channel)] = velocity
-            
+            rgbw_lights.append((light_name, channels, energy, color))
+            rgbw_colors.append(color[:3])
+            rgbw_energies.append(energy)
             rgbw_groups += 1
-            print(f"🌈 {light_name}: {energy:.1f}W, väri{color} → RGBW({rgbw_values[0]:.2f},{rgbw_values[1]:.2f},{rgbw_values[2]:.2f},{rgbw_values[3]:.2f})")
             
         elif len(channels) == 1:
             # Yksittäinen kanava
@@ -136,6 +136,17 @@ def scan_current_blender_setup():
         
         processed_lights += 1
     
+    if rgbw_lights:
+        rgbw_values = analyze_rgbw_colors(rgbw_colors, rgbw_energies)
+        velocities = rgbw_mixing.levels_to_velocities(rgbw_values)
+        
+        for (light_name, channels, energy, color), values, light_velocities in zip(rgbw_lights, rgbw_values, velocities):
+            for channel, velocity in zip(channels, light_velocities):
+                if velocity > 0:
+                    channels_data[str(channel)] = int(velocity)
+            
+            print(f"🌈 {light_name}: {energy:.1f}W, väri{color} → RGBW({values[0]:.2f},{values[1]:.2f},{values[2]:.2f},{values[3]:.2f})")
+    
     print(f"📊 Skannattu {processed_lights} valoa ({rgbw_groups} RGBW-ryhmää)")
     return channels_data
 
@@ -172,62 +183,33 @@ def save_json_and_generate_midi(scenes_data, output_dir):
         print(f"❌ Virhe JSON-tallennuksessa: {e}")
         return False
     
-    # Etsi Python-backend
-    script_dir = Path(__file__).parent
-    backend_candidates = [
-        script_dir.parent / "valot_python_backend.py",
-        script_dir.parent / "midi-fade-generator-electron" / "valot_python_backend.py",
-        script_dir.parent / "midi-fade-generator" / "valot_python_backend.py"
-    ]
-    
-    backend_path = None
-    for candidate in backend_candidates:
-        if candidate.exists():
-            backend_path = candidate
-            break
-    
-    if not backend_path:
-        print("❌ Python-backend ei löytynyt. JSON tallennettu, mutta MIDI:ä ei voitu luoda.")
-        print(f"📁 JSON-tiedosto: {json_file}")
-        return True
-    
-    print(f"🐍 Käytetään backend: {backend_path}")
-    
     # Luo data backendille
     backend_data = {
         "scenes": scenes_data,
         "outputDir": str(output_path.absolute())
     }
+    if ADDRESSING:
+        backend_data["addressing"] = ADDRESSING
     
-    # Aja Python-backend
+    # Generoi: käynnissä oleva server.py, muuten backend samassa prosessissa
     try:
         print("🎵 Luodaan MIDI-tiedostoja...")
         
-        process = subprocess.run(
-            [sys.executable, str(backend_path)],
-            input=json.dumps(backend_data),
-            text=True,
-            capture_output=True,
-            cwd=str(backend_path.parent)
-        )
+        client = generation_client.default_client()
+        result = client.generate(backend_data)
         
-        if process.returncode == 0:
-            result = json.loads(process.stdout)
-            if result.get('success'):
-                print("✅ MIDI-tiedostot luotu onnistuneesti!")
-                
-                for scene_result in result['results']:
-                    fade_in = scene_result['fade_in_file']
-                    fade_out = scene_result['fade_out_file']
-                    print(f"  🎵 {fade_in}")
-                    print(f"  🎵 {fade_out}")
-                
-                return True
-            else:
-                print(f"❌ Backend-virhe: {result.get('error', 'Tuntematon virhe')}")
+        if result.get('success'):
+            print(f"✅ MIDI-tiedostot luotu onnistuneesti! ({client.last_route})")
+            
+            for scene_result in result['results']:
+                for name in scene_result.get('fade_in_port_files', [scene_result['fade_in_file']]):
+                    print(f"  🎵 {name}")
+                for name in scene_result.get('fade_out_port_files', [scene_result['fade_out_file']]):
+                    print(f"  🎵 {name}")
+            
+            return True
         else:
-            print(f"❌ Backend epäonnistui:")
-            print(f"STDERR: {process.stderr}")
+            print(f"❌ Backend-virhe: {result.get('error', 'Tuntematon virhe')}")
             
     except Exception as e:
         print(f"❌ Virhe MIDI-generoinnissa: {e}")
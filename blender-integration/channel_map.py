@@ -0,0 +1,270 @@
+"""
+🗺️ Channel Map - pysyvä valo ↔ kanava -mappaus per .blend
+
+Yksi versioitu JSON-tiedosto .blend-tiedoston vieressä
+(esim. teatteri.blend → teatteri.channels.json). Tuonti ja vienti lataavat
+sen kerran ja käyttävät valmiina hakutauluna sen sijaan että kanavat
+pääteltäisiin nimistä regexeillä jokaisella kutsulla.
+
+Tiedosto luodaan uudelleen vain kun valojen nimet muuttuvat
+(nimilistan tiiviste tallennetaan tiedostoon). auto_channel_mapper.py
+voi tallentaa oman jakonsa samaan tiedostoon.
+
+Nimeämiskäytännöt (resolve_light_channels):
+- "RGBW 13-16"  → [13, 14, 15, 16]
+- "RGBW_2_Red"  → [5]  (ryhmä 2, R-kanava)
+- "Spot_15", "21", "Light.027" → viimeinen numero [15], [21], [27]
+
+Kanavaraja on oletuksena MAX_CHANNEL (40), ADDRESSING-asetuksen kanssa
+osoituksen max_channel (channel_limit), esim. banked 2 MIDI-kanavaa → 116.
+Tiedostoon tallennetaan nimistä päätellyt kanavat rajaamatta, raja
+tarkistetaan haettaessa - eri rajoilla lataaminen ei kirjoita tiedostoa uudelleen.
+
+Käyttö:
+    import channel_map
+    mapping = channel_map.load_scene_map()
+    mapping.channels_for("RGBW 13-16")   # [13, 14, 15, 16]
+    mapping.light_for(14)                # "RGBW 13-16"
+"""
+
+import copy
+import hashlib
+import json
+import os
+import re
+import sys
+
+try:
+    import bpy
+    BPY_AVAILABLE = True
+except ImportError:
+    BPY_AVAILABLE = False
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import midi_addressing
+
+CHANNEL_MAP_VERSION = 1
+MIN_CHANNEL = 1
+MAX_CHANNEL = 40                 # Oletusrigi ilman ADDRESSING-asetusta
+
+RGBW_RANGE_PATTERN = re.compile(r'RGBW\s+(\d+)-(\d+)')
+RGBW_GROUP_PATTERN = re.compile(r'^RGBW_(\d+)_(Red|Green|Blue|White)$')
+RGBW_COLOR_OFFSET = {'Red': 0, 'Green': 1, 'Blue': 2, 'White': 3}
+
+# Ladattu mappaus ja sen tiedosto: vaihtuu vain kun valojen nimet (tai .blend) muuttuvat
+_scene_map = None
+_scene_map_path = None
+
+
+def channel_limit(addressing=None):
+    """Suurin kanava: ilman osoitusta tai legacy-osoituksella MAX_CHANNEL, muuten osoituksen max_channel"""
+    addressing = midi_addressing.from_spec(addressing)
+    if addressing.mode == midi_addressing.MODE_LEGACY:
+        return MAX_CHANNEL
+    return addressing.max_channel
+
+
+def channel_in_range(channel, max_channel):
+    return MIN_CHANNEL <= channel and (max_channel is None or channel <= max_channel)
+
+
+def resolve_light_channels(light_name, max_channel=MAX_CHANNEL):
+    """Päättelee valon kanavat nimestä (käytetään vain mappausta rakennettaessa), max_channel None = ei ylärajaa"""
+    match = RGBW_RANGE_PATTERN.search(light_name)
+    if match:
+        start_channel = int(match.group(1))
+        if int(match.group(2)) - start_channel == 3:
+            return [start_channel, start_channel + 1, start_channel + 2, start_channel + 3]
+
+    match = RGBW_GROUP_PATTERN.match(light_name)
+    if match:
+        channel = (int(match.group(1)) - 1) * 4 + RGBW_COLOR_OFFSET[match.group(2)] + 1
+        return [channel] if channel_in_range(channel, max_channel) else []
+
+    numbers = re.findall(r'\d+', light_name)
+    if numbers:
+        channel = int(numbers[-1])
+        if channel_in_range(channel, max_channel):
+            return [channel]
+
+    return []
+
+
+def names_signature(light_names):
+    """Tiiviste valojen nimistä - muuttuu kun valo lisätään, poistetaan tai nimetään uudelleen"""
+    return hashlib.sha1('\n'.join(sorted(light_names)).encode('utf-8')).hexdigest()
+
+
+class ChannelMap:
+    """Valo → kanavat ja kanava → valo -hakutaulut, haut rajattu kanaviin 1-max_channel"""
+
+    def __init__(self, light_to_channels, signature, source="channel_map", max_channel=MAX_CHANNEL):
+        self.light_to_channels = light_to_channels
+        self.signature = signature
+        self.source = source
+        self.max_channel = max_channel
+
+        # Kanava → valo: RGBW-ryhmät ensin, sitten yksittäiset (kuten tuonnin haku)
+        self.channel_to_light = {}
+        for name in sorted(light_to_channels, key=lambda n: (len(light_to_channels[n]) != 4, n)):
+            for channel in light_to_channels[name]:
+                self.channel_to_light.setdefault(channel, name)
+
+    @classmethod
+    def build(cls, light_names, resolve=None, max_channel=MAX_CHANNEL):
+        """Kanavat nimistä ilman ylärajaa, max_channel rajaa vain haut"""
+        mapping = {}
+        for name in light_names:
+            channels = resolve(name) if resolve else resolve_light_channels(name, None)
+            if channels:
+                mapping[name] = list(channels)
+        return cls(mapping, names_signature(light_names), max_channel=max_channel)
+
+    def limited(self, max_channel):
+        """Sama mappaus toisella kanavarajalla (hakutaulut jaetaan, ei uudelleenrakennusta)"""
+        if max_channel == self.max_channel:
+            return self
+        view = copy.copy(self)
+        view.max_channel = max_channel
+        return view
+
+    def channels_for(self, light_name):
+        """Valon kanavat [r, g, b, w] tai [kanava], tuntematon tai rajan ylittävä valo → []"""
+        channels = self.light_to_channels.get(light_name, [])
+        if any(channel > self.max_channel for channel in channels):
+            return []
+        return channels
+
+    def light_for(self, channel):
+        """Kanavaa ohjaavan valon nimi tai None"""
+        name = self.channel_to_light.get(channel)
+        return name if name is not None and self.channels_for(name) else None
+
+    def to_dict(self):
+        return {
+            "version": CHANNEL_MAP_VERSION,
+            "description": "Blender → Scene Setter channel mappaus",
+            "source": self.source,
+            "names_signature": self.signature,
+            "light_to_channels": self.light_to_channels,
+            "channel_to_light": {str(ch): name for ch, name in sorted(self.channel_to_light.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data, max_channel=MAX_CHANNEL):
+        """Lukee ja validoi tiedoston sisällön (ValueError jos virheellinen)"""
+        if data.get("version") != CHANNEL_MAP_VERSION:
+            raise ValueError(f"Tuntematon mappausversio {data.get('version')}")
+
+        light_to_channels = data.get("light_to_channels")
+        if not isinstance(light_to_channels, dict):
+            raise ValueError("light_to_channels puuttuu")
+
+        for name, channels in light_to_channels.items():
+            if len(channels) not in (1, 4) or len(set(channels)) != len(channels):
+                raise ValueError(f"Virheelliset kanavat valolle {name}: {channels}")
+            if not all(isinstance(ch, int) and ch >= MIN_CHANNEL for ch in channels):
+                raise ValueError(f"Virheellinen kanava (pienin {MIN_CHANNEL}) valolle {name}: {channels}")
+
+        return cls(light_to_channels, data.get("names_signature"), data.get("source", "channel_map"),
+                   max_channel)
+
+
+def channel_map_path(blend_path=None):
+    """Mappaustiedoston polku .blend-tiedoston vieressä (None jos .blend on tallentamatta)"""
+    if blend_path is None:
+        blend_path = bpy.data.filepath if BPY_AVAILABLE else ""
+    if not blend_path:
+        return None
+    return os.path.splitext(blend_path)[0] + ".channels.json"
+
+
+def scene_light_names():
+    """Kaikkien valo-objektien nimet"""
+    return [obj.name for obj in bpy.data.objects if obj.type == 'LIGHT']
+
+
+def mapped_collection_light(mapping, channel):
+    """Kanavan valo-objekti mappauksesta - vain Lights-collectionista (kuten tuonnin haku)"""
+    name = mapping.light_for(channel)
+    light_obj = bpy.data.objects.get(name) if name else None
+    if light_obj is None or light_obj.type != 'LIGHT':
+        return None
+    if not any('light' in collection.name.lower() for collection in light_obj.users_collection):
+        return None
+    return light_obj
+
+
+def save_channel_map(mapping, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(mapping.to_dict(), f, indent=2, ensure_ascii=False)
+
+
+def read_channel_map(path):
+    """Lukee mappaustiedoston, None jos puuttuu tai on virheellinen"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return ChannelMap.from_dict(json.load(f))
+    except (ValueError, json.JSONDecodeError) as e:
+        print(f"⚠️  Kanavamappaus virheellinen, luodaan uudelleen: {e}")
+        return None
+
+
+def load_scene_map(light_names=None, path=None, max_channel=MAX_CHANNEL):
+    """
+    Palauttaa nykyisen .blendin mappauksen
+
+    1. Muistissa oleva mappaus jos valojen nimet eivät ole muuttuneet
+    2. Tiedosto jos sen nimitiiviste täsmää
+    3. Muuten rakennetaan nimistä ja tallennetaan tiedostoon
+
+    max_channel rajaa vain palautetun mappauksen haut (ChannelMap.limited),
+    joten eri rajoilla lataavat kutsujat eivät hävitä esim. auto_channel_mapperin jakoa.
+    """
+    global _scene_map, _scene_map_path
+
+    if light_names is None:
+        light_names = scene_light_names()
+    signature = names_signature(light_names)
+
+    if path is None:
+        path = channel_map_path()
+
+    if _scene_map is not None and _scene_map.signature == signature and _scene_map_path == path:
+        return _scene_map.limited(max_channel)
+
+    mapping = read_channel_map(path)
+    if mapping is None or mapping.signature != signature:
+        mapping = ChannelMap.build(light_names)
+        if path:
+            save_channel_map(mapping, path)
+            print(f"🗺️  Kanavamappaus tallennettu: {path} ({len(mapping.light_to_channels)} valoa)")
+
+    _scene_map = mapping
+    _scene_map_path = path
+    return mapping.limited(max_channel)
+
+
+def store_scene_map(light_to_channels, source, light_names=None, path=None):
+    """Tallentaa ulkoisen jaon (esim. auto_channel_mapper) nykyisen .blendin mappaukseksi"""
+    global _scene_map, _scene_map_path
+
+    if light_names is None:
+        light_names = scene_light_names()
+    if path is None:
+        path = channel_map_path()
+
+    mapping = ChannelMap.from_dict({
+        "version": CHANNEL_MAP_VERSION,
+        "light_to_channels": light_to_channels,
+        "names_signature": names_signature(light_names),
+        "source": source
+    })
+    if path:
+        save_channel_map(mapping, path)
+
+    _scene_map = mapping
+    _scene_map_path = path
+    return path
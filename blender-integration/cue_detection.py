@@ -0,0 +1,150 @@
+"""
+🎯 Cue Detection - animaatiosta minimaalinen cue-lista
+
+Tunnistaa animaatiosta kohdat joissa kanavien arvot oikeasti muuttuvat
+ja tuottaa vain ne kohtauksiksi. Fade-ajat otetaan interpolaatiojaksoista:
+kun valot liukuvat framesta a frameen b, syntyy kohtaus jonka fade-in kestää
+(b - a) / fps sekuntia ja jonka tavoitetaso on framen b arvo.
+
+Hidas tai himmeä fade näkyy velocity-kvantisoinnin takia portaina: taso
+nousee yhdellä ja pysyy paikallaan useita frameja. Jakso suljetaan vasta
+kun valot pysyvät paikallaan vähintään min_hold sekuntia, ja yhden
+velocity-askeleen portaat samaan suuntaan yhdistetään aina samaksi rampiksi.
+
+Ei vaadi Blenderiä - syötteenä framet × kanavat -velocity-matriisi
+(esim. FastLightExporter.sample_channels).
+
+Käyttö:
+    cues = detect_cues(frames, channels, matrix, fps=24, tolerance=2)
+"""
+
+import numpy as np
+
+DEFAULT_TOLERANCE = 2         # Velocity-muutos jota pienempää ei pidetä uutena cuena
+DEFAULT_MOTION_TOLERANCE = 0  # Frame-frame-muutos jota pidetään vielä paikallaan olona
+DEFAULT_MIN_HOLD = 0.5        # Sekuntia paikallaan ennen kuin cue suljetaan
+
+
+def find_motion_spans(matrix, motion_tolerance=DEFAULT_MOTION_TOLERANCE):
+    """
+    Etsii interpolaatiojaksot: peräkkäiset näytevälit joilla jokin kanava muuttuu
+
+    Palauttaa listan (start, end) näyteindeksejä: liike alkaa näytteestä
+    start ja tavoitetaso saavutetaan näytteessä end.
+    """
+    matrix = np.asarray(matrix)
+    if len(matrix) < 2:
+        return []
+
+    moving = (np.abs(np.diff(matrix.astype(np.int32), axis=0)) > motion_tolerance).any(axis=1)
+
+    # Liikejaksojen reunat: 0 → 1 = alku, 1 → 0 = loppu
+    edges = np.diff(np.concatenate([[0], moving.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def is_quantized_continuation(matrix, previous_end, next_start, motion_tolerance=DEFAULT_MOTION_TOLERANCE):
+    """
+    Onko tauko jaksojen välissä vain velocity-kvantisoinnin porras
+
+    Tosi kun edellisen jakson viimeinen ja seuraavan ensimmäinen muutos ovat
+    enintään yhden velocity-askeleen kokoisia eikä mikään kanava käänny.
+    """
+    step = motion_tolerance + 1
+    before = matrix[previous_end].astype(np.int32) - matrix[previous_end - 1]
+    after = matrix[next_start + 1].astype(np.int32) - matrix[next_start]
+    small = np.abs(before).max(initial=0) <= step and np.abs(after).max(initial=0) <= step
+    return small and bool((np.sign(before) * np.sign(after) >= 0).all())
+
+
+def merge_motion_spans(spans, frames, matrix, fps, min_hold=DEFAULT_MIN_HOLD,
+                       motion_tolerance=DEFAULT_MOTION_TOLERANCE):
+    """
+    Yhdistää jaksot joiden välinen paikallaanolo on lyhyempi kuin min_hold
+    sekuntia tai pelkkä kvantisointiporras (is_quantized_continuation)
+    """
+    merged = []
+    for start, end in spans:
+        if merged:
+            previous_start, previous_end = merged[-1]
+            still = (frames[start] - frames[previous_end]) / fps
+            if still < min_hold or is_quantized_continuation(matrix, previous_end, start, motion_tolerance):
+                merged[-1] = (previous_start, end)
+                continue
+        merged.append((start, end))
+    return merged
+
+
+def detect_cues(frames, channels, matrix, fps, tolerance=DEFAULT_TOLERANCE,
+                motion_tolerance=DEFAULT_MOTION_TOLERANCE, default_fade_in=2.0,
+                default_fade_out=3.0, steps=20, name_prefix="Cue", min_hold=DEFAULT_MIN_HOLD):
+    """
+    Muuttaa framet × kanavat -matriisin minimaaliseksi kohtauslistaksi
+
+    - Kohtaus syntyy vain kun tavoitetaso poikkeaa edellisestä kohtauksesta
+      enemmän kuin tolerance (velocity-yksiköissä) jollain kanavalla
+    - fade_in_duration = koko rampin pituus sekunteina (jaksot yhdistetty
+      merge_motion_spans:lla, cue suljetaan vasta min_hold sekunnin tasanteella)
+    - Animaation lopun asettunut taso päätyy aina viimeiseen kohtaukseen,
+      vaikka viimeinen muutos jäisi alle tolerancen
+    - Jos liike päättyy pimeään, edellisen kohtauksen fade_out_duration
+      asetetaan jakson pituiseksi (erillistä tyhjää kohtausta ei luoda)
+    """
+    frames = np.asarray(frames)
+    channels = np.asarray(channels)
+    matrix = np.asarray(matrix)
+
+    cues = []
+    last_state = np.zeros(matrix.shape[1], dtype=np.int32) if matrix.ndim == 2 else None
+    if last_state is None or not len(frames):
+        return cues
+
+    def active_channels(state):
+        active = state > 0
+        return {
+            str(channel): int(velocity)
+            for channel, velocity in zip(channels[active].tolist(), state[active].tolist())
+        }
+
+    def make_cue(index, fade_in):
+        return {
+            "name": f"{name_prefix}_{len(cues) + 1}_F{int(frames[index])}",
+            "channels": active_channels(matrix[index]),
+            "fade_in_duration": round(float(fade_in), 3),
+            "fade_out_duration": default_fade_out,
+            "steps": steps,
+            "start_frame": int(frames[index])
+        }
+
+    # Ensimmäinen näyte: valot jo päällä animaation alussa
+    if (matrix[0] > 0).any():
+        cues.append(make_cue(0, default_fade_in))
+        last_state = matrix[0].astype(np.int32)
+
+    spans = merge_motion_spans(find_motion_spans(matrix, motion_tolerance), frames, matrix, fps,
+                               min_hold, motion_tolerance)
+    for start, end in spans:
+        target = matrix[end].astype(np.int32)
+        if np.abs(target - last_state).max(initial=0) <= tolerance:
+            continue  # Muutos liian pieni - ei uutta cuea
+
+        span = (frames[end] - frames[start]) / fps
+
+        if not (target > 0).any():
+            # Blackout: edellinen kohtaus sammuu tämän jakson aikana
+            if cues:
+                cues[-1]["fade_out_duration"] = round(float(span), 3)
+        else:
+            cues.append(make_cue(end, span))
+
+        last_state = target
+
+    # Asettunut lopputaso: alle tolerancen jäänyt loppumuutos viimeiseen kohtaukseen
+    final = matrix[-1].astype(np.int32)
+    if cues and (final > 0).any() and (last_state > 0).any() and (final != last_state).any():
+        cues[-1]["channels"] = active_channels(matrix[-1])
+
+    return cues
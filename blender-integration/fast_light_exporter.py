@@ -0,0 +1,259 @@
+"""
+⚡ Fast Light Exporter - koko valorigin vienti kerralla
+
+Lukee kaikkien valojen energiat ja värit yhdellä foreach_get-kutsulla
+NumPy-taulukoihin ja muuntaa ne MIDI-kanaviksi vektoroidusti.
+Valon nimi → kanavat -mappaus luetaan .blendin kanavamappauksesta
+(channel_map.py) vain kun valojen nimet muuttuvat, joten regexiä ei ajeta
+jokaisella viennillä.
+
+Käyttö:
+    from fast_light_exporter import FastLightExporter
+
+    exporter = FastLightExporter(max_wattage=300)
+    channels = exporter.scan()   # {"13": 127, "21": 60, ...}
+
+Satojen valojen rigi viedään alle sekunnissa (myös animaation jokaisella framella).
+
+Animaation vienti (ilman frame_set-kutsuja):
+    frames = range(1, 251)
+    channels, matrix = exporter.sample_channels(frames)   # (framet × kanavat)
+"""
+
+import re
+
+import bpy
+import numpy as np
+
+import channel_map
+import rgbw_mixing
+
+MAX_WATTAGE = 300
+
+# RGBW-mappings (Scene Setter -järjestelmä)
+RGBW_GROUPS = {
+    "RGBW 13-16": [13, 14, 15, 16],
+    "RGBW 17-20": [17, 18, 19, 20],
+    "RGBW 25-28": [25, 26, 27, 28],
+    "RGBW 29-32": [29, 30, 31, 32],
+    "RGBW 33-36": [33, 34, 35, 36],
+    "RGBW 37-40": [37, 38, 39, 40],
+}
+
+# Yksittäisen kanavan komponentti-indeksi (energia suoraan, ei väriä)
+SINGLE_COMPONENT = -1
+
+
+def get_channels_from_name(light_name, max_channel=channel_map.MAX_CHANNEL):
+    """Päättelee kanavat nimestä (sama logiikka kuin add-onin JSON-viennissä)"""
+    if light_name in RGBW_GROUPS:
+        return RGBW_GROUPS[light_name]
+
+    try:
+        channel = int(light_name.strip())
+        if 1 <= channel <= max_channel:
+            return [channel]
+    except ValueError:
+        pass
+
+    numbers = re.findall(r'\d+', light_name)
+    if numbers:
+        channel = int(numbers[-1])
+        if 1 <= channel <= max_channel:
+            return [channel]
+
+    return []
+
+
+def light_fcurves(light):
+    """Palauttaa valodatablockin F-curvet (sekä perinteiset että Blender 4.4+ slotted actionit)"""
+    anim = light.animation_data
+    if anim is None or anim.action is None:
+        return []
+
+    action = anim.action
+    slot = getattr(anim, 'action_slot', None)
+    if slot is not None and getattr(action, 'layers', None):
+        # Kerroksellinen action: F-curvet ovat slotin channelbagissa
+        fcurves = []
+        for layer in action.layers:
+            for strip in layer.strips:
+                channelbag = strip.channelbag(slot)
+                if channelbag is not None:
+                    fcurves.extend(channelbag.fcurves)
+        return fcurves
+
+    return list(action.fcurves)
+
+
+def evaluate_fcurve(fcurve, frames):
+    """Evaluoi F-curven kaikille frameille yhteen taulukkoon"""
+    return np.fromiter((fcurve.evaluate(frame) for frame in frames),
+                       dtype=np.float32, count=len(frames))
+
+
+class FastLightExporter:
+    """Vie kaikkien valojen kanavat kerralla, nimi → kanavat -välimuistilla"""
+
+    def __init__(self, max_wattage=MAX_WATTAGE, white_factor=0.6,
+                 energy_threshold=1.001, min_velocity=1,
+                 resolve_channels=None, max_channel=channel_map.MAX_CHANNEL):
+        self.max_wattage = max_wattage
+        self.white_factor = white_factor
+        self.energy_threshold = energy_threshold  # Tätä pienempi kanavaenergia = 0
+        self.min_velocity = min_velocity          # Päällä olevan kanavan pienin velocity
+        self.resolve_channels = resolve_channels  # None = .blendin kanavamappaus (channel_map)
+        self.max_channel = max_channel            # Osoituksen kanavaraja (channel_map.channel_limit)
+
+        self._cache_key = None
+        # Yksi merkintä per vietävä kanava, valojen järjestyksessä
+        self.entry_channels = np.zeros(0, dtype=np.int32)
+        self.entry_lights = np.zeros(0, dtype=np.int64)      # Indeksi bpy.data.lights:iin
+        self.entry_components = np.zeros(0, dtype=np.int64)  # 0-3 = RGBW, -1 = yksittäinen
+        self.light_names = []
+
+    def invalidate(self):
+        """Pakota mappauksen uudelleenlaskenta seuraavalla viennillä"""
+        self._cache_key = None
+
+    def refresh_mapping(self):
+        """Laskee nimi → kanavat -mappauksen uudelleen jos valojen nimet ovat muuttuneet"""
+        cache_key = (tuple(bpy.data.objects.keys()), tuple(bpy.data.lights.keys()))
+        if cache_key == self._cache_key:
+            return False
+
+        light_index = {light.as_pointer(): i for i, light in enumerate(bpy.data.lights)}
+        resolve = self.resolve_channels or channel_map.load_scene_map(max_channel=self.max_channel).channels_for
+
+        channels = []
+        lights = []
+        components = []
+        names = []
+
+        for obj in bpy.data.objects:
+            if obj.type != 'LIGHT' or obj.data is None:
+                continue
+
+            channel_list = resolve(obj.name)
+            if not channel_list:
+                continue
+
+            index = light_index[obj.data.as_pointer()]
+            names.append(obj.name)
+
+            if len(channel_list) == 4:
+                # RGBW-ryhmä: neljä merkintää, yksi per väri
+                for component, channel in enumerate(channel_list):
+                    channels.append(channel)
+                    lights.append(index)
+                    components.append(component)
+            elif len(channel_list) == 1:
+                channels.append(channel_list[0])
+                lights.append(index)
+                components.append(SINGLE_COMPONENT)
+
+        self.entry_channels = np.asarray(channels, dtype=np.int32)
+        self.entry_lights = np.asarray(lights, dtype=np.int64)
+        self.entry_components = np.asarray(components, dtype=np.int64)
+        self.light_names = names
+        self._cache_key = cache_key
+
+        print(f"🗺️  Kanavamappaus päivitetty: {len(names)} valoa, {len(channels)} kanavaa")
+        return True
+
+    def read_lights(self):
+        """Lukee kaikkien valodatablockien energiat ja värit (foreach_get)"""
+        count = len(bpy.data.lights)
+
+        energies = np.empty(count, dtype=np.float32)
+        bpy.data.lights.foreach_get("energy", energies)
+
+        colors = np.empty(count * 3, dtype=np.float32)
+        bpy.data.lights.foreach_get("color", colors)
+
+        return energies, colors.reshape(count, 3)
+
+    def sample_lights(self, frames):
+        """
+        Lukee valojen energiat ja värit annetuille frameille suoraan F-curveista
+
+        Ei kutsu frame_set:iä, joten depsgraphia ei evaluoida joka framelle.
+        Animoimattomat valot saavat nykyisen (staattisen) arvonsa.
+        Palauttaa (energies (framet, valot), colors (framet, valot, 3)).
+        Huom: ajurit (drivers) ja NLA-kerrokset eivät ole mukana.
+        """
+        frames = np.asarray(frames, dtype=np.float64)
+        energies, colors = self.read_lights()
+
+        frame_energies = np.repeat(energies[np.newaxis, :], len(frames), axis=0)
+        frame_colors = np.repeat(colors[np.newaxis, :, :], len(frames), axis=0)
+
+        for index, light in enumerate(bpy.data.lights):
+            for fcurve in light_fcurves(light):
+                if fcurve.data_path == 'energy':
+                    frame_energies[:, index] = evaluate_fcurve(fcurve, frames)
+                elif fcurve.data_path == 'color' and fcurve.array_index < 3:
+                    frame_colors[:, index, fcurve.array_index] = evaluate_fcurve(fcurve, frames)
+
+        return frame_energies, frame_colors
+
+    def sample_channels(self, frames):
+        """
+        Vie animaation kanavat annetuille frameille
+
+        Palauttaa (channels, matrix):
+        - channels: (k,) kanavanumerot nousevassa järjestyksessä
+        - matrix: (framet, k) velocityt, 0 = kanava pois päältä
+        """
+        self.refresh_mapping()
+        energies, colors = self.sample_lights(frames)
+        velocities = self.channel_velocities(energies, colors)
+        return self.collapse_channels(velocities)
+
+    def collapse_channels(self, velocities):
+        """Yhdistää merkinnät kanavittain: myöhempi päällä oleva valo voittaa (kuten scan)"""
+        channels = np.unique(self.entry_channels)
+        columns = np.searchsorted(channels, self.entry_channels)
+
+        matrix = np.zeros(velocities.shape[:-1] + (len(channels),), dtype=np.int32)
+        for entry, column in enumerate(columns.tolist()):
+            entry_velocities = velocities[..., entry]
+            matrix[..., column] = np.where(entry_velocities > 0, entry_velocities, matrix[..., column])
+
+        return channels, matrix
+
+    def channel_velocities(self, energies, colors):
+        """
+        Muuntaa energiat ja värit merkintäkohtaisiksi velocityiksi vektoroidusti
+
+        energies: (..., valot), colors: (..., valot, 3) - etuakselina esim. framet
+        Palauttaa (..., merkinnät) velocityt
+        """
+        if not len(self.entry_channels):
+            return np.zeros(energies.shape[:-1] + (0,), dtype=np.int32)
+
+        # RGBW-tasot kaikille valoille kerralla (..., n_lights, 4)
+        factors = rgbw_mixing.energy_factors(energies, self.max_wattage)
+        levels = rgbw_mixing.decompose_rgb_to_rgbw(colors, factors, self.white_factor)
+
+        # Kanavakohtainen energia: yksittäiselle valon energia, RGBW:lle värin osuus
+        is_single = self.entry_components == SINGLE_COMPONENT
+        rgbw_energy = levels[..., self.entry_lights, np.maximum(self.entry_components, 0)] * self.max_wattage
+        channel_energy = np.where(is_single, energies[..., self.entry_lights], rgbw_energy)
+
+        velocities = np.floor(channel_energy / self.max_wattage * 127)
+        velocities = np.clip(velocities, self.min_velocity, 127)
+        return np.where(channel_energy > self.energy_threshold, velocities, 0).astype(np.int32)
+
+    def scan(self):
+        """Palauttaa päällä olevat kanavat {"kanava": velocity}"""
+        self.refresh_mapping()
+        energies, colors = self.read_lights()
+        velocities = self.channel_velocities(energies, colors)
+
+        # Myöhempi valo voittaa, kuten objektijärjestyksessä skannatessa
+        return {
+            str(channel): int(velocity)
+            for channel, velocity in zip(self.entry_channels.tolist(), velocities.tolist())
+            if velocity > 0
+        }
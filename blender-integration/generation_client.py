@@ -0,0 +1,141 @@
+"""
+🔌 Generation Client - MIDI-generointi ilman uutta Python-prosessia
+
+Yhteinen asiakas Blender-vienneille ja workflow-skripteille:
+1. Käynnissä oleva server.py (POST /generate-midi) - yksi auki pidetty
+   HTTP-yhteys koko istunnolle, ei tulkin käynnistystä per vienti
+2. Ei palvelinta → valot_python_backend.generate() samassa prosessissa
+3. Viimeisenä varana backend erillisenä prosessina (esim. Blenderin
+   Pythonista puuttuu midiutil)
+
+Käyttö:
+    from generation_client import generate_midi
+    result = generate_midi({"scenes": scenes, "outputDir": "/polku"})
+
+Palvelimen osoite: MIDI_GENERATOR_URL (oletus http://localhost:8000)
+"""
+
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import urllib.parse
+from pathlib import Path
+
+DEFAULT_SERVER_URL = os.environ.get('MIDI_GENERATOR_URL', 'http://localhost:8000')
+REPO_DIR = Path(__file__).resolve().parent.parent
+BACKEND_PATH = REPO_DIR / "valot_python_backend.py"
+
+CONNECT_TIMEOUT = 0.3    # Paikallinen palvelin vastaa heti tai ei ole käynnissä
+REQUEST_TIMEOUT = 60.0
+
+
+class GenerationClient:
+    """Pitää yhden HTTP-yhteyden auki generointipalvelimeen, varalla prosessinsisäinen backend"""
+
+    def __init__(self, server_url=DEFAULT_SERVER_URL, timeout=REQUEST_TIMEOUT):
+        parsed = urllib.parse.urlsplit(server_url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self._connection = None
+        self._backend = None
+        self.last_route = None  # 'server', 'in_process' tai 'subprocess'
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=CONNECT_TIMEOUT)
+            connection.connect()
+            connection.sock.settimeout(self.timeout)
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._connection = connection
+        return self._connection
+
+    def _post(self, path, data):
+        body = json.dumps(data).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+
+        # Toinen yritys uudella yhteydellä jos palvelin sulki vanhan välillä
+        for attempt in range(2):
+            connection = self._connect()
+            try:
+                connection.request('POST', path, body, headers)
+                response = connection.getresponse()
+                payload = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+
+            if response.will_close:
+                self.close()
+            return json.loads(payload.decode('utf-8'))
+
+    def _generate_in_process(self, data):
+        if self._backend is None:
+            if str(REPO_DIR) not in sys.path:
+                sys.path.append(str(REPO_DIR))
+            import valot_python_backend
+            self._backend = valot_python_backend
+        return self._backend.generate(data)
+
+    def _generate_subprocess(self, data):
+        process = subprocess.run(
+            [sys.executable, str(BACKEND_PATH)],
+            input=json.dumps(data),
+            text=True,
+            capture_output=True,
+            cwd=str(REPO_DIR)
+        )
+        if process.returncode != 0:
+            return {'success': False, 'error': process.stderr.strip()}
+        return json.loads(process.stdout)
+
+    def generate(self, data):
+        """
+        Generoi MIDI-tiedostot backendin JSON-muodosta {"scenes": [...], "outputDir": ...}
+
+        Palauttaa backendin tulos-sanakirjan ({'success': ..., 'results': [...]})
+        """
+        try:
+            result = self._post('/generate-midi', data)
+            self.last_route = 'server'
+            return result
+        except (OSError, http.client.HTTPException, ValueError):
+            self.close()  # Palvelin ei käynnissä (tai portissa on jokin muu palvelu)
+
+        try:
+            result = self._generate_in_process(data)
+            self.last_route = 'in_process'
+            return result
+        except ImportError as e:
+            print(f"⚠️  Backendia ei voi tuoda tähän Pythoniin ({e}) - käytetään erillistä prosessia")
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+
+        self.last_route = 'subprocess'
+        return self._generate_subprocess(data)
+
+
+# Istunnon yhteinen asiakas: yhteys säilyy vientien välillä
+_default_client = None
+
+
+def default_client():
+    global _default_client
+    if _default_client is None:
+        _default_client = GenerationClient()
+    return _default_client
+
+
+def generate_midi(data):
+    """Generoi MIDI-tiedostot yhteisellä asiakkaalla (ks. GenerationClient.generate)"""
+    return default_client().generate(data)
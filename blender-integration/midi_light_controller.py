@@ -43,6 +43,47 @@ try:
 except ImportError:
     MIDO_AVAILABLE = False
 
+# Yhteinen vektoroitu RGBW-moduuli (samasta hakemistosta)
+ADDON_DIR = os.path.dirname(os.path.abspath(__file__))
+if ADDON_DIR not in sys.path:
+    sys.path.append(ADDON_DIR)
+
+try:
+    import numpy as np
+    import rgbw_mixing
+    RGBW_MIXING_AVAILABLE = True
+except ImportError:
+    RGBW_MIXING_AVAILABLE = False
+
+# Pysyvä .blend-kohtainen kanavamappaus
+try:
+    import channel_map
+    CHANNEL_MAP_AVAILABLE = True
+except ImportError:
+    CHANNEL_MAP_AVAILABLE = False
+
+# MIDI-osoitus repon juuresta (add-on asennettuna muualle → nuotti = 69 + kanava)
+try:
+    sys.path.append(os.path.dirname(ADDON_DIR))
+    import midi_addressing
+    ADDRESSING_AVAILABLE = True
+except ImportError:
+    ADDRESSING_AVAILABLE = False
+
+# Nopea foreach_get-vienti (vaatii rgbw_mixing-moduulin)
+try:
+    from fast_light_exporter import FastLightExporter
+    FAST_EXPORT_AVAILABLE = RGBW_MIXING_AVAILABLE
+except ImportError:
+    FAST_EXPORT_AVAILABLE = False
+
+# MIDI-osoitus yli 40 kanavan riggeille (None = kanavat 1-40), esim.
+# {"mode": "banked", "midi_channels": 2} tai polku addressing.json:iin (midi_addressing.py)
+ADDRESSING = None
+
+# Add-onin yhteinen vientiolio: nimi → kanavat -välimuisti säilyy vientien välillä
+addon_light_exporter = None
+
 # ==========================================
 # RGBW COLOR MIXING GLOBALS
 # ==========================================
@@ -329,11 +370,23 @@ class MIDI_OT_import_midi(Operator):
         # Tyhjennä vanhat animaatiot
         bpy.ops.midi.clear_animation()
         
+        # Osoitus: addressing.json tiedoston vieressä, porttitiedosto (_port2.mid) kertoo portin
+        addressing = midi_addressing.load_sidecar(midi_path) if ADDRESSING_AVAILABLE else None
+        port = midi_addressing.port_of_file(midi_path) if ADDRESSING_AVAILABLE else 0
+        
+        # Lataa .blendin kanavamappaus kerran koko tuonnille (osoituksen kanavarajalla)
+        self.scene_channel_map = (channel_map.load_scene_map(max_channel=channel_map.channel_limit(addressing))
+                                  if CHANNEL_MAP_AVAILABLE else None)
+        
         # Aseta FPS
         bpy.context.scene.render.fps = props.fps
         
         processed_events = 0
-        
+
+        # RGBW-tapahtumat kerätään ja sekoitetaan lopuksi kerralla
+        # {light_name: {'light': obj, 'frames': [], 'components': [], 'velocities': []}}
+        rgbw_events = {}
+
         for track_num, track in enumerate(midi_file.tracks):
             track_time = 0
             
@@ -341,10 +394,14 @@ class MIDI_OT_import_midi(Operator):
                 track_time += msg.time
                 
                 if hasattr(msg, 'type') and msg.type == 'note_on':
-                    channel = msg.note - 69
-                    
-                    # Laajempi kanava-alue: 1-45 (savukoneet 41-45)
-                    if channel < 1 or channel > 45:
+                    # Laajempi kanava-alue: 1-45 (savukoneet 41-45), isompi riggi vain osoituksella
+                    if addressing is not None:
+                        channel = midi_addressing.import_channel(addressing, port, msg.channel, msg.note, 45)
+                    else:
+                        channel = msg.note - 69
+                        if channel < 1 or channel > 45:
+                            continue
+                    if channel is None:
                         continue
                     
                     velocity = msg.velocity
@@ -357,8 +414,8 @@ class MIDI_OT_import_midi(Operator):
                         processed_events += 1
                         continue
                     
-                    # Normaali valokanava (1-40)
-                    if channel > 40:
+                    # Normaali valokanava (1-40, osoituksella koko riggi)
+                    if channel > 40 and (addressing is None or addressing.mode == midi_addressing.MODE_LEGACY):
                         continue
                     
                     # Hae tai luo valo
@@ -366,6 +423,19 @@ class MIDI_OT_import_midi(Operator):
                     if not light_obj:
                         continue
                     
+                    # Vektoroitu polku: kerää RGBW-tapahtumat myöhempää sekoitusta varten
+                    if RGBW_MIXING_AVAILABLE:
+                        rgbw_channels = rgbw_mixing.get_rgbw_channels(light_obj.name)
+                        if rgbw_channels and channel in rgbw_channels:
+                            events = rgbw_events.setdefault(light_obj.name, {
+                                'light': light_obj, 'frames': [], 'components': [], 'velocities': []
+                            })
+                            events['frames'].append(frame)
+                            events['components'].append(rgbw_channels.index(channel))
+                            events['velocities'].append(velocity)
+                            processed_events += 1
+                            continue
+
                     # Tarkista onko RGBW-valo
                     rgbw_intensity = update_rgbw_color(light_obj, channel, velocity)
                     if rgbw_intensity is not False:
@@ -382,7 +452,11 @@ class MIDI_OT_import_midi(Operator):
                         light_obj.data.keyframe_insert(data_path="energy", frame=frame)
                     
                     processed_events += 1
-        
+
+        # Sekoita kaikkien RGBW-valojen värit kerralla ja aseta keyframet
+        if rgbw_events:
+            self.apply_rgbw_events(rgbw_events, props)
+
         # Aseta animaation pituus
         if processed_events > 0:
             max_frame = max(1, int(track_time / midi_file.ticks_per_beat * props.fps * 0.5))
@@ -395,10 +469,44 @@ class MIDI_OT_import_midi(Operator):
             print(f"✅ Tuonti valmis! {processed_events} tapahtumaa, {max_frame} framea")
         
         return True
-    
+
+    def apply_rgbw_events(self, rgbw_events, props):
+        """Sekoittaa kerätyt RGBW-tapahtumat kerralla ja asettaa keyframet"""
+        global addon_rgbw_channel_states
+
+        # Tila jokaisen tapahtuman jälkeen, kaikki valot yhteen taulukkoon
+        light_names = list(rgbw_events.keys())
+        all_states = [
+            rgbw_mixing.rgbw_states_from_events(rgbw_events[name]['components'],
+                                                rgbw_events[name]['velocities'])
+            for name in light_names
+        ]
+        rgb, intensity = rgbw_mixing.mix_rgbw_to_rgb(np.concatenate(all_states))
+
+        offset = 0
+        for name, states in zip(light_names, all_states):
+            light_obj = rgbw_events[name]['light']
+            for i, frame in enumerate(rgbw_events[name]['frames']):
+                light_obj.data.color = rgb[offset + i].tolist()
+                light_obj.data.energy = self.velocity_to_energy(int(intensity[offset + i]), props.max_wattage)
+                light_obj.data.keyframe_insert(data_path="color", frame=frame)
+                light_obj.data.keyframe_insert(data_path="energy", frame=frame)
+            offset += len(states)
+
+            # Pidä globaali tila ajan tasalla (esim. myöhempiä yksittäisiä päivityksiä varten)
+            addon_rgbw_channel_states[name] = rgbw_mixing.states_to_dict(states[-1])
+            print(f"🎨 Add-on: {name}: {len(states)} RGBW-tapahtumaa sekoitettu")
+
     def get_or_create_light(self, channel, props):
         """Hakee tai luo valon - VAIN Lights collectionista"""
         
+        # Valmis kanavamappaus: ei nimien läpikäyntiä regexeillä
+        scene_channel_map = getattr(self, 'scene_channel_map', None)
+        if scene_channel_map is not None:
+            light_obj = channel_map.mapped_collection_light(scene_channel_map, channel)
+            if light_obj is not None:
+                return light_obj
+        
         print(f"🔍 Etsitään valoa kanavalle {channel} VAIN Lights collectionista")
         
         # Etsi Lights collection
@@ -620,7 +728,16 @@ class MIDI_OT_export_json(Operator):
     
     def scan_blender_lights(self, context):
         """Skannaa Blenderin valot"""
+        global addon_light_exporter
         props = context.scene.midi_light_props
+        
+        if FAST_EXPORT_AVAILABLE:
+            # Nopea polku: kaikki valot kerralla foreach_get:llä
+            if addon_light_exporter is None:
+                addon_light_exporter = FastLightExporter(max_channel=channel_map.channel_limit(ADDRESSING))
+            addon_light_exporter.max_wattage = props.max_wattage
+            return addon_light_exporter.scan()
+        
         channels = {}
         
         # RGBW-mappings
@@ -633,6 +750,11 @@ class MIDI_OT_export_json(Operator):
             "RGBW 37-40": [37, 38, 39, 40],
         }
         
+        # Kanavamerkinnät valojärjestyksessä: ('single', kanava, velocity) tai ('rgbw', kanavat, indeksi)
+        entries = []
+        rgbw_colors = []
+        rgbw_energies = []
+
         for obj in bpy.data.objects:
             if obj.type != 'LIGHT' or obj.data.energy <= 1.001:
                 continue
@@ -647,21 +769,26 @@ class MIDI_OT_export_json(Operator):
                 continue
             
             if len(channel_list) == 4:
-                # RGBW-ryhmä
-                rgbw_values = self.analyze_rgbw_color(color, energy, props.max_wattage)
-                
-                for i, channel in enumerate(channel_list):
-                    channel_energy = rgbw_values[i] * props.max_wattage
-                    velocity = self.energy_to_velocity(channel_energy, props.max_wattage)
-                    
-                    if velocity > 0:
-                        channels[str(channel)] = velocity
+                # RGBW-ryhmä: puretaan kaikki kerralla silmukan jälkeen
+                entries.append(('rgbw', channel_list, len(rgbw_colors)))
+                rgbw_colors.append(color[:3])
+                rgbw_energies.append(energy)
                         
             elif len(channel_list) == 1:
                 # Yksittäinen kanava
                 channel = channel_list[0]
                 velocity = self.energy_to_velocity(energy, props.max_wattage)
-                channels[str(channel)] = velocity
+                entries.append(('single', channel, velocity))
+
+        rgbw_velocities = self.rgbw_velocities_bulk(rgbw_colors, rgbw_energies, props.max_wattage)
+
+        for kind, channel_info, value in entries:
+            if kind == 'single':
+                channels[str(channel_info)] = value
+                continue
+            for channel, velocity in zip(channel_info, rgbw_velocities[value]):
+                if velocity > 0:
+                    channels[str(channel)] = int(velocity)
         
         return channels
     
@@ -689,6 +816,26 @@ class MIDI_OT_export_json(Operator):
         
         return []
     
+    def rgbw_velocities_bulk(self, colors, energies, max_wattage):
+        """Laskee kaikkien RGBW-valojen kanavavelocityt kerralla (n, 4)"""
+        if not colors:
+            return []
+        
+        if not RGBW_MIXING_AVAILABLE:
+            # Varapolku ilman numpya: valo kerrallaan
+            result = []
+            for color, energy in zip(colors, energies):
+                rgbw_values = self.analyze_rgbw_color(color, energy, max_wattage)
+                result.append([self.energy_to_velocity(v * max_wattage, max_wattage) for v in rgbw_values])
+            return result
+        
+        factors = rgbw_mixing.energy_factors(energies, max_wattage)
+        levels = rgbw_mixing.decompose_rgb_to_rgbw(colors, factors, white_factor=0.6)
+        
+        # Sama kuin energy_to_velocity: alle 1.001 W = 0, muuten vähintään 1
+        velocities = np.clip(rgbw_mixing.levels_to_velocities(levels), 1, 127)
+        return np.where(levels * max_wattage > 1.001, velocities, 0)
+    
     def analyze_rgbw_color(self, color, energy, max_wattage):
         """Jakaa RGB-värin RGBW-kanaviin"""
         r, g, b = color[:3]
@@ -20,6 +20,16 @@ import bmesh
 import os
 import sys
 
+# Yhteinen vektoroitu RGBW-moduuli samasta hakemistosta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
+import rgbw_mixing
+import channel_map
+
+# MIDI-osoitus (portti, MIDI-kanava, nuotti → kanava) repon juuresta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import midi_addressing
+
 # Lisää mido polkuun jos ei löydy
 try:
     import mido
@@ -35,6 +45,9 @@ FPS = 24  # Blenderin framerate
 MAX_WATTAGE = 300  # Maksimi teho watteina
 RGBW_GROUPS = True  # True = käytä RGBW-ryhmiä, False = yksittäiset spotit
 
+# Kanava → valo -hakutaulu, ladataan kerran tuonnin alussa (channel_map.py)
+scene_channel_map = None
+
 def clear_animation():
     """Tyhjennä kaikki animaatiot ja keyframet"""
     global rgbw_channel_states
@@ -64,6 +77,12 @@ def create_light(name, location=(0, 0, 2)):
 def get_or_create_light(channel):
     """Hakee valon VAIN Lights collectionista - ei luo uusia!"""
     
+    # Valmis kanavamappaus: ei nimien läpikäyntiä regexeillä
+    if scene_channel_map is not None:
+        light_obj = channel_map.mapped_collection_light(scene_channel_map, channel)
+        if light_obj is not None:
+            return light_obj
+    
     print(f"🔍 Etsitään valoa kanavalle {channel} Lights collectionista")
     
     # Etsi Lights collection
@@ -224,6 +243,33 @@ def update_rgbw_color(light_obj, channel, velocity):
     print(f"💡 {light_name}: RGB({final_r:.2f}, {final_g:.2f}, {final_b:.2f}) energia={energy:.1f}W")
     return True
 
+def apply_rgbw_events(rgbw_events):
+    """Sekoittaa kerätyt RGBW-tapahtumat kaikille valoille kerralla ja asettaa keyframet"""
+    if not rgbw_events:
+        return
+    
+    light_names = list(rgbw_events.keys())
+    all_states = [
+        rgbw_mixing.rgbw_states_from_events(rgbw_events[name]['components'],
+                                            rgbw_events[name]['velocities'])
+        for name in light_names
+    ]
+    rgb, intensity = rgbw_mixing.mix_rgbw_to_rgb(np.concatenate(all_states))
+    
+    offset = 0
+    for name, states in zip(light_names, all_states):
+        light_obj = rgbw_events[name]['light']
+        for i, frame in enumerate(rgbw_events[name]['frames']):
+            light_obj.data.color = rgb[offset + i].tolist()
+            light_obj.data.energy = velocity_to_energy(int(intensity[offset + i]))
+            light_obj.data.keyframe_insert(data_path="color", frame=frame)
+            light_obj.data.keyframe_insert(data_path="energy", frame=frame)
+        offset += len(states)
+        
+        # Pidä globaali tila ajan tasalla
+        rgbw_channel_states[name] = rgbw_mixing.states_to_dict(states[-1])
+        print(f"🎨 {name}: {len(states)} RGBW-tapahtumaa sekoitettu")
+
 def import_midi_to_blender(midi_path):
     """Pääfunktio: tuo MIDI-tiedosto Blenderiin"""
     
@@ -242,6 +288,15 @@ def import_midi_to_blender(midi_path):
     # Tyhjennä vanhat animaatiot
     clear_animation()
     
+    # Osoitus: addressing.json tiedoston vieressä (muuten nuotti = 69 + kanava),
+    # porttitiedosto (_port2.mid) kertoo portin
+    addressing = midi_addressing.load_sidecar(midi_path)
+    port = midi_addressing.port_of_file(midi_path)
+    
+    # Lataa .blendin kanavamappaus kerran koko tuonnille (osoituksen kanavarajalla)
+    global scene_channel_map
+    scene_channel_map = channel_map.load_scene_map(max_channel=channel_map.channel_limit(addressing))
+    
     # Aseta Blenderin FPS
     bpy.context.scene.render.fps = FPS
     
@@ -251,6 +306,9 @@ def import_midi_to_blender(midi_path):
     current_time = 0
     processed_events = 0
     
+    # RGBW-tapahtumat kerätään ja sekoitetaan lopuksi kerralla
+    rgbw_events = {}
+    
     for track_num, track in enumerate(midi_file.tracks):
         print(f"📊 Käsitellään track {track_num}: {len(track)} viestiä")
         
@@ -260,11 +318,11 @@ def import_midi_to_blender(midi_path):
             track_time += msg.time
             
             if hasattr(msg, 'type') and msg.type == 'note_on':
-                # Muunna MIDI-nuotti kanavaksi (nuotti 70 = kanava 1)
-                channel = msg.note - 69
-                
-                if channel < 1 or channel > 40:
-                    continue  # Scene Setter tukee kanavia 1-40
+                # Muunna MIDI-nuotti kanavaksi (legacy: nuotti 70 = kanava 1)
+                # Scene Setter tukee kanavia 1-40, isompi riggi vain osoituksella
+                channel = midi_addressing.import_channel(addressing, port, msg.channel, msg.note, 40)
+                if channel is None:
+                    continue
                 
                 velocity = msg.velocity
                 
@@ -277,10 +335,15 @@ def import_midi_to_blender(midi_path):
                     continue
                 
                 # Tarkista onko RGBW-valo
-                if update_rgbw_color(light_obj, channel, velocity):
-                    # RGBW-värinsekoitus käsitelty, aseta keyframet väreille ja energialle
-                    light_obj.data.keyframe_insert(data_path="color", frame=frame)
-                    light_obj.data.keyframe_insert(data_path="energy", frame=frame)
+                rgbw_channels = rgbw_mixing.get_rgbw_channels(light_obj.name)
+                if rgbw_channels and channel in rgbw_channels:
+                    # RGBW: kerää tapahtuma, värit sekoitetaan kerralla lopuksi
+                    events = rgbw_events.setdefault(light_obj.name, {
+                        'light': light_obj, 'frames': [], 'components': [], 'velocities': []
+                    })
+                    events['frames'].append(frame)
+                    events['components'].append(rgbw_channels.index(channel))
+                    events['velocities'].append(velocity)
                 else:
                     # Tavallinen valo - pelkkä energia
                     energy = velocity_to_energy(velocity)
@@ -291,6 +354,9 @@ def import_midi_to_blender(midi_path):
                 
                 print(f"💡 Frame {frame}: Kanava {channel} ({light_obj.name}) (velocity {velocity})")
     
+    # Sekoita kaikkien RGBW-valojen värit kerralla ja aseta keyframet
+    apply_rgbw_events(rgbw_events)
+    
     # Aseta animaation pituus
     max_frame = max(1, int(track_time / midi_file.ticks_per_beat * FPS * 0.5))
     bpy.context.scene.frame_end = max_frame
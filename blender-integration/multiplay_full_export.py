@@ -16,14 +16,30 @@ Tukee sinun ammattilaisjärjestelmää:
 import bpy
 import json
 import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from smf_probe import probe_durations
+import midi_addressing
+import generation_client
+
 # ESP32 Savukone API (Primary control via Multiplay)
 ESP32_BASE_URL = "http://192.168.1.100"  # ESP32 IP oikeassa WiFi-verkossa
 
 # Robotti-kaukolaukaisin (Backup/Manual only)  
 ROBOT_BACKUP_NOTE = "Robotti toimii IR/Radio backupina - ei WiFi-yhteyttä Multiplayn kanssa"
 
+# Show Running -odotus kun fade-tiedostoja ei (vielä) ole mitattavissa
+DEFAULT_SHOW_WAIT = 30.0
+
+# Valojen MIDI-laite ja osoitus (None = nuotti 69 + kanava, yksi portti).
+# Esim. {"mode": "banked", "midi_channels": 2, "ports": 2} tai polku addressing.json:iin -
+# portti n soitetaan laitteelle "<MIDI_DEVICE>_<n+1>"
+MIDI_DEVICE = "Scene_Setter_USB"
+ADDRESSING = None
+
 # Savukoneiden + silmien mapping  
 SMOKE_MACHINE_MAP = {
     41: {"name": "Smoke_Front_Left", "endpoint": "/set-eye-state", "eye_state": "smoke"},
@@ -155,8 +171,28 @@ def energy_to_velocity(energy):
     """Muuntaa energia velocity:ksi"""
     return min(127, int((energy / 300.0) * 127))
 
-def create_multiplay_cue_list(lights_data, smoke_data, scene_name="Blender_Scene"):
-    """Luo Multiplay Cue List JSON"""
+def midi_port_actions(file_name, ports):
+    """MIDI-toiminnot jokaiselle portille: portti 0 = MIDI_DEVICE, muut MIDI_DEVICE_<n+1>"""
+    return [
+        {
+            "type": "midi",
+            "file": midi_addressing.port_filename(file_name, port),
+            "device": MIDI_DEVICE if port == 0 else f"{MIDI_DEVICE}_{port + 1}"
+        }
+        for port in range(ports)
+    ]
+
+def create_multiplay_cue_list(lights_data, smoke_data, scene_name="Blender_Scene", midi_dir=None,
+                              addressing=None):
+    """
+    Luo Multiplay Cue List JSON
+
+    midi_dir: kansio jossa generoidut fade-tiedostot ovat - niiden kestot
+    mitataan (smf_probe) ja täytetään cueihin. Puuttuva tiedosto → oletukset.
+    addressing: midi_addressing-asetukset - usean portin riggissä valocuet
+    soittavat jokaisen porttitiedoston rinnakkain omalle laitteelleen.
+    """
+    ports = midi_addressing.from_spec(addressing).ports if addressing else 1
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
@@ -167,6 +203,14 @@ def create_multiplay_cue_list(lights_data, smoke_data, scene_name="Blender_Scene
         "cues": []
     }
     
+    fade_in_file = f"{scene_name}_fade_in.mid"
+    fade_out_file = f"{scene_name}_fade_out.mid"
+    durations = {}
+    if midi_dir:
+        measured = probe_durations([os.path.join(midi_dir, name) for name in (fade_in_file, fade_out_file)])
+        durations = {os.path.basename(path): duration for path, duration in measured.items()
+                     if duration is not None}
+    
     cue_number = 1.0
     
     # Cue 1: Fade In Lights
@@ -176,11 +220,17 @@ def create_multiplay_cue_list(lights_data, smoke_data, scene_name="Blender_Scene
             "name": "Lights Fade In",
             "type": "midi",
             "action": "play_file",
-            "file": f"{scene_name}_fade_in.mid",
-            "device": "Scene_Setter_USB",
+            "file": fade_in_file,
+            "device": MIDI_DEVICE,
             "wait": 0.0,
             "notes": f"MIDI channels: {', '.join(lights_data.keys())}"
         }
+        if ports > 1:
+            del lights_cue["action"], lights_cue["file"], lights_cue["device"]
+            lights_cue["type"] = "parallel"
+            lights_cue["actions"] = midi_port_actions(fade_in_file, ports)
+        if fade_in_file in durations:
+            lights_cue["duration"] = round(durations[fade_in_file], 3)
         cue_list["cues"].append(lights_cue)
         cue_number += 0.5
     
@@ -202,14 +252,27 @@ def create_multiplay_cue_list(lights_data, smoke_data, scene_name="Blender_Scene
             cue_list["cues"].append(smoke_cue)
             cue_number += 0.1
     
-    # Cue 3: Wait for show duration
-    wait_cue = {
-        "number": cue_number + 1.0,
-        "name": "Show Running",
-        "type": "wait",
-        "duration": 30.0,  # 30s oletus
-        "notes": "Adjust duration based on scene length"
-    }
+    # Cue 3: Wait for show duration - fade-in ja savupulssit valmiiksi
+    measured_waits = []
+    if lights_data and fade_in_file in durations:
+        measured_waits.append(durations[fade_in_file])
+        measured_waits.extend(smoke_info["duration"] for smoke_info in (smoke_data or {}).values())
+    if measured_waits:
+        wait_cue = {
+            "number": cue_number + 1.0,
+            "name": "Show Running",
+            "type": "wait",
+            "duration": round(max(measured_waits), 3),
+            "notes": f"Measured from {fade_in_file} and smoke pulses"
+        }
+    else:
+        wait_cue = {
+            "number": cue_number + 1.0,
+            "name": "Show Running",
+            "type": "wait",
+            "duration": DEFAULT_SHOW_WAIT,
+            "notes": "Adjust duration based on scene length"
+        }
     cue_list["cues"].append(wait_cue)
     
     # Cue 4: Fade Out All
@@ -217,12 +280,7 @@ def create_multiplay_cue_list(lights_data, smoke_data, scene_name="Blender_Scene
         "number": cue_number + 2.0,
         "name": "Fade Out All",
         "type": "parallel",
-        "actions": [
-            {
-                "type": "midi",
-                "file": f"{scene_name}_fade_out.mid",
-                "device": "Scene_Setter_USB"
-            },
+        "actions": midi_port_actions(fade_out_file, ports) + [
             {
                 "type": "http_post",
                 "url": f"{ESP32_BASE_URL}/smoke/all_off",
@@ -231,6 +289,10 @@ def create_multiplay_cue_list(lights_data, smoke_data, scene_name="Blender_Scene
         ],
         "notes": "Simultaneous fadeout of lights and smoke"
     }
+    if fade_out_file in durations:
+        fadeout_cue["duration"] = round(durations[fade_out_file], 3)
+        for action in fadeout_cue["actions"][:ports]:
+            action["duration"] = fadeout_cue["duration"]
     cue_list["cues"].append(fadeout_cue)
     
     return cue_list
@@ -257,21 +319,36 @@ def export_full_show(scene_name="Blender_Scene"):
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
-    # 1. Vie MIDI (valot)
+    # 1. Vie ja generoi MIDI (valot) - fade-tiedostot ennen cue-listaa, jotta kestot voidaan mitata
+    midi_generated = False
     if lights_data:
         midi_json = {
-            "scene_name": scene_name,
-            "channels": lights_data,
-            "fade_in_duration": 2.0,
-            "fade_out_duration": 3.0, 
-            "steps": 20
+            "scenes": [{
+                "name": scene_name,
+                "channels": lights_data,
+                "fade_in_duration": 2.0,
+                "fade_out_duration": 3.0,
+                "steps": 20
+            }],
+            "outputDir": output_dir
         }
+        if ADDRESSING:
+            midi_json["addressing"] = ADDRESSING
         
         midi_file = f"{output_dir}/{scene_name}_lights_{timestamp}.json"
         with open(midi_file, 'w') as f:
             json.dump(midi_json, f, indent=2)
         
         print(f"💾 MIDI JSON: {midi_file}")
+        
+        client = generation_client.default_client()
+        result = client.generate(midi_json)
+        if result.get('success'):
+            midi_generated = True
+            print(f"🎵 MIDI-tiedostot luotu: {scene_name}_fade_in.mid, {scene_name}_fade_out.mid "
+                  f"({client.last_route})")
+        else:
+            print(f"❌ MIDI-generointi epäonnistui: {result.get('error', 'Tuntematon virhe')}")
     
     # 2. Vie HTTP-skriptit (savukoneet)
     if smoke_data:
@@ -288,7 +365,10 @@ def export_full_show(scene_name="Blender_Scene"):
         print(f"💾 HTTP JSON: {http_file}")
     
     # 3. Vie Multiplay Cue List
-    cue_list = create_multiplay_cue_list(lights_data, smoke_data, scene_name)
+    # Kestot mitataan juuri generoiduista fade-tiedostoista (ei koskaan vanhoista samannimisistä)
+    cue_list = create_multiplay_cue_list(lights_data, smoke_data, scene_name,
+                                         midi_dir=output_dir if midi_generated else None,
+                                         addressing=ADDRESSING)
     
     cue_file = f"{output_dir}/{scene_name}_multiplay_{timestamp}.json"
     with open(cue_file, 'w') as f:
@@ -299,8 +379,11 @@ def export_full_show(scene_name="Blender_Scene"):
     # 4. Tulosta ohje
     print("\n🎬 MULTIPLAY SETUP:")
     print("=" * 30)
-    print("1. Generate MIDI files:")
-    print(f"   python3 midimaker5.py {midi_file}")
+    if lights_data and not midi_generated:
+        print("1. Generate MIDI files:")
+        print(f"   python3 valot_python_backend.py < {midi_file}")
+    else:
+        print(f"1. MIDI files: {output_dir}")
     print("2. Upload .mid files to Multiplay")  
     print("3. Import cue list JSON to Multiplay")
     print("4. Configure ESP32 IP address")
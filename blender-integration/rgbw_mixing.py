@@ -0,0 +1,127 @@
+"""
+🎨 RGBW Color Mixing - yhteinen vektoroitu värimoduuli
+
+Yhteinen RGBW-värinsekoitus kaikille tuonneille ja vienneille.
+Käsittelee kokonaisen valorigin kerralla NumPy-taulukoina
+(valot × framet × kanavat) sen sijaan että jokainen valo ja jokainen
+MIDI-tapahtuma laskettaisiin erikseen.
+
+Suunnat:
+- Tuonti (MIDI → Blender): RGBW-velocityt → RGB-väri + intensiteetti
+- Vienti (Blender → MIDI): RGB-väri + energia → RGBW-tasot / velocityt
+
+Käyttö:
+    from rgbw_mixing import mix_rgbw_to_rgb, decompose_rgb_to_rgbw
+
+    rgb, intensity = mix_rgbw_to_rgb(states)          # states: (..., 4)
+    levels = decompose_rgb_to_rgbw(colors, factors)   # colors: (..., 3)
+
+Vaatimukset: numpy (sisältyy Blenderiin)
+"""
+
+import re
+
+import numpy as np
+
+MAX_VELOCITY = 127
+
+# Valkoinen kanava lisää kaikkia värejä tällä kertoimella (tuontilogiikka)
+WHITE_MIX = 0.8
+
+# RGBW-komponenttien järjestys taulukoissa
+RGBW_COMPONENTS = ('r', 'g', 'b', 'w')
+
+RGBW_NAME_PATTERN = re.compile(r'RGBW\s+(\d+)-(\d+)')
+
+
+def get_rgbw_channels(light_name):
+    """Palauttaa RGBW-valon kanavanumerot [r, g, b, w] tai None jos ei ole RGBW"""
+    match = RGBW_NAME_PATTERN.search(light_name)
+    if match:
+        start_channel = int(match.group(1))
+        end_channel = int(match.group(2))
+        if end_channel - start_channel == 3:  # Tarkista että on 4 kanavaa
+            return [start_channel, start_channel + 1, start_channel + 2, start_channel + 3]
+    return None
+
+
+def mix_rgbw_to_rgb(rgbw_velocities, white_mix=WHITE_MIX):
+    """
+    Sekoittaa RGBW-velocityt RGB-väriksi (MIDI → Blender)
+
+    rgbw_velocities: taulukko muotoa (..., 4), arvot 0-127
+    Palauttaa (rgb, intensity):
+    - rgb: (..., 3) väri välillä 0.0-1.0
+    - intensity: (...) suurin kanava-arvo (velocity), käytetään energiaan
+    """
+    velocities = np.asarray(rgbw_velocities, dtype=np.float64)
+    levels = velocities / MAX_VELOCITY
+
+    # Valkoinen kanava lisää kaikkia värejä
+    rgb = np.minimum(1.0, levels[..., :3] + levels[..., 3:4] * white_mix)
+
+    # Kokonaisteho = max(suurin väri, valkoinen) = suurin neljästä
+    intensity = velocities.max(axis=-1)
+
+    return rgb, intensity
+
+
+def decompose_rgb_to_rgbw(rgb_colors, intensity=1.0, white_factor=1.0):
+    """
+    Purkaa RGB-värit RGBW-tasoiksi (Blender → MIDI)
+
+    rgb_colors: taulukko muotoa (..., 3), arvot 0.0-1.0
+    intensity: skalaari tai (...) - energiakerroin 0.0-1.0
+    white_factor: kuinka suuri osa pienimmästä RGB-arvosta siirretään
+                  valkoiselle kanavalle (1.0 = koko yhteinen osa)
+    Palauttaa (..., 4) RGBW-tasot välillä 0.0-1.0
+    """
+    colors = np.asarray(rgb_colors, dtype=np.float64)[..., :3]
+
+    # Valkoisen komponentti = pienin RGB-arvo (kerrottuna)
+    white = colors.min(axis=-1, keepdims=True) * white_factor
+
+    # Poista valkoinen puhtaista väreistä
+    pure = np.maximum(0.0, colors - white)
+
+    levels = np.concatenate([pure, white], axis=-1)
+    return levels * np.asarray(intensity, dtype=np.float64)[..., np.newaxis]
+
+
+def levels_to_velocities(levels):
+    """Muuntaa tasot 0.0-1.0 MIDI velocity-arvoiksi 0-127 (katkaisu kuten int())"""
+    velocities = np.floor(np.asarray(levels, dtype=np.float64) * MAX_VELOCITY)
+    return np.clip(velocities, 0, MAX_VELOCITY).astype(np.int32)
+
+
+def energy_factors(energies, max_wattage):
+    """Muuntaa Blenderin energiat (W) intensiteettikertoimiksi 0.0-1.0"""
+    return np.minimum(1.0, np.asarray(energies, dtype=np.float64) / max_wattage)
+
+
+def rgbw_states_from_events(components, velocities):
+    """
+    Laskee RGBW-tilan jokaisen MIDI-tapahtuman jälkeen (yhdelle valolle)
+
+    components: (n,) komponentin indeksi 0-3 (r, g, b, w) tapahtumittain
+    velocities: (n,) velocity tapahtumittain
+    Palauttaa (n, 4) taulukon: kaikkien neljän kanavan arvo tapahtuman i jälkeen.
+    Vastaa update_rgbw_color-kutsujen sarjaa, mutta kerralla.
+    """
+    components = np.asarray(components, dtype=np.int64)
+    velocities = np.asarray(velocities, dtype=np.float64)
+    event_index = np.arange(len(components))
+
+    states = np.zeros((len(components), len(RGBW_COMPONENTS)), dtype=np.float64)
+    for component in range(len(RGBW_COMPONENTS)):
+        # Viimeisin tämän komponentin tapahtuma kohdassa i (tai -1)
+        last_event = np.where(components == component, event_index, -1)
+        last_event = np.maximum.accumulate(last_event) if len(last_event) else last_event
+        states[:, component] = np.where(last_event >= 0, velocities[last_event], 0.0)
+
+    return states
+
+
+def states_to_dict(state):
+    """Muuntaa yhden (4,) RGBW-tilan sanakirjaksi {'r': .., 'g': .., 'b': .., 'w': ..}"""
+    return {name: int(value) for name, value in zip(RGBW_COMPONENTS, state)}
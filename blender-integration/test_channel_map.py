@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+🧪 Channel Map Test - kanavamappaus ja osoituksen kanavaraja ilman Blenderiä
+
+1. Kanavaraja: ilman osoitusta / legacy 40, banked-osoituksella koko riggi
+2. Tuonti: osoitettu kanava yli 40 säilyy, legacy-tiedostossa ei
+3. Tiedosto: uudelleenrakennus vain nimien muuttuessa, ulkoinen jako säilyy eri rajoilla
+
+Käyttö:
+    python3 test_channel_map.py      (tai python3 -m pytest test_channel_map.py)
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import channel_map
+import midi_addressing
+
+BANKED = {"mode": "banked", "midi_channels": 2, "ports": 2}
+
+
+def test_channel_limit():
+    """Ilman osoitusta ja legacy-osoituksella Scene Setterin 40, muuten osoituksen max_channel"""
+    print("🧪 Kanavaraja")
+    assert channel_map.channel_limit(None) == channel_map.MAX_CHANNEL == 40
+    assert channel_map.channel_limit("legacy") == 40
+    assert channel_map.channel_limit(BANKED) == 232
+    assert channel_map.channel_limit(midi_addressing.from_spec(BANKED)) == 232
+
+    names = ["Spot_15", "Spot_60", "RGBW_20_White"]
+    default = channel_map.ChannelMap.build(names)
+    assert default.channels_for("Spot_15") == [15] and default.channels_for("Spot_60") == []
+    assert default.light_for(60) is None
+    wide = default.limited(channel_map.channel_limit(BANKED))
+    assert wide.channels_for("Spot_60") == [60] and wide.channels_for("RGBW_20_White") == [80]
+    print("   ✅ 40 / 232 kanavaa")
+
+
+def test_addressed_channel_survives_import():
+    """Tuonnin kanava: banked-osoituksella kanava 60 säilyy, legacy-tiedostossa nuotti 129 ei ole kanava"""
+    print("🧪 Tuonnin kanavat")
+    banked = midi_addressing.from_spec(BANKED)
+    port, midi_channel, note = banked.address(60)
+    assert midi_addressing.import_channel(banked, port, midi_channel, note, 40) == 60
+    port, midi_channel, note = banked.address(232)
+    assert midi_addressing.import_channel(banked, port, midi_channel, note, 40) == 232
+
+    legacy = midi_addressing.from_spec(None)
+    assert midi_addressing.import_channel(legacy, 0, 0, 69 + 40, 40) == 40
+    assert midi_addressing.import_channel(legacy, 0, 0, 69 + 41, 40) is None
+    assert midi_addressing.import_channel(legacy, 0, 0, 69 + 45, 45) == 45   # Savukoneet add-onissa
+    assert midi_addressing.import_channel(legacy, 0, 0, 69, 40) is None
+    print("   ✅ osoitettu kanava 60 ja 232 säilyvät, legacy 1-40")
+
+
+def read_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_rebuild_only_on_name_change():
+    """Sama nimilista → tiedosto ja auto_channel_mapperin jako säilyvät rajasta riippumatta"""
+    print("🧪 Mappaustiedoston uudelleenrakennus")
+    names = ["RGBW 13-16", "Spot_21", "Spot_60"]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'teatteri.channels.json')
+
+        mapping = channel_map.load_scene_map(names, path)
+        assert mapping.channels_for("RGBW 13-16") == [13, 14, 15, 16]
+        assert mapping.channels_for("Spot_60") == [] and mapping.light_for(21) == "Spot_21"
+        wide = channel_map.load_scene_map(names, path, max_channel=channel_map.channel_limit(BANKED))
+        assert wide.channels_for("Spot_60") == [60] and wide.light_for(60) == "Spot_60"
+        assert mapping.channels_for("Spot_60") == []   # Aiempi mappaus pitää oman rajansa
+
+        # Ulkoinen jako: eri rajoilla lataaminen ei rakenna eikä kirjoita tiedostoa uudelleen
+        assigned = {"RGBW 13-16": [1, 2, 3, 4], "Spot_21": [5], "Spot_60": [90]}
+        channel_map.store_scene_map(assigned, "auto_channel_mapper", names, path)
+        stored = read_file(path)
+        channel_map._scene_map = None   # Pakota luku tiedostosta
+        for limit in (channel_map.MAX_CHANNEL, 232, channel_map.MAX_CHANNEL):
+            mapping = channel_map.load_scene_map(names, path, max_channel=limit)
+            assert mapping.source == "auto_channel_mapper"
+            assert mapping.channels_for("Spot_21") == [5]
+            assert mapping.channels_for("Spot_60") == ([90] if limit >= 90 else [])
+            assert read_file(path) == stored
+
+        # Nimet muuttuvat → rakennetaan nimistä
+        renamed = names + ["Spot_7"]
+        mapping = channel_map.load_scene_map(renamed, path)
+        assert mapping.source == "channel_map" and mapping.channels_for("Spot_21") == [21]
+        assert read_file(path)["names_signature"] == channel_map.names_signature(renamed)
+
+        # Virheellinen tiedosto luodaan uudelleen
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"version": 1, "light_to_channels": {"Spot_7": [0]}}')
+        channel_map._scene_map = None
+        assert channel_map.load_scene_map(renamed, path).channels_for("Spot_7") == [7]
+    channel_map._scene_map = None
+    print("   ✅ jako säilyy, nimien muutos rakentaa uudelleen")
+
+
+if __name__ == "__main__":
+    tests = [test_channel_limit, test_addressed_channel_survives_import, test_rebuild_only_on_name_change]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
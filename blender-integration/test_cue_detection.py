@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+🧪 Cue Detection Test - animaatiomatriisista minimaalinen cue-lista ilman Blenderiä
+
+1. Ramppi → yksi cue, fade-in = rampin kesto, taso = rampin loppu
+2. Kvantisointiportaat (hidas fade) yhdistyvät yhdeksi cueksi
+3. Pimeään päättyvä liike asettaa fade_outin, ei tyhjää kohtausta
+4. Alle tolerancen muutokset eivät luo cueta, asettunut lopputaso säilyy
+
+Käyttö:
+    python3 test_cue_detection.py      (tai python3 -m pytest test_cue_detection.py)
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from cue_detection import detect_cues, find_motion_spans
+
+FPS = 24
+
+
+def timeline(*segments, channels=2):
+    """Rakentaa framet × kanavat -matriisin: segments = [(framemäärä, [alku], [loppu])]"""
+    rows = []
+    for count, start, end in segments:
+        start = np.asarray(start, dtype=np.float64)
+        end = np.asarray(end, dtype=np.float64)
+        for i in range(count):
+            rows.append(np.rint(start + (end - start) * (i + 1) / count))
+    matrix = np.array(rows, dtype=np.int32).reshape(-1, channels)
+    return np.arange(len(matrix)), matrix
+
+
+def test_ramp_becomes_one_cue():
+    """Pimeästä 24 framen ramppi ja pito → yksi cue, fade-in 1 s"""
+    print("🧪 Ramppi")
+    frames, matrix = timeline((10, [0, 0], [0, 0]), (24, [0, 0], [100, 50]), (30, [100, 50], [100, 50]))
+    cues = detect_cues(frames, [1, 2], matrix, FPS)
+    assert len(cues) == 1, cues
+    assert cues[0]['channels'] == {"1": 100, "2": 50}
+    assert abs(cues[0]['fade_in_duration'] - 24 / FPS) < 1e-3
+    assert cues[0]['start_frame'] == 33
+
+    # Valot päällä jo ensimmäisessä framessa → oletus-fade
+    frames, matrix = timeline((20, [80, 0], [80, 0]))
+    cues = detect_cues(frames, [1, 2], matrix, FPS, default_fade_in=2.0)
+    assert [cue['channels'] for cue in cues] == [{"1": 80}] and cues[0]['fade_in_duration'] == 2.0
+    print("   ✅ yksi cue rampin lopputasolla")
+
+
+def test_quantized_steps_merge():
+    """Hidas fade (yksi velocity-askel per 20 framea) on yksi ramppi, ei cue per porras"""
+    print("🧪 Kvantisointiportaat")
+    segments = [(1, [0, 0], [0, 0])]
+    for level in range(1, 11):
+        segments.append((1, [level, 0], [level, 0]))
+        segments.append((19, [level, 0], [level, 0]))   # Porras: 19 framea paikallaan (> min_hold)
+    frames, matrix = timeline(*segments, (30, [10, 0], [10, 0]))
+    assert len(find_motion_spans(matrix)) == 10
+
+    cues = detect_cues(frames, [1, 2], matrix, FPS, tolerance=2)
+    assert len(cues) == 1, cues
+    assert cues[0]['channels'] == {"1": 10}
+    assert cues[0]['fade_in_duration'] > 9 * 19 / FPS
+
+    # Selvä tasanne kahden eri rampin välissä → kaksi cueta
+    frames, matrix = timeline((10, [0, 0], [0, 0]), (12, [0, 0], [60, 0]), (24, [60, 0], [60, 0]),
+                              (12, [60, 0], [60, 90]), (24, [60, 90], [60, 90]))
+    cues = detect_cues(frames, [1, 2], matrix, FPS)
+    assert [cue['channels'] for cue in cues] == [{"1": 60}, {"1": 60, "2": 90}]
+    print("   ✅ 10 porrasta → 1 cue, tasanne erottaa cuet")
+
+
+def test_blackout_sets_fade_out():
+    """Pimeään päättyvä liike: edellisen cuen fade_out = jakson kesto, ei tyhjää kohtausta"""
+    print("🧪 Blackout")
+    frames, matrix = timeline((10, [0, 0], [0, 0]), (12, [0, 0], [120, 0]), (24, [120, 0], [120, 0]),
+                              (36, [120, 0], [0, 0]), (24, [0, 0], [0, 0]))
+    cues = detect_cues(frames, [1, 2], matrix, FPS)
+    assert len(cues) == 1
+    assert abs(cues[0]['fade_out_duration'] - 36 / FPS) < 1e-3
+    print(f"   ✅ fade-out {cues[0]['fade_out_duration']} s")
+
+
+def test_tolerance_and_settled_level():
+    """Alle tolerancen muutos ei ole uusi cue, mutta asettunut lopputaso päätyy viimeiseen"""
+    print("🧪 Toleranssi")
+    frames, matrix = timeline((10, [0, 0], [0, 0]), (12, [0, 0], [100, 0]), (24, [100, 0], [100, 0]),
+                              (6, [100, 0], [102, 0]), (24, [102, 0], [102, 0]))
+    cues = detect_cues(frames, [1, 2], matrix, FPS, tolerance=2)
+    assert len(cues) == 1
+    assert cues[0]['channels'] == {"1": 102}
+
+    cues = detect_cues(frames, [1, 2], matrix, FPS, tolerance=1)
+    assert [cue['channels'] for cue in cues] == [{"1": 100}, {"1": 102}]
+
+    assert detect_cues(np.arange(0), [1, 2], np.zeros((0, 2)), FPS) == []
+    print("   ✅ pieni muutos ei cueta, lopputaso säilyy")
+
+
+if __name__ == "__main__":
+    tests = [test_ramp_becomes_one_cue, test_quantized_steps_merge, test_blackout_sets_fade_out,
+             test_tolerance_and_settled_level]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
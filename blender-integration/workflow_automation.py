@@ -10,12 +10,13 @@ python3 workflow_automation.py example_scenes.json
 import json
 import sys
 import os
-import subprocess
 from pathlib import Path
 
-# Lisää MIDI-generaattorin backend polkuun
+# Generointi: server.py tai backend samassa prosessissa (generation_client.py)
 SCRIPT_DIR = Path(__file__).parent
-BACKEND_PATH = SCRIPT_DIR.parent / "valot_python_backend.py"
+sys.path.append(str(SCRIPT_DIR))
+import generation_client
+
 OUTPUT_DIR = SCRIPT_DIR / "generated_midi"
 
 def generate_midi_from_json(json_file, output_dir=None):
@@ -27,10 +28,6 @@ def generate_midi_from_json(json_file, output_dir=None):
     output_dir = Path(output_dir)
     output_dir.mkdir(exist_ok=True)
     
-    if not BACKEND_PATH.exists():
-        print(f"❌ Python-backend ei löydy: {BACKEND_PATH}")
-        return False
-    
     print(f"🎵 Luodaan MIDI-tiedostoja: {json_file}")
     print(f"📁 Output: {output_dir}")
     
@@ -48,35 +45,27 @@ def generate_midi_from_json(json_file, output_dir=None):
         "outputDir": str(output_dir.absolute())
     }
     
-    # Aja Python-backend
+    # Generoi: käynnissä oleva server.py, muuten backend samassa prosessissa
     try:
-        process = subprocess.run(
-            [sys.executable, str(BACKEND_PATH)],
-            input=json.dumps(backend_data),
-            text=True,
-            capture_output=True
-        )
+        client = generation_client.default_client()
+        result = client.generate(backend_data)
         
-        if process.returncode == 0:
-            result = json.loads(process.stdout)
-            if result.get('success'):
-                print("✅ MIDI-tiedostot luotu onnistuneesti!")
-                print(f"📊 Kohtauksia: {len(result['results'])}")
-                
-                for scene_result in result['results']:
-                    scene_name = scene_result['scene']
-                    fade_in = scene_result['fade_in_file']
-                    fade_out = scene_result['fade_out_file']
-                    print(f"  🎭 {scene_name}: {fade_in}, {fade_out}")
-                
-                return True
-            else:
-                print(f"❌ Backend virhe: {result.get('error', 'Tuntematon virhe')}")
+        if result.get('success'):
+            print(f"✅ MIDI-tiedostot luotu onnistuneesti! ({client.last_route})")
+            print(f"📊 Kohtauksia: {len(result['results'])}")
+            
+            for scene_result in result['results']:
+                scene_name = scene_result['scene']
+                fade_in = scene_result['fade_in_file']
+                fade_out = scene_result['fade_out_file']
+                print(f"  🎭 {scene_name}: {fade_in}, {fade_out}")
+            
+            return True
         else:
-            print(f"❌ Prosessi epäonnistui: {process.stderr}")
+            print(f"❌ Backend virhe: {result.get('error', 'Tuntematon virhe')}")
             
     except Exception as e:
-        print(f"❌ Virhe backend-prosessissa: {e}")
+        print(f"❌ Virhe MIDI-generoinnissa: {e}")
     
     return False
 
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+🎚️ Cue Stack - päällekkäisten fadejen yhdistäminen (HTP/LTP)
+
+Kun kohtaus B laukaistaan kesken kohtauksen A fadea, erikseen generoidut
+tiedostot ohjaisivat samoja nuotteja ristiin. Cue stack pitää kirjaa
+jokaisen kanavan nykyisestä tasosta ja yhdistää käynnissä olevat fadet:
+
+- HTP (highest takes precedence): kanavan taso on suurin cuejen osuuksista,
+  jokainen cue nousee nollasta omaan tasoonsa ja vapautettaessa laskee nollaan
+- LTP (latest takes precedence): viimeisin cue ottaa kanavan ja faidaa sen
+  nykyisestä tasosta omaan tasoonsa; koskemattomat kanavat pysyvät
+
+Tikki käy läpi vain kanavat joilla on fade käynnissä (active), joten
+kustannus ei riipu kanavien tai valmiiden cuejen määrästä.
+Tulos on yksi yhdistetty tapahtumavirta: (time_beats, note, vel, duration)
+kuten valot_python_backendissa, tai live-tilassa suoraan note on -viestit.
+
+Käyttö:
+    stack = CueStack(mode='htp')
+    stack.fire(scene_a, now=0.0)
+    stack.fire(scene_b, now=1.2)
+    stack.release('A', now=3.0)
+    changes = stack.tick(now)          # [(kanava, taso)]
+
+    python3 cue_stack.py esitykset.json "Kalareissu" fire:Aamu@0 fire:Ilta@1.5 release:Aamu@3 -o merged.mid
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from valot_python_backend import (
+    OUTPUT_PROFILES,
+    PROFILE_COMPATIBLE,
+    SECONDS_PER_BEAT,
+    write_fade_file,
+)
+from scene_store import load_presets
+
+MODE_HTP = 'htp'
+MODE_LTP = 'ltp'
+MERGE_MODES = (MODE_HTP, MODE_LTP)
+
+TICK_SECONDS = 0.02     # 50 Hz - sama luokka kuin fade-tiedostojen stepit
+NOTE_ON = 0x90
+
+
+class Fade:
+    """Lineaarinen ramppi from_level → to_level, taso kokonaislukuna kuten backendissä"""
+
+    __slots__ = ('start', 'duration', 'from_level', 'to_level')
+
+    def __init__(self, start, duration, from_level, to_level):
+        self.start = start
+        self.duration = duration
+        self.from_level = from_level
+        self.to_level = to_level
+
+    def level(self, now):
+        if self.duration <= 0 or now >= self.start + self.duration:
+            return self.to_level
+        if now <= self.start:
+            return self.from_level
+        factor = (now - self.start) / self.duration
+        return int(self.from_level + (self.to_level - self.from_level) * factor)
+
+    def done(self, now):
+        return now >= self.start + self.duration
+
+
+class CueStack:
+    """
+    Kanavien nykytasot ja käynnissä olevien cuejen yhdistäminen
+
+    mode: oletussääntö (htp/ltp), channel_modes: {kanava: sääntö} poikkeukset
+    """
+
+    def __init__(self, mode=MODE_HTP, channel_modes=None):
+        if mode not in MERGE_MODES:
+            raise ValueError(f"Tuntematon yhdistämissääntö '{mode}'")
+        self.mode = mode
+        self.channel_modes = {int(ch): m for ch, m in (channel_modes or {}).items()}
+        self.levels = {}          # kanava → lähetetty taso
+        self.contributions = {}   # HTP: kanava → {cue: Fade}
+        self.owners = {}          # LTP: kanava → (cue, Fade)
+        self.cues = {}            # cue → {'channels', 'fade_out', 'released', 'held': kanavia hallussa}
+        self.active = set()       # kanavat joilla fade käynnissä
+
+    def channel_mode(self, channel):
+        return self.channel_modes.get(channel, self.mode)
+
+    def current_level(self, channel, now):
+        """Kanavan taso hetkellä now (ei muuta tilaa)"""
+        if self.channel_mode(channel) == MODE_LTP:
+            owner = self.owners.get(channel)
+            return owner[1].level(now) if owner else self.levels.get(channel, 0)
+        fades = self.contributions.get(channel)
+        return max((fade.level(now) for fade in fades.values()), default=0) if fades else 0
+
+    def fire(self, scene, now, name=None, fade=None, release_others=False):
+        """
+        Laukaisee kohtauksen cuena
+
+        scene: {"name", "channels": {kanava: taso}, "fade_in_duration", "fade_out_duration"}
+        fade: fade-in kesto (oletus kohtauksen fade_in_duration)
+        release_others: vapauta muut cuet samalla kestolla (crossfade)
+        Saman nimen laukaisu uudelleen jatkaa cuen nykytasosta.
+        """
+        name = name or scene['name']
+        duration = scene.get('fade_in_duration', 0.0) if fade is None else fade
+        channels = {int(ch): int(level) for ch, level in scene['channels'].items()}
+
+        if release_others:
+            for other in list(self.cues):
+                if other != name:
+                    self.release(other, now, duration)
+
+        cue = self.cues.get(name)
+        if cue is None:
+            cue = self.cues[name] = {'channels': [], 'held': 0}
+        # Uudelleenlaukaisussa vanhatkin kanavat pysyvät cuen vapautettavina
+        cue.update(channels=list(dict.fromkeys(cue['channels'] + list(channels))),
+                   fade_out=scene.get('fade_out_duration', 0.0), released=False)
+
+        for channel, target in channels.items():
+            if self.channel_mode(channel) == MODE_LTP:
+                start = self.current_level(channel, now)
+                owner = self.owners.get(channel)
+                if owner is None or owner[0] != name:
+                    cue['held'] += 1
+                    if owner is not None:
+                        self._drop(owner[0])
+                self.owners[channel] = (name, Fade(now, duration, start, target))
+            else:
+                fades = self.contributions.setdefault(channel, {})
+                previous = fades.get(name)
+                start = previous.level(now) if previous else 0
+                if previous is None:
+                    cue['held'] += 1
+                fades[name] = Fade(now, duration, start, target)
+            self.active.add(channel)
+
+        return name
+
+    def _drop(self, name):
+        """Cue menetti kanavan; vapautettu cue ilman kanavia poistetaan"""
+        cue = self.cues.get(name)
+        if cue is None:
+            return
+        cue['held'] -= 1
+        if cue['held'] <= 0 and cue['released']:
+            del self.cues[name]
+
+    def release(self, name, now, fade=None):
+        """Vapauttaa cuen: sen osuus (HTP) tai omistamat kanavat (LTP) faidaavat nollaan"""
+        cue = self.cues.get(name)
+        if cue is None or cue['released']:
+            return False
+        duration = cue['fade_out'] if fade is None else fade
+        cue['released'] = True
+
+        for channel in cue['channels']:
+            if self.channel_mode(channel) == MODE_LTP:
+                owner = self.owners.get(channel)
+                if owner and owner[0] == name:
+                    self.owners[channel] = (name, Fade(now, duration, owner[1].level(now), 0))
+                    self.active.add(channel)
+            else:
+                fades = self.contributions.get(channel, {})
+                if name in fades:
+                    fades[name] = Fade(now, duration, fades[name].level(now), 0)
+                    self.active.add(channel)
+
+        if cue['held'] <= 0:
+            del self.cues[name]
+        return True
+
+    def release_all(self, now, fade=None):
+        for name in list(self.cues):
+            self.release(name, now, fade)
+
+    def tick(self, now):
+        """
+        Päivittää aktiiviset kanavat hetkeen now
+
+        Palauttaa muuttuneet tasot [(kanava, taso)]. Valmiit fadet poistuvat
+        aktiivisista ja vapautetut nollaan laskeneet osuudet siivotaan.
+        """
+        changes = []
+        settled = []
+
+        for channel in self.active:
+            if self.channel_mode(channel) == MODE_LTP:
+                name, fade = self.owners[channel]
+                level = fade.level(now)
+                running = not fade.done(now)
+                if not running and self.cues[name]['released']:
+                    del self.owners[channel]
+                    self._drop(name)
+            else:
+                fades = self.contributions[channel]
+                level = 0
+                running = False
+                for name, fade in list(fades.items()):
+                    level = max(level, fade.level(now))
+                    if not fade.done(now):
+                        running = True
+                    elif fade.to_level == 0 and self.cues[name]['released']:
+                        del fades[name]
+                        self._drop(name)
+
+            if level != self.levels.get(channel, 0):
+                self.levels[channel] = level
+                changes.append((channel, level))
+            if not running:
+                settled.append(channel)
+
+        for channel in settled:
+            self.active.discard(channel)
+            if channel in self.contributions and not self.contributions[channel]:
+                del self.contributions[channel]
+
+        return changes
+
+    def status(self):
+        return {
+            'mode': self.mode,
+            'cues': {name: {'channels': len(cue['channels']), 'released': cue['released']}
+                     for name, cue in self.cues.items()},
+            'active_channels': len(self.active),
+            'lit_channels': sum(1 for level in self.levels.values() if level > 0)
+        }
+
+
+def render(stack, actions, tick=TICK_SECONDS):
+    """
+    Laskee toimintolistan yhdistetyksi tapahtumavirraksi ilman reaaliaikaa
+
+    actions: [(sekunnit, 'fire'|'release', kohtaus tai nimi)]
+    Palauttaa backendin tapahtumat (time_beats, note, vel, duration_beats),
+    nuotti = 69 + kanava; jokainen taso soi seuraavaan muutokseen asti.
+    """
+    actions = sorted(actions, key=lambda action: action[0])
+    changes = []   # (sekunnit, kanava, taso)
+    index = 0
+    step = 0
+
+    while index < len(actions) or stack.active:
+        now = step * tick
+        while index < len(actions) and actions[index][0] <= now + 1e-9:
+            _, action, target = actions[index]
+            if action == 'fire':
+                stack.fire(target, now)
+            elif action == 'release':
+                stack.release(target, now)
+            else:
+                raise ValueError(f"Tuntematon toiminto '{action}'")
+            index += 1
+        changes.extend((now, channel, level) for channel, level in stack.tick(now))
+        step += 1
+
+    events = []
+    last_by_channel = {}
+    for now, channel, level in changes:
+        previous = last_by_channel.get(channel)
+        if previous is not None:
+            previous[3] = (now - previous[0] * SECONDS_PER_BEAT) / SECONDS_PER_BEAT
+        event = [now / SECONDS_PER_BEAT, 69 + channel, level, tick / SECONDS_PER_BEAT]
+        events.append(event)
+        last_by_channel[channel] = event
+    return [tuple(event) for event in events]
+
+
+class CueStackRunner:
+    """
+    Live-ajo: tikittää stackia taustasäikeessä ja lähettää muutokset sinkille
+
+    Säie nukkuu kun yhtään fadea ei ole käynnissä ja herää fire/release-kutsusta.
+    sink: olio jolla send((status, nuotti, velocity)) - esim. LiveEngine tai MidoSink
+    """
+
+    def __init__(self, stack, sink, tick=TICK_SECONDS, clock=time.monotonic, channel=0):
+        self.stack = stack
+        self.sink = sink
+        self.tick_seconds = tick
+        self.clock = clock
+        self.status_byte = NOTE_ON | channel
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.origin = clock()
+
+    def now(self):
+        return self.clock() - self.origin
+
+    def fire(self, scene, **options):
+        with self.lock:
+            name = self.stack.fire(scene, self.now(), **options)
+        self._ensure_running()
+        return name
+
+    def release(self, name, fade=None):
+        with self.lock:
+            released = self.stack.release(name, self.now(), fade)
+        self._ensure_running()
+        return released
+
+    def release_all(self, fade=None):
+        with self.lock:
+            self.stack.release_all(self.now(), fade)
+        self._ensure_running()
+
+    def status(self):
+        with self.lock:
+            return self.stack.status()
+
+    def _ensure_running(self):
+        self.wake.set()
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        deadline = self.clock()
+        while True:
+            with self.lock:
+                changes = self.stack.tick(self.now())
+                idle = not self.stack.active
+            for channel, level in changes:
+                self.sink.send((self.status_byte, 69 + channel, level))
+
+            if idle:
+                self.wake.clear()
+                with self.lock:
+                    idle = not self.stack.active
+                if idle:
+                    self.wake.wait()
+                deadline = self.clock()
+                continue
+
+            # Absoluuttiset deadlinet: myöhästyminen ei kerry
+            deadline += self.tick_seconds
+            delay = deadline - self.clock()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = self.clock()
+
+
+def parse_action(text, scenes):
+    """'fire:Aamu@1.5' / 'release:Aamu@3' → (sekunnit, toiminto, kohde)"""
+    action, _, rest = text.partition(':')
+    name, _, at = rest.rpartition('@')
+    if action == 'fire':
+        if name not in scenes:
+            raise ValueError(f"Kohtausta '{name}' ei löytynyt")
+        return float(at), action, scenes[name]
+    return float(at), action, name
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yhdistä päällekkäiset cuet yhdeksi MIDI-tiedostoksi")
+    parser.add_argument('presets', help="esitykset.json")
+    parser.add_argument('preset', help="Esityksen nimi")
+    parser.add_argument('actions', nargs='+', help="fire:Kohtaus@sekunnit tai release:Kohtaus@sekunnit")
+    parser.add_argument('--mode', choices=MERGE_MODES, default=MODE_HTP)
+    parser.add_argument('--tick', type=float, default=TICK_SECONDS)
+    parser.add_argument('--profile', choices=OUTPUT_PROFILES, default=PROFILE_COMPATIBLE)
+    parser.add_argument('-o', '--output', default='merged_cues.mid')
+    args = parser.parse_args()
+
+    preset = next((p for p in load_presets(args.presets) if p.get('name') == args.preset), None)
+    if preset is None:
+        print(f"❌ Esitystä '{args.preset}' ei löytynyt")
+        return 1
+
+    scenes = {scene['name']: scene for scene in preset['scenes']}
+    actions = [parse_action(text, scenes) for text in args.actions]
+    events = render(CueStack(args.mode), actions, args.tick)
+    write_fade_file(args.output, events, args.profile)
+
+    duration = max((event[0] for event in events), default=0) * SECONDS_PER_BEAT
+    print(f"✅ {args.output}: {len(events)} tapahtumaa, {duration:.2f} s ({args.mode.upper()})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
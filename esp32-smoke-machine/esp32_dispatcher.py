@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+💨 ESP32 Dispatcher - savukone- ja silmäkomennot rinnakkain
+
+asyncio-lähettäjä savupalvelin2.ino -laitteille:
+- Laitekohtainen jono: yhden laitteen komennot menevät järjestyksessä
+  (ESP32 palvelee yhtä asiakasta kerrallaan), eri laitteet rinnakkain
+- Keep-alive: laitteen yhteys käytetään uudelleen jos laite pitää sen auki
+- Aikakatkaisu ja uusintayritys per komento
+- "Kaikki pois": komento kaikille laitteille yhtä aikaa
+- Viivetilastot laitteittain
+
+Huom: firmware ei vastaa "smoke"-tilaan lainkaan (handler palaa ennen
+server.send-kutsua), joten suljettu yhteys ilman vastausta lasketaan
+onnistumiseksi (no_response) eikä sitä yritetä uudelleen.
+
+Käyttö:
+    dispatcher = Esp32Dispatcher({"front": "http://192.168.1.100"})
+    await dispatcher.set_state("front", "smoke")
+    await dispatcher.all_off()
+    print(dispatcher.stats())
+
+    python3 esp32_dispatcher.py --device front=http://192.168.1.100 --state smoke
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import urllib.parse
+
+DEFAULT_TIMEOUT = 1.0     # sekuntia per yritys
+DEFAULT_RETRIES = 1
+OFF_STATE = "center"      # Muut tilat kuin "smoke" laskevat savupinnin LOW:ksi
+
+
+class DeviceConnection:
+    """Yksi laite: keep-alive HTTP/1.1-yhteys ja komentojono"""
+
+    def __init__(self, name, base_url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.name = name
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.retries = retries
+        self.queue = asyncio.Queue()
+        self.reader = None
+        self.writer = None
+        self.worker = None
+        self.latencies = []
+        self.failures = 0
+        self.timeouts = 0
+        self.reconnects = 0
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def connect(self):
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            self.reconnects += 1
+
+    async def request(self, method, path, payload=None):
+        """Lähettää yhden pyynnön, palauttaa (status, body) tai (None, b'') jos ei vastausta"""
+        await self.connect()
+
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: keep-alive\r\n\r\n".encode('latin-1') + body
+        )
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            self.close()
+            return None, b''
+
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+
+        if 'content-length' in headers:
+            response_body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            response_body = await self.reader.read()  # Ilman pituutta: luetaan kunnes suljetaan
+
+        if headers.get('connection', '').lower() == 'close' or 'content-length' not in headers:
+            self.close()
+        return status, response_body
+
+    async def execute(self, method, path, payload):
+        """Ajaa komennon aikakatkaisulla ja uusintayrityksillä"""
+        started = time.monotonic()
+        error = None
+
+        for attempt in range(self.retries + 1):
+            try:
+                status, body = await asyncio.wait_for(self.request(method, path, payload), self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                self.close()
+                error = 'timeout'
+                continue
+            except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+                self.close()
+                error = str(e) or type(e).__name__
+                continue
+
+            latency = time.monotonic() - started
+            self.latencies.append(latency)
+            return {
+                'device': self.name,
+                'ok': status is None or 200 <= status < 300,
+                'status': status if status is not None else 'no_response',
+                'body': body.decode('utf-8', 'replace'),
+                'latency_ms': round(latency * 1000, 2),
+                'attempts': attempt + 1
+            }
+
+        self.failures += 1
+        return {
+            'device': self.name,
+            'ok': False,
+            'status': None,
+            'error': error,
+            'latency_ms': round((time.monotonic() - started) * 1000, 2),
+            'attempts': self.retries + 1
+        }
+
+    async def run(self):
+        """Jonon käsittelijä: yksi komento kerrallaan tälle laitteelle"""
+        while True:
+            method, path, payload, future = await self.queue.get()
+            try:
+                result = await self.execute(method, path, payload)
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.queue.task_done()
+
+
+def latency_stats(latencies):
+    """Viivetilastot millisekunteina"""
+    if not latencies:
+        return {'count': 0}
+    ordered = sorted(latencies)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 2),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 2),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2)
+    }
+
+
+class Esp32Dispatcher:
+    """Laitekohtaiset jonot ja rinnakkainen lähetys"""
+
+    def __init__(self, devices, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+        self.devices = {name: DeviceConnection(name, url, timeout, retries)
+                        for name, url in devices.items()}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _ensure_worker(self, device):
+        if device.worker is None or device.worker.done():
+            device.worker = asyncio.get_running_loop().create_task(device.run())
+
+    async def post(self, name, path, payload):
+        """Jonottaa POST-komennon laitteelle ja odottaa tuloksen"""
+        if name not in self.devices:
+            raise KeyError(f"Tuntematon laite: {name}")
+        device = self.devices[name]
+        self._ensure_worker(device)
+        future = asyncio.get_running_loop().create_future()
+        await device.queue.put(('POST', path, payload, future))
+        return await future
+
+    async def set_state(self, name, state):
+        """savupalvelin2: POST /set-eye-state {"state": state}"""
+        return await self.post(name, "/set-eye-state", {"state": state})
+
+    async def set_state_all(self, state, names=None):
+        """Sama tila kaikille (tai annetuille) laitteille rinnakkain"""
+        names = list(self.devices) if names is None else names
+        return await asyncio.gather(*(self.set_state(name, state) for name in names))
+
+    async def all_off(self):
+        """Savu pois kaikista laitteista yhtä aikaa"""
+        return await self.set_state_all(OFF_STATE)
+
+    def stats(self):
+        """Viivetilastot laitteittain"""
+        return {
+            name: dict(latency_stats(device.latencies), failures=device.failures,
+                       timeouts=device.timeouts, connections=device.reconnects)
+            for name, device in self.devices.items()
+        }
+
+    async def close(self):
+        for device in self.devices.values():
+            if device.worker is not None:
+                device.worker.cancel()
+            device.close()
+
+
+async def run(args):
+    devices = dict(device.split('=', 1) for device in args.device)
+    async with Esp32Dispatcher(devices, timeout=args.timeout, retries=args.retries) as dispatcher:
+        if args.all_off:
+            results = await dispatcher.all_off()
+        else:
+            targets = args.target or list(devices)
+            results = await dispatcher.set_state_all(args.state, targets)
+
+        for result in results:
+            icon = "✅" if result['ok'] else "❌"
+            print(f"{icon} {result['device']}: {result['status']} ({result['latency_ms']} ms)")
+
+        for name, stats in dispatcher.stats().items():
+            print(f"📊 {name}: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lähetä savu/silmäkomennot ESP32-laitteille")
+    parser.add_argument('--device', action='append', required=True,
+                        help="nimi=http://osoite (toistettavissa)")
+    parser.add_argument('--state', default=OFF_STATE, help="Tila (esim. smoke, center, blink)")
+    parser.add_argument('--target', action='append', help="Vain nämä laitteet (oletus kaikki)")
+    parser.add_argument('--all-off', action='store_true')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+🧪 ESP32 Simulator - savupalvelin2.ino -endpointit paikallisesti
+
+Jäljittelee savukone/silmä-ESP32:n HTTP-rajapintaa testausta varten:
+    GET  /                 HTML-sivu
+    POST /set-eye-state    {"state": "..."} → {"success": true}
+                           400 {"error": "Invalid state"} / {"error": "No body"}
+                           "smoke": ei vastausta (kuten firmware - yhteys suljetaan)
+    GET  /get-eye-state    {"state": "..."}
+
+Säädettävä viive (latency + jitter) ja pakettihävikki (loss: pyyntöön
+ei vastata lainkaan, asiakkaan aikakatkaisu laukeaa).
+
+Käyttö:
+    python3 esp32_simulator.py --devices 5 --port 8081 --latency 20 --jitter 10 --loss 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import random
+
+VALID_STATES = ("center", "left", "right", "up", "down", "blink",
+                "roll", "smoke", "unconscious", "sleepy")
+
+INDEX_HTML = "<!DOCTYPE html><html><body><h1>ESP32 Simulator</h1></body></html>"
+
+LOST_HOLD_SECONDS = 5.0  # Hävitetty pyyntö: yhteys pidetään hiljaa auki näin kauan
+
+
+class Esp32Simulator:
+    """Yksi simuloitu ESP32 (yksi portti)"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, loss=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency      # sekunteja
+        self.jitter = jitter        # sekunteja, tasajakauma 0..jitter lisätään viiveeseen
+        self.loss = loss            # 0.0-1.0
+        self.random = random.Random(seed)
+        self.state = "center"
+        self.smoke_pin = False
+        self.history = []           # [(metodi, polku, tila)]
+        self.connections = 0
+        self.server = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def handle_client(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0) or 0))
+
+                # Simuloitu verkko: viive ja hävikki
+                delay = self.latency + self.random.uniform(0, self.jitter)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if self.loss and self.random.random() < self.loss:
+                    self.history.append((method, path, 'lost'))
+                    await asyncio.sleep(LOST_HOLD_SECONDS)
+                    break
+
+                response = self.route(method, path, body)
+                if response is None:
+                    break  # Firmware ei vastaa (smoke) - yhteys suljetaan
+
+                status, content_type, payload = response
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1')
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass  # Simulaattori pysäytetty kesken pyynnön
+        finally:
+            writer.close()
+
+    def route(self, method, path, body):
+        """Palauttaa (status, content-type, payload) tai None jos ei vastausta"""
+        if method == 'GET' and path == '/':
+            return "200 OK", "text/html", INDEX_HTML.encode('utf-8')
+
+        if method == 'GET' and path == '/get-eye-state':
+            return "200 OK", "application/json", json.dumps({"state": self.state}).encode('utf-8')
+
+        if method == 'POST' and path == '/set-eye-state':
+            if not body:
+                return "400 Bad Request", "application/json", b'{"error": "No body"}'
+            try:
+                state = json.loads(body.decode('utf-8')).get("state")
+            except ValueError:
+                state = None
+            if state not in VALID_STATES:
+                self.history.append((method, path, 'invalid'))
+                return "400 Bad Request", "application/json", b'{"error": "Invalid state"}'
+
+            self.state = state
+            self.smoke_pin = state == "smoke"
+            self.history.append((method, path, state))
+            if state == "smoke":
+                return None
+            return "200 OK", "application/json", b'{"success": true}'
+
+        return "404 Not Found", "text/plain", b'Not found'
+
+
+async def start_simulators(count, port=0, **options):
+    """Käynnistää count simulaattoria peräkkäisiin portteihin (port=0 → vapaat portit)"""
+    simulators = []
+    for index in range(count):
+        simulator = Esp32Simulator(port=port + index if port else 0, **options)
+        simulators.append(await simulator.start())
+    return simulators
+
+
+async def run(args):
+    simulators = await start_simulators(
+        args.devices, args.port, latency=args.latency / 1000, jitter=args.jitter / 1000,
+        loss=args.loss, seed=args.seed)
+    for index, simulator in enumerate(simulators, 1):
+        print(f"🧪 ESP32 #{index}: {simulator.base_url}")
+    print("⏹️  Lopeta: Ctrl+C")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simuloi savupalvelin2.ino ESP32-laitteita")
+    parser.add_argument('--devices', type=int, default=1)
+    parser.add_argument('--port', type=int, default=8081, help="Ensimmäinen portti")
+    parser.add_argument('--latency', type=float, default=0.0, help="Viive millisekunteina")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Satunnainen lisäviive (ms)")
+    parser.add_argument('--loss', type=float, default=0.0, help="Hävikki 0.0-1.0")
+    parser.add_argument('--seed', type=int)
+    try:
+        asyncio.run(run(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("\n🛑 Simulaattori lopetettu")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+🧪 ESP32 Dispatcher Test - lähettäjä simuloituja savupalvelin2-laitteita vastaan
+
+Ei vaadi laitteita: esp32_simulator käynnistää laitteet vapaisiin portteihin.
+1. Keep-alive ja järjestys: yhden laitteen komennot yhdellä yhteydellä, jonon järjestyksessä
+2. Rinnakkaisuus: "kaikki pois" viidelle hitaalle laitteelle yhden viiveen ajassa
+3. Firmware-erikoisuudet: smoke ilman vastausta = onnistunut, virheellinen tila = 400 ilman uusintaa
+4. Hävikki: aikakatkaisu ja yksi uusintayritys, virhe tilastoihin
+
+Käyttö:
+    python3 test_esp32_dispatcher.py      (tai python3 -m pytest test_esp32_dispatcher.py)
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import esp32_simulator
+from esp32_dispatcher import OFF_STATE, Esp32Dispatcher
+from esp32_simulator import start_simulators
+
+
+async def with_devices(count, scenario, timeout=1.0, retries=1, **options):
+    simulators = await start_simulators(count, **options)
+    devices = {f"laite{index}": simulator.base_url for index, simulator in enumerate(simulators, 1)}
+    try:
+        async with Esp32Dispatcher(devices, timeout=timeout, retries=retries) as dispatcher:
+            return await scenario(dispatcher, simulators)
+    finally:
+        for simulator in simulators:
+            await simulator.stop()
+
+
+def test_keep_alive_and_order():
+    """Samaan laitteeseen jonotetut komennot: yksi yhteys, lähetysjärjestys säilyy"""
+    print("🧪 Keep-alive ja järjestys")
+    states = ["left", "right", "up", "down", "blink", "roll", "center"] * 3
+
+    async def scenario(dispatcher, simulators):
+        results = await asyncio.gather(*(dispatcher.set_state("laite1", state) for state in states))
+        assert all(result['ok'] and result['status'] == 200 for result in results)
+        assert [state for _, _, state in simulators[0].history] == states
+        assert simulators[0].connections == 1
+        stats = dispatcher.stats()["laite1"]
+        assert stats['count'] == len(states) and stats['connections'] == 1 and stats['failures'] == 0
+
+    asyncio.run(with_devices(1, scenario))
+    print(f"   ✅ {len(states)} komentoa yhdellä yhteydellä")
+
+
+def test_all_off_in_parallel():
+    """Viisi 100 ms viiveen laitetta: all_off kestää yhden viiveen, ei viittä"""
+    print("🧪 Rinnakkainen all_off")
+
+    async def scenario(dispatcher, simulators):
+        started = time.monotonic()
+        results = await dispatcher.all_off()
+        elapsed = time.monotonic() - started
+        assert len(results) == 5 and all(result['ok'] for result in results)
+        assert all(simulator.state == OFF_STATE and not simulator.smoke_pin for simulator in simulators)
+        assert elapsed < 0.3, f"{elapsed:.2f} s"
+        return elapsed
+
+    elapsed = asyncio.run(with_devices(5, scenario, latency=0.1))
+    print(f"   ✅ 5 laitetta {elapsed * 1000:.0f} ms:ssa")
+
+
+def test_firmware_responses():
+    """smoke: ei vastausta → ok ilman uusintaa, virheellinen tila → 400 ilman uusintaa"""
+    print("🧪 Firmwaren vastaukset")
+
+    async def scenario(dispatcher, simulators):
+        smoke = await dispatcher.set_state("laite1", "smoke")
+        assert smoke['ok'] and smoke['status'] == 'no_response' and smoke['attempts'] == 1
+        assert simulators[0].smoke_pin
+
+        invalid = await dispatcher.set_state("laite1", "disco")
+        assert not invalid['ok'] and invalid['status'] == 400 and invalid['attempts'] == 1
+
+        off = await dispatcher.set_state("laite1", OFF_STATE)
+        assert off['ok'] and not simulators[0].smoke_pin
+        assert [state for _, _, state in simulators[0].history] == ["smoke", "invalid", OFF_STATE]
+        assert simulators[0].connections == 2   # smoke sulki yhteyden
+
+        try:
+            await dispatcher.set_state("tuntematon", "smoke")
+            assert False, "tuntematon laite ei saa kelvata"
+        except KeyError:
+            pass
+
+    asyncio.run(with_devices(1, scenario))
+    print("   ✅ smoke, 400 ja uudelleenyhdistys")
+
+
+def test_timeout_and_retry():
+    """Jokainen pyyntö hukkuu: kaksi yritystä, aikakatkaisut tilastoissa, muut laitteet eivät odota"""
+    print("🧪 Aikakatkaisu")
+    original_hold = esp32_simulator.LOST_HOLD_SECONDS
+    esp32_simulator.LOST_HOLD_SECONDS = 0.3
+
+    async def scenario(dispatcher, simulators):
+        result = await dispatcher.set_state("laite1", "blink")
+        assert not result['ok'] and result['error'] == 'timeout' and result['attempts'] == 2
+        stats = dispatcher.stats()["laite1"]
+        assert stats['failures'] == 1 and stats['timeouts'] == 2 and stats['count'] == 0
+        assert [state for _, _, state in simulators[0].history] == ['lost', 'lost']
+
+    try:
+        asyncio.run(with_devices(1, scenario, timeout=0.1, loss=1.0))
+    finally:
+        esp32_simulator.LOST_HOLD_SECONDS = original_hold
+    print("   ✅ 2 yritystä, virhe raportoitu")
+
+
+if __name__ == "__main__":
+    tests = [test_keep_alive_and_order, test_all_off_in_parallel, test_firmware_responses,
+             test_timeout_and_retry]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+🎞️ Level Frames - fade-tasot kuvaruuduiksi (frames × kanavat, Uint8)
+
+Laskee kohtauksen tai koko esityksen kanavatasot tasaisin aikavälein
+samoista fade-tapahtumista joista MIDI-tiedostot kirjoitetaan
+(fit_fade_to_budget / fit_crossfade_to_budget). Kanavan taso ruudulla on
+viimeisimmän siihen mennessä lähetetyn nuotin velocity - kuten Scene
+Setter pitää tason seuraavaan nuottiin asti. Ruudut lasketaan numpylla
+yhdellä searchsorted-haulla kaikille kanaville, joten selain saa valmiin
+taulukon ja voi piirtää esikatselun 60 fps ilman MIDI:n jäsentämistä.
+
+Binäärimuoto: rivit = ruudut, sarakkeet = kanavat (channels-listan
+järjestyksessä), yksi tavu per taso (0-127).
+
+Käyttö:
+    channels, frames = scene_levels(scene, 'in', fps=60)
+    channels, frames = show_levels(preset, fps=60, hold=1.0)
+    frames.tobytes()   # → new Uint8Array(buffer), ruutu i = [i*len(channels), (i+1)*len(channels))
+"""
+
+from valot_python_backend import (
+    MIDI_WIRE_BYTES_PER_SECOND,
+    PROFILE_COMPATIBLE,
+    SECONDS_PER_BEAT,
+    adaptive_envelope,
+    fit_crossfade_to_budget,
+    fit_fade_to_budget,
+)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+DEFAULT_FPS = 60
+MAX_FPS = 240
+DEFAULT_HOLD_SECONDS = 1.0   # Esityksen esikatselussa kohtauksen pito crossfadejen välissä
+MAX_FRAMES = 216000          # 1 h @ 60 fps - suojaa palvelinta valtavilta pyynnöiltä
+
+
+def sorted_channels(channel_maps):
+    """Kaikkien kanavakarttojen kanavat numerojärjestyksessä"""
+    return sorted({int(channel) for channels in channel_maps for channel in channels})
+
+
+def render_levels(events, channels, duration, fps=DEFAULT_FPS, start_levels=None):
+    """
+    Tapahtumat → tasotaulukko (ruudut × kanavat, uint8)
+
+    events: [(time_beats, note, velocity, duration_beats)], nuotti = 69 + kanava
+    start_levels: {kanava: taso} ennen ensimmäistä tapahtumaa (oletus 0)
+    Ruutuja on floor(duration * fps) + 1, viimeinen ruutu = fade:n lopputila.
+    """
+    if not NUMPY_AVAILABLE:
+        raise RuntimeError("Tasoruudut vaativat numpy-kirjaston: pip install numpy")
+
+    frame_count = int(duration * fps) + 1
+    if frame_count > MAX_FRAMES:
+        raise ValueError(f"Liian monta ruutua ({frame_count} > {MAX_FRAMES})")
+
+    column = {channel: i for i, channel in enumerate(channels)}
+    start_levels = start_levels or {}
+    initial = np.array([start_levels.get(channel, 0) for channel in channels], dtype=np.uint8)
+    frames = np.tile(initial, (frame_count, 1))
+
+    events = [event for event in events if event[1] - 69 in column]
+    if not events:
+        return frames
+
+    data = np.array([(column[note - 69], time * SECONDS_PER_BEAT, vel) for time, note, vel, _ in events],
+                    dtype=np.float64)
+    cols = data[:, 0].astype(np.int64)
+    times = data[:, 1]
+
+    # Yksi lajiteltu avainjono: kanava-sarake * jakso + aika. Ruudun avaimesta
+    # searchsorted löytää saman kanavan viimeisen tapahtuman ≤ ruudun aika.
+    span = max(duration, float(times.max())) + 1.0
+    order = np.lexsort((times, cols))
+    keys = cols[order] * span + times[order]
+    levels = data[order, 2].astype(np.uint8)
+
+    frame_times = np.arange(frame_count) / fps
+    frame_times[-1] = max(frame_times[-1], float(times.max()))  # Viimeinen ruutu = lopputila
+    column_ids = np.arange(len(channels))
+    frame_keys = column_ids[None, :] * span + frame_times[:, None] + 1e-9
+    found = np.searchsorted(keys, frame_keys, side='right') - 1
+
+    # Osuma kelpaa vain jos se on samalta kanavalta (muuten kanavalla ei vielä tapahtumia)
+    valid = (found >= 0) & (cols[order][np.clip(found, 0, None)] == column_ids[None, :])
+    return np.where(valid, levels[np.clip(found, 0, None)], frames)
+
+
+def fade_events(scene, fade, from_scene=None, steps=20, profile=PROFILE_COMPATIBLE,
+                budget=MIDI_WIRE_BYTES_PER_SECOND, compact=True, default_adaptive=False):
+    """Kohtauksen fade-tapahtumat kuten generoinnissa, palauttaa (events, kesto)"""
+    steps = scene.get('steps', steps)
+    adaptive = adaptive_envelope(scene, default_adaptive)
+
+    if fade == 'crossfade':
+        if from_scene is None:
+            raise ValueError("Crossfade tarvitsee lähtökohtauksen")
+        duration = scene['fade_in_duration']
+        events = fit_crossfade_to_budget(from_scene['channels'], scene['channels'], duration,
+                                         steps, budget, compact, profile, adaptive)[0]
+        return events, duration
+
+    if fade not in ('in', 'out'):
+        raise ValueError(f"Tuntematon fade '{fade}'")
+    duration = scene['fade_in_duration'] if fade == 'in' else scene['fade_out_duration']
+    notes = [69 + int(channel) for channel in scene['channels']]
+    velocities = [int(level) for level in scene['channels'].values()]
+    events = fit_fade_to_budget(notes, velocities, duration, fade == 'in',
+                                steps, budget, compact, profile, adaptive)[0]
+    return events, duration
+
+
+def scene_levels(scene, fade='in', fps=DEFAULT_FPS, from_scene=None, **options):
+    """Yhden kohtauksen fade ruutuina: palauttaa (kanavat, ruudut)"""
+    events, duration = fade_events(scene, fade, from_scene, **options)
+    maps = [scene['channels']] + ([from_scene['channels']] if from_scene else [])
+    channels = sorted_channels(maps)
+
+    start = {}
+    if fade == 'out':
+        start = {int(ch): int(level) for ch, level in scene['channels'].items()}
+    elif fade == 'crossfade':
+        start = {int(ch): int(level) for ch, level in from_scene['channels'].items()}
+    return channels, render_levels(events, channels, duration, fps, start)
+
+
+def show_levels(preset, fps=DEFAULT_FPS, hold=DEFAULT_HOLD_SECONDS, **options):
+    """
+    Koko esitys ruutuina: ensimmäisen fade-in, crossfadet järjestyksessä
+    (pito välissä) ja viimeisen fade-out. Palauttaa (kanavat, ruudut)
+    """
+    scenes = preset['scenes']
+    if not scenes:
+        raise ValueError(f"Esityksessä '{preset.get('name')}' ei ole kohtauksia")
+    options.setdefault('steps', preset.get('steps', 20))
+    options.setdefault('default_adaptive', preset.get('adaptive_steps', False))
+    channels = sorted_channels(scene['channels'] for scene in scenes)
+
+    segments = [('in', scenes[0], None)]
+    segments += [('crossfade', target, source) for source, target in zip(scenes, scenes[1:])]
+    segments.append(('out', scenes[-1], None))
+
+    # Ruutumäärä tarkistetaan ennen laskentaa - muuten valtava hold varaisi muistin ensin
+    if not 0 <= hold <= MAX_FRAMES / fps:
+        raise ValueError(f"Virheellinen pito {hold} s (0-{MAX_FRAMES / fps:g})")
+    hold_frames = int(hold * fps)
+    frame_count = hold_frames * (len(segments) - 1)
+    for fade, scene, _ in segments:
+        duration = scene['fade_out_duration'] if fade == 'out' else scene['fade_in_duration']
+        frame_count += int(duration * fps) + 1
+    if frame_count > MAX_FRAMES:
+        raise ValueError(f"Liian monta ruutua ({frame_count} > {MAX_FRAMES})")
+
+    parts = []
+    current = {}
+    for fade, scene, source in segments:
+        events, duration = fade_events(scene, fade, source, **options)
+        part = render_levels(events, channels, duration, fps, current)
+        current = dict(zip(channels, part[-1].tolist()))
+        parts.append(part)
+        if fade != 'out' and hold_frames:
+            parts.append(np.tile(part[-1], (hold_frames, 1)))
+
+    return channels, np.concatenate(parts)
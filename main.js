@@ -8,6 +8,82 @@ const isDev = process.env.NODE_ENV === 'development';
 let mainWindow;
 let presetsData = [];
 
+// esitykset.json voi olla myös kohtausvarastomuodossa (scene_store.py pack):
+// kanavakartat kerran sisältötiivisteellä, kohtaukset viittauksina.
+// Luetaan aina listaksi ja kirjoitetaan samassa muodossa kuin tiedosto jo on.
+const STORE_FORMAT = 'scene-store';
+const STORE_VERSION = 1;
+
+function isSceneStore(data) {
+    return data !== null && typeof data === 'object' && !Array.isArray(data) && data.format === STORE_FORMAT;
+}
+
+function canonicalChannels(channels) {
+    const canonical = {};
+    Object.keys(channels || {})
+        .sort((a, b) => parseInt(a, 10) - parseInt(b, 10))
+        .forEach(channel => { canonical[String(channel)] = Math.trunc(Number(channels[channel])); });
+    return canonical;
+}
+
+function sceneKey(channels) {
+    // Sama tiiviste kuin scene_store.scene_key (SHA-1, 16 heksamerkkiä)
+    const payload = JSON.stringify(canonicalChannels(channels));
+    return require('crypto').createHash('sha1').update(payload, 'utf8').digest('hex').slice(0, 16);
+}
+
+function packPresets(presets) {
+    const scenes = {};
+    const packed = presets.map(preset => ({
+        ...preset,
+        scenes: (preset.scenes || []).map(scene => {
+            const { channels, ...use } = scene;
+            const key = sceneKey(channels);
+            if (!scenes[key]) {
+                scenes[key] = { channels: canonicalChannels(channels) };
+            }
+            return { ref: key, ...use };
+        })
+    }));
+    return { format: STORE_FORMAT, version: STORE_VERSION, scenes, presets: packed };
+}
+
+function unpackPresets(store) {
+    if ((store.version || STORE_VERSION) > STORE_VERSION) {
+        throw new Error(`Tuntematon varastoversio ${store.version}`);
+    }
+    return (store.presets || []).map(preset => ({
+        ...preset,
+        scenes: (preset.scenes || []).map(use => {
+            const { ref, ...scene } = use;
+            if (!store.scenes[ref]) {
+                throw new Error(`Kohtausviittausta '${ref}' ei löydy varastosta`);
+            }
+            return { ...scene, channels: { ...store.scenes[ref].channels } };
+        })
+    }));
+}
+
+// Lukee esitykset kummasta tahansa muodosta listana
+async function readPresetsFile(presetsPath) {
+    const data = JSON.parse(await fs.readFile(presetsPath, 'utf8'));
+    if (isSceneStore(data)) {
+        return unpackPresets(data);
+    }
+    return Array.isArray(data) ? data : [data];
+}
+
+// Tallentaa esitykset samassa muodossa kuin olemassa oleva tiedosto (uusi = listamuoto)
+async function writePresetsFile(presetsPath, presets) {
+    let store = false;
+    try {
+        store = isSceneStore(JSON.parse(await fs.readFile(presetsPath, 'utf8')));
+    } catch (error) {
+        store = false;
+    }
+    await fs.writeFile(presetsPath, JSON.stringify(store ? packPresets(presets) : presets, null, 2));
+}
+
 // Luo pääikkuna
 function createWindow() {
     // Määritä ikoni alustapohjaisen
@@ -163,8 +239,7 @@ ipcMain.handle('load-presets', async () => {
         }
         
         console.log('Loading presets from:', presetsPath);
-        const data = await fs.readFile(presetsPath, 'utf8');
-        presetsData = JSON.parse(data);
+        presetsData = await readPresetsFile(presetsPath);
         return presetsData;
     } catch (error) {
         console.log('No existing presets file, starting with empty array');
@@ -203,7 +278,7 @@ ipcMain.handle('save-preset', async (event, presetData) => {
         }
         
         console.log('Saving presets to:', presetsPath);
-        await fs.writeFile(presetsPath, JSON.stringify(presetsData, null, 2));
+        await writePresetsFile(presetsPath, presetsData);
         
         return { success: true, replaced: existingIndex >= 0 };
     } catch (error) {
@@ -242,7 +317,7 @@ ipcMain.handle('delete-preset', async (event, presetName) => {
         }
         
         console.log('Saving updated presets to:', presetsPath);
-        await fs.writeFile(presetsPath, JSON.stringify(presetsData, null, 2));
+        await writePresetsFile(presetsPath, presetsData);
         
         return { success: true };
     } catch (error) {
@@ -364,7 +439,7 @@ ipcMain.handle('import-presets', async (event) => {
             await fs.mkdir(dir, { recursive: true });
         }
         
-        await fs.writeFile(presetsPath, JSON.stringify(presetsData, null, 2));
+        await writePresetsFile(presetsPath, presetsData);
         
         return { 
             success: true, 
@@ -509,7 +584,7 @@ ipcMain.handle('import-selected-presets', async (event, selectedPresets) => {
             await fs.mkdir(dir, { recursive: true });
         }
         
-        await fs.writeFile(presetsPath, JSON.stringify(presetsData, null, 2));
+        await writePresetsFile(presetsPath, presetsData);
         
         return { 
             success: true, 
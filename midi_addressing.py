@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+🔀 MIDI Addressing - valokanavat MIDI-porteille, -kanaville ja nuoteille
+
+Vanha osoitus on nuotti = 69 + kanava MIDI-kanavalla 1, joten kanava 59
+menisi jo yli nuotin 127 ja koko riggi mahtuu yhden MIDI-kanavan nuotteihin.
+Osoitus kertoo jokaiselle valokanavalle (portti, MIDI-kanava, nuotti):
+
+- legacy:   nykyinen kaava, kanavat 1-58 (oletus, tiedostot ennallaan)
+- banked:   kanavat 1-58 kuten legacy, seuraavat 58 seuraavalle MIDI-kanavalle
+            jne. midi_channels kanavaa per portti, sitten seuraava portti
+- balanced: valaisimet (esim. RGBW-ryhmä kokonaisena) jaetaan porteille ja
+            MIDI-kanaville tapahtumakuorman mukaan (pisin ensin -tasaus), jotta
+            yhden portin kaista ei kasva riggin kasvaessa. Taulukko
+            tallennetaan JSON:ksi, jotta tuonti osaa kääntää osoitteet takaisin.
+
+Portti 0 kirjoitetaan alkuperäiseen tiedostonimeen, portti n tiedostoon
+<nimi>_port<n+1>.mid (port_filename).
+
+Käyttö:
+    addressing = from_spec({"mode": "banked", "midi_channels": 4})
+    addressing.address(60)                  # Address(port=0, midi_channel=1, note=71)
+    addressing.channel_for(0, 1, 71)        # 60
+
+    python3 midi_addressing.py balance esitykset.json --ports 2 --midi-channels 2 -o addressing.json
+    python3 midi_addressing.py show addressing.json
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from collections import namedtuple
+
+BASE_NOTE = 69                        # nuotti = 69 + kanava (kanava 1 = nuotti 70)
+BANK_SIZE = 127 - BASE_NOTE           # 58 kanavaa per MIDI-kanava
+MIDI_CHANNEL_COUNT = 16
+
+MODE_LEGACY = 'legacy'
+MODE_BANKED = 'banked'
+MODE_BALANCED = 'balanced'
+
+FIXTURE_RANGE_PATTERN = re.compile(r'(\d+)\s*-\s*(\d+)')
+
+Address = namedtuple('Address', 'port midi_channel note')
+
+
+def port_filename(filename, port):
+    """Portin tiedostonimi: portti 0 = alkuperäinen, muut <nimi>_port<n+1>.mid"""
+    if port == 0:
+        return filename
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}_port{port + 1}{extension or '.mid'}"
+
+
+class Addressing:
+    """Kaavaan perustuva osoitus (legacy / banked)"""
+
+    def __init__(self, midi_channels=1, ports=1, bank_size=BANK_SIZE):
+        if not 1 <= midi_channels <= MIDI_CHANNEL_COUNT:
+            raise ValueError(f"midi_channels pitää olla 1-{MIDI_CHANNEL_COUNT}")
+        if not 1 <= bank_size <= BANK_SIZE:
+            raise ValueError(f"bank_size pitää olla 1-{BANK_SIZE}")
+        self.midi_channels = midi_channels
+        self.ports = max(1, ports)
+        self.bank_size = bank_size
+
+    @property
+    def mode(self):
+        return MODE_LEGACY if self.midi_channels == 1 and self.ports == 1 else MODE_BANKED
+
+    @property
+    def max_channel(self):
+        return self.bank_size * self.midi_channels * self.ports
+
+    def address(self, channel):
+        channel = int(channel)
+        if not 1 <= channel <= self.max_channel:
+            raise ValueError(f"Kanava {channel} ei mahdu osoitukseen (1-{self.max_channel})")
+        bank, offset = divmod(channel - 1, self.bank_size)
+        port, midi_channel = divmod(bank, self.midi_channels)
+        return Address(port, midi_channel, BASE_NOTE + 1 + offset)
+
+    def channel_for(self, port, midi_channel, note):
+        """Käänteinen haku tuonnille: (portti, MIDI-kanava, nuotti) → kanava tai None"""
+        offset = note - BASE_NOTE - 1
+        if not 0 <= offset < self.bank_size or not 0 <= midi_channel < self.midi_channels:
+            return None
+        channel = (port * self.midi_channels + midi_channel) * self.bank_size + offset + 1
+        return channel if 1 <= channel <= self.max_channel else None
+
+    def route(self, events):
+        """
+        Jakaa fade-tapahtumat porteille
+
+        events: [(time_beats, 69 + kanava, velocity, duration_beats)]
+        Palauttaa {portti: [(time_beats, nuotti, velocity, duration_beats, midi_kanava)]}
+        """
+        routed = {}
+        for time, channel_note, vel, duration_beats in events:
+            port, midi_channel, note = self.address(channel_note - BASE_NOTE)
+            routed.setdefault(port, []).append((time, note, vel, duration_beats, midi_channel))
+        return routed
+
+    def is_legacy(self, channels=()):
+        """Tuottaako osoitus samat tavut kuin vanha kaava näille kanaville"""
+        return all(self.address(channel) == (0, 0, BASE_NOTE + int(channel)) for channel in channels)
+
+    def to_dict(self):
+        return {'mode': self.mode, 'midi_channels': self.midi_channels,
+                'ports': self.ports, 'bank_size': self.bank_size}
+
+
+class TableAddressing(Addressing):
+    """Taulukko-osoitus (balanced): {kanava: Address}, tallennetaan JSON:ksi"""
+
+    def __init__(self, table):
+        table = {int(channel): Address(*address) for channel, address in table.items()}
+        super().__init__(max((address.midi_channel for address in table.values()), default=0) + 1,
+                         max((address.port for address in table.values()), default=0) + 1)
+        self.table = table
+        self.reverse = {address: channel for channel, address in self.table.items()}
+        if len(self.reverse) != len(self.table):
+            raise ValueError("Osoitustaulukossa sama (portti, MIDI-kanava, nuotti) useammalle kanavalle")
+
+    mode = MODE_BALANCED
+
+    @property
+    def max_channel(self):
+        return max(self.table, default=0)
+
+    def address(self, channel):
+        channel = int(channel)
+        if channel not in self.table:
+            raise ValueError(f"Kanavaa {channel} ei ole osoitustaulukossa")
+        return self.table[channel]
+
+    def channel_for(self, port, midi_channel, note):
+        return self.reverse.get((port, midi_channel, note))
+
+    def to_dict(self):
+        return {'mode': MODE_BALANCED,
+                'table': {str(channel): list(address) for channel, address in sorted(self.table.items())}}
+
+
+def parse_fixtures(fixtures, channels):
+    """
+    Valaisimet kanavaryhminä: ["RGBW 33-36", "21", [5, 6]] → [[33, 34, 35, 36], [21], [5, 6]]
+
+    Kanavat joita ei ole missään valaisimessa ovat omia valaisimiaan.
+    """
+    groups = []
+    for fixture in fixtures or []:
+        if isinstance(fixture, str):
+            match = FIXTURE_RANGE_PATTERN.search(fixture)
+            group = (list(range(int(match.group(1)), int(match.group(2)) + 1)) if match
+                     else [int(re.findall(r'\d+', fixture)[-1])])
+        else:
+            group = [int(channel) for channel in fixture]
+        groups.append(group)
+
+    grouped = {channel for group in groups for channel in group}
+    groups += [[channel] for channel in sorted(channels) if channel not in grouped]
+    return groups
+
+
+def balanced_addressing(loads, fixtures=None, midi_channels=MIDI_CHANNEL_COUNT, ports=1,
+                        bank_size=BANK_SIZE):
+    """
+    Jakaa valaisimet porteille ja MIDI-kanaville kuorman mukaan
+
+    loads: {kanava: tapahtumia} (esim. channel_loads)
+    Raskain valaisin ensin kevyimmälle portille ja sen kevyimmälle MIDI-kanavalle
+    jolla on tilaa koko valaisimelle - valaisimen kanavat pysyvät yhdessä.
+    """
+    groups = parse_fixtures(fixtures, loads)
+    groups.sort(key=lambda group: (-sum(loads.get(channel, 0) for channel in group), group[0]))
+
+    port_loads = [0] * ports
+    slot_loads = {(port, midi_channel): 0 for port in range(ports) for midi_channel in range(midi_channels)}
+    slot_used = dict.fromkeys(slot_loads, 0)
+    table = {}
+
+    for group in groups:
+        load = sum(loads.get(channel, 0) for channel in group)
+        candidates = [slot for slot in slot_loads if slot_used[slot] + len(group) <= bank_size]
+        if not candidates:
+            raise ValueError(f"Valaisin {group} ei mahdu: lisää portteja tai MIDI-kanavia")
+        slot = min(candidates, key=lambda s: (port_loads[s[0]], slot_loads[s], s))
+        for channel in group:
+            table[channel] = Address(slot[0], slot[1], BASE_NOTE + 1 + slot_used[slot])
+            slot_used[slot] += 1
+        port_loads[slot[0]] += load
+        slot_loads[slot] += load
+
+    return TableAddressing(table)
+
+
+def channel_loads(presets, steps=20):
+    """Kuorma-arvio kanavittain: fade-in + fade-out stepit jokaisesta kohtauksesta"""
+    loads = {}
+    for preset in presets:
+        for scene in preset.get('scenes', []):
+            scene_steps = scene.get('steps', preset.get('steps', steps))
+            for channel in scene.get('channels', {}):
+                loads[int(channel)] = loads.get(int(channel), 0) + 2 * scene_steps + 1
+    return loads
+
+
+def from_spec(spec):
+    """
+    Osoitus asetuksista
+
+    None / "legacy" → vanha kaava, polku → JSON-tiedosto,
+    {"mode": "banked", "midi_channels", "ports"} tai {"mode": "balanced", "table": {...}}
+    """
+    if spec is None or isinstance(spec, Addressing):
+        return spec or Addressing()
+    if isinstance(spec, str):
+        if spec == MODE_LEGACY:
+            return Addressing()
+        return load(spec)
+
+    mode = spec.get('mode', MODE_BANKED)
+    if mode == MODE_BALANCED:
+        return TableAddressing(spec['table'])
+    if mode in (MODE_LEGACY, MODE_BANKED):
+        return Addressing(spec.get('midi_channels', MIDI_CHANNEL_COUNT if mode == MODE_BANKED else 1),
+                          spec.get('ports', 1), spec.get('bank_size', BANK_SIZE))
+    raise ValueError(f"Tuntematon osoitustila '{mode}'")
+
+
+def load(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return from_spec(json.load(f))
+
+
+def save(addressing, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(addressing.to_dict(), f, indent=2)
+
+
+def load_sidecar(midi_path):
+    """Tuonnin osoitus: addressing.json MIDI-tiedoston vieressä, muuten vanha kaava"""
+    path = os.path.join(os.path.dirname(os.path.abspath(midi_path)), 'addressing.json')
+    return load(path) if os.path.exists(path) else Addressing()
+
+
+def port_of_file(midi_path):
+    """Tiedostonimen porttiosa: Aamu_fade_in_port2.mid → 1, muuten 0"""
+    match = re.search(r'_port(\d+)\.mid$', midi_path, re.IGNORECASE)
+    return int(match.group(1)) - 1 if match else 0
+
+
+def import_channel(addressing, port, midi_channel, note, legacy_max):
+    """
+    Tuonnin valokanava MIDI-viestistä, None jos nuotti ei ole valokanava
+
+    Legacy-osoituksella hyväksytään vain kanavat 1-legacy_max (Scene Setter),
+    muilla osoituksilla koko osoituksen alue (1-max_channel).
+    """
+    channel = addressing.channel_for(port, midi_channel, note)
+    if channel is None or channel < 1:
+        return None
+    if channel > legacy_max and addressing.mode == MODE_LEGACY:
+        return None
+    return channel
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MIDI-osoitus: kanavat porteille ja MIDI-kanaville")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    balance_parser = subparsers.add_parser('balance', help="Laske kuormatasattu taulukko esityksistä")
+    balance_parser.add_argument('presets_file')
+    balance_parser.add_argument('--ports', type=int, default=1)
+    balance_parser.add_argument('--midi-channels', type=int, default=MIDI_CHANNEL_COUNT)
+    balance_parser.add_argument('--fixture', action='append', help='esim. "RGBW 33-36" (toistettavissa)')
+    balance_parser.add_argument('-o', '--output', default='addressing.json')
+
+    show_parser = subparsers.add_parser('show', help="Näytä osoitustiedosto")
+    show_parser.add_argument('addressing_file')
+    args = parser.parse_args()
+
+    if args.command == 'balance':
+        from scene_store import load_presets
+        presets = load_presets(args.presets_file)
+        loads = channel_loads(presets)
+        addressing = balanced_addressing(loads, args.fixture, args.midi_channels, args.ports)
+        save(addressing, args.output)
+        port_loads = {}
+        for channel, address in addressing.table.items():
+            port_loads[address.port] = port_loads.get(address.port, 0) + loads.get(channel, 0)
+        print(f"✅ {len(addressing.table)} kanavaa → {args.output}")
+        for port, load in sorted(port_loads.items()):
+            print(f"   🔌 Portti {port + 1}: kuorma {load}")
+        return 0
+
+    addressing = load(args.addressing_file)
+    print(f"🔀 Tila: {addressing.mode}")
+    if isinstance(addressing, TableAddressing):
+        for channel, (port, midi_channel, note) in sorted(addressing.table.items()):
+            print(f"   Kanava {channel:>3} → portti {port + 1}, MIDI-kanava {midi_channel + 1}, nuotti {note}")
+    else:
+        print(f"   {addressing.midi_channels} MIDI-kanavaa × {addressing.ports} porttia, "
+              f"kanavat 1-{addressing.max_channel}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+▶️ MIDI Player - reaaliaikainen fade-toisto ilman ulkoista soitinta
+
+Soittaa generoidut fade-tiedostot tai lennossa lasketut fade-tapahtumat
+MIDI-ulostuloon. Ajastus perustuu monotoniseen kelloon ja absoluuttisiin
+deadlineihin (alku + tapahtuman aika), joten myöhästyminen yhdessä
+viestissä ei kerry seuraaviin. Jokaisen viestin myöhästyminen mitataan
+ja toiston jälkeen palautetaan jitter-tilastot.
+
+Ulostulot:
+- MidoSink: oikea tai virtuaalinen MIDI-portti (vaatii mido + python-rtmidi)
+- CaptureSink: tallentaa viestit muistiin - testaus ilman laitteistoa
+
+Käyttö:
+    python3 midi_player.py Kohtaus_fade_in.mid --port "Scene Setter"
+    python3 midi_player.py --json esitykset.json --scene Aamu --fade in --capture
+    python3 midi_player.py --list-ports
+"""
+
+import argparse
+import statistics
+import sys
+import threading
+import time
+
+from valot_python_backend import (
+    PROFILE_COMPATIBLE,
+    PROFILE_SCENE_SETTER,
+    SECONDS_PER_BEAT,
+    adaptive_envelope,
+    build_adaptive_fade_events,
+    build_fade_events,
+    compact_fade_events,
+)
+from scene_store import load_presets
+
+try:
+    import mido
+    MIDO_AVAILABLE = True
+except ImportError:
+    MIDO_AVAILABLE = False
+
+NOTE_ON = 0x90
+NOTE_OFF = 0x80
+SPIN_SECONDS = 0.002    # Viimeiset millisekunnit odotetaan aktiivisesti (sleep on epätarkka)
+START_LEAD_SECONDS = 0.05  # Toiston aloitusviive, jotta ensimmäinen viesti ei myöhästy
+
+
+class CaptureSink:
+    """Tallentaa lähetetyt viestit muistiin: [(monotoninen_aika, (status, data1, data2))]"""
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append((self.clock(), tuple(message)))
+
+    def close(self):
+        pass
+
+
+class MidoSink:
+    """Lähettää viestit mido-porttiin (virtual=True luo loopback-testiin virtuaaliportin)"""
+
+    def __init__(self, port_name=None, virtual=False):
+        if not MIDO_AVAILABLE:
+            raise RuntimeError("mido ei ole asennettu: pip install mido python-rtmidi")
+        self.port = mido.open_output(port_name, virtual=virtual)
+
+    def send(self, message):
+        self.port.send(mido.Message.from_bytes(list(message)))
+
+    def close(self):
+        self.port.close()
+
+
+def list_output_ports():
+    """Palauttaa käytettävissä olevat MIDI-ulostulot"""
+    if not MIDO_AVAILABLE:
+        return []
+    return mido.get_output_names()
+
+
+def events_to_messages(events, profile=PROFILE_COMPATIBLE, channel=0):
+    """
+    Muuntaa fade-tapahtumat (time_beats, note, vel, duration_beats) ajastetuiksi viesteiksi
+
+    Palauttaa aikajärjestetyn listan (sekunnit, (status, nuotti, velocity)).
+    compatible: note on + note off kuten midiutil-tiedostossa,
+    scene_setter: vain note on (velocity 0 sammuttaa).
+    """
+    messages = []
+    for time_beats, note, vel, duration_beats in events:
+        start = time_beats * SECONDS_PER_BEAT
+        messages.append((start, (NOTE_ON | channel, note, vel)))
+        if profile != PROFILE_SCENE_SETTER:
+            end = (time_beats + duration_beats) * SECONDS_PER_BEAT
+            messages.append((end, (NOTE_OFF | channel, note, 0)))
+
+    # Samalla hetkellä note off ennen note onia, ettei uusi taso sammu heti
+    messages.sort(key=lambda message: (message[0], message[1][0] != NOTE_OFF | channel))
+    return messages
+
+
+def scene_messages(scene, is_fade_in, profile=PROFILE_COMPATIBLE, compact=True):
+    """Laskee kohtauksen fade-in/fade-out viestit lennossa (ei tiedostoa)"""
+    channels = scene['channels']
+    notes = [69 + int(channel) for channel in channels.keys()]
+    velocities = list(channels.values())
+    duration = scene['fade_in_duration'] if is_fade_in else scene['fade_out_duration']
+
+    adaptive = adaptive_envelope(scene)
+    if adaptive:
+        events = build_adaptive_fade_events(notes, velocities, duration, is_fade_in, **adaptive)
+    else:
+        events = build_fade_events(notes, velocities, duration, is_fade_in, scene.get('steps', 20))
+    if compact:
+        events = compact_fade_events(events)
+    return events_to_messages(events, profile)
+
+
+def file_messages(filename):
+    """Lukee MIDI-tiedoston viestit (sekunnit, tavut) - vaatii mido-kirjaston"""
+    if not MIDO_AVAILABLE:
+        raise RuntimeError("MIDI-tiedoston lukeminen vaatii mido-kirjaston: pip install mido")
+
+    messages = []
+    elapsed = 0.0
+    for message in mido.MidiFile(filename):
+        elapsed += message.time
+        if not message.is_meta:
+            messages.append((elapsed, tuple(message.bytes())))
+    return messages
+
+
+def jitter_stats(lateness):
+    """
+    Laskee jitter-tilastot myöhästymisistä (sekunteina)
+
+    Palauttaa millisekunteina: count, mean, stdev, p50, p95, p99, max
+    """
+    if not lateness:
+        return {'count': 0}
+
+    ordered = sorted(lateness)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3),
+        'stdev_ms': round(statistics.pstdev(ordered) * 1000, 3),
+        'p50_ms': round(percentile(0.50) * 1000, 3),
+        'p95_ms': round(percentile(0.95) * 1000, 3),
+        'p99_ms': round(percentile(0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+class MidiPlayer:
+    """
+    Soittaa ajastetut viestit sinkkiin absoluuttisilla deadlineilla
+
+    Deadline = toiston alku + viestin aika, joten sleep-virheet eivät
+    kumuloidu. Odotus: sleep kunnes SPIN_SECONDS jäljellä, sitten aktiivinen odotus.
+    """
+
+    def __init__(self, sink, clock=time.monotonic, sleep=time.sleep,
+                 spin_seconds=SPIN_SECONDS, start_lead=START_LEAD_SECONDS):
+        self.sink = sink
+        self.clock = clock
+        self.sleep = sleep
+        self.spin_seconds = spin_seconds
+        self.start_lead = start_lead
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Keskeyttää käynnissä olevan toiston (turvallinen toisesta säikeestä)"""
+        self._stop.set()
+
+    def wait_until(self, deadline):
+        while True:
+            remaining = deadline - self.clock()
+            if remaining <= 0 or self._stop.is_set():
+                return
+            if remaining > self.spin_seconds:
+                self.sleep(remaining - self.spin_seconds)
+
+    def play(self, messages, start=None):
+        """
+        Soittaa viestilistan [(sekunnit, tavut)] ja palauttaa jitter-tilastot
+
+        start: monotonisen kellon aloitushetki (oletus nyt + start_lead),
+        usean tiedoston ketjuttamiseen samalle aikajanalle.
+        """
+        self._stop.clear()
+        if start is None:
+            start = self.clock() + self.start_lead
+
+        lateness = []
+        for offset, message in messages:
+            deadline = start + offset
+            self.wait_until(deadline)
+            if self._stop.is_set():
+                break
+            self.sink.send(message)
+            lateness.append(self.clock() - deadline)
+
+        stats = jitter_stats(lateness)
+        stats['stopped'] = self._stop.is_set()
+        stats['duration_s'] = round(messages[-1][0], 3) if messages else 0.0
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soita fade-tiedostoja tai kohtauksia MIDI-porttiin")
+    parser.add_argument('file', nargs='?', help="Soitettava .mid-tiedosto")
+    parser.add_argument('--json', help="Esitys-JSON (kohtaukset lasketaan lennossa)")
+    parser.add_argument('--scene', help="Kohtauksen nimi JSON-tiedostosta")
+    parser.add_argument('--fade', choices=['in', 'out'], default='in')
+    parser.add_argument('--profile', choices=[PROFILE_COMPATIBLE, PROFILE_SCENE_SETTER],
+                        default=PROFILE_COMPATIBLE)
+    parser.add_argument('--port', help="MIDI-ulostulon nimi (oletus: järjestelmän oletus)")
+    parser.add_argument('--virtual', action='store_true', help="Luo virtuaaliportti (loopback)")
+    parser.add_argument('--capture', action='store_true', help="Ei laitteistoa - tallenna viestit muistiin")
+    parser.add_argument('--list-ports', action='store_true')
+    args = parser.parse_args()
+
+    if args.list_ports:
+        ports = list_output_ports()
+        print("🎹 MIDI-ulostulot:" if ports else "❌ Ei MIDI-ulostuloja (tai mido puuttuu)")
+        for name in ports:
+            print(f"   • {name}")
+        return
+
+    if args.json:
+        scenes = [scene for item in load_presets(args.json) for scene in item.get('scenes', [])]
+        scene = next((s for s in scenes if s['name'] == args.scene), None)
+        if scene is None:
+            sys.exit(f"❌ Kohtausta '{args.scene}' ei löytynyt")
+        messages = scene_messages(scene, args.fade == 'in', args.profile)
+        title = f"{scene['name']} fade-{args.fade}"
+    elif args.file:
+        messages = file_messages(args.file)
+        title = args.file
+    else:
+        parser.error("anna .mid-tiedosto tai --json ja --scene")
+
+    sink = CaptureSink() if args.capture else MidoSink(args.port, args.virtual)
+    player = MidiPlayer(sink)
+
+    print(f"▶️  Soitetaan {title}: {len(messages)} viestiä")
+    try:
+        stats = player.play(messages)
+    except KeyboardInterrupt:
+        player.stop()
+        print("\n⏹️  Keskeytetty")
+        return
+    finally:
+        sink.close()
+
+    print(f"✅ Valmis ({stats['duration_s']} s)")
+    if stats['count']:
+        print(f"⏱️  Jitter: keskiarvo {stats['mean_ms']} ms, p95 {stats['p95_ms']} ms, "
+              f"p99 {stats['p99_ms']} ms, max {stats['max_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,178 +1,330 @@
+"""
+🎹 midimaker5 - kohtausten fade-in/fade-out MIDI-tiedostot
 
+Interaktiivinen tila (ilman argumentteja): kysyy kohtauksen nimen ja kanavat,
+tai lukee .txt/.rtf-tiedoston jossa rivi per kohtaus:
+    Kohtaus;1:127, 2:64;fade_in_s;fade_out_s
+
+Eräajo: yksi tai useampi tiedosto/glob, rivit virtaavat generaattoreiden läpi
+(tiedostot → rivit → kohtaukset → erät) ja erät käännetään rinnakkain.
+Ruudulle vain yksi päivittyvä edistymispalkki ja lopuksi yhteenveto.
+
+Käyttö:
+    python3 midimaker5.py
+    python3 midimaker5.py kohtaukset/*.txt -o midi_out --jobs 8
+    python3 midimaker5.py "kirjasto/**/*.txt" --quiet
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
 from midiutil import MIDIFile
 
-# Loputon loopi kohtausten kyselylle
-while True:
-    scene_name = input("Syötä kohtauksen nimi (tai 'exit' lopettaaksesi, tai tiedostonimi.txt/.rtf): ").strip()
-    
-    if scene_name.lower() == 'exit':
-        print("Ohjelma lopetettu.")
-        break
-    
-    is_file = scene_name.endswith('.txt') or scene_name.endswith('.rtf')
-    if is_file:
+BATCH_SIZE = 64          # Kohtauksia per työprosessin tehtävä (vähemmän IPC:tä)
+PROGRESS_WIDTH = 30
+PROGRESS_INTERVAL = 0.1  # Palkin päivitysväli sekunteina
+
+
+def parse_channels(channels_str):
+    """'1:127, 2:64' tai '1, 2:64' → {1: 127, 2: 64} (puuttuva arvo = 127)"""
+    channels_dict = {}
+    pairs = channels_str.split(',')
+    for pair in pairs:
+        pair = pair.strip()
+        if ':' in pair:
+            channel, value = pair.split(':')
+            channels_dict[int(channel.strip())] = int(value.strip())
+        else:
+            channels_dict[int(pair)] = 127  # Oletus 127 jos arvo puuttuu
+    return channels_dict
+
+
+def parse_scene_line(line):
+    """
+    Rivi 'Kohtaus;kanavat;fade_in;fade_out' → (nimi, kanavat, fade_in, fade_out)
+
+    Tyhjä rivi tai kommentti → None, virheellinen rivi → ValueError
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):  # Ohita tyhjät rivit ja kommentit
+        return None
+    parts = line.split(';')
+    if len(parts) < 2:
+        raise ValueError("Virheellinen muoto")
+    parsed_scene_name = parts[0].strip()
+    channels_str = parts[1].strip() if len(parts) > 1 else ''
+    fade_in_input = parts[2].strip() if len(parts) > 2 else ''
+    fade_out_input = parts[3].strip() if len(parts) > 3 else ''
+
+    fade_in_duration = float(fade_in_input) if fade_in_input else 1.0
+    fade_out_duration = float(fade_out_input) if fade_out_input else 1.0
+    return parsed_scene_name, parse_channels(channels_str), fade_in_duration, fade_out_duration
+
+
+def create_fade_mid(file_name, notes, velocities, duration, fade_in=True, verbose=True):
+    mf = MIDIFile(1)
+    track = 0
+    channel = 0
+    time = 0
+    mf.addTempo(track, time, 120)  # Tempo 120 BPM (0.5 s/beat) tarkempaan kontrolliin
+
+    steps = 20  # Vähemmän steppejä, pidempi kesto/step (esim. 1 s = 50 ms/step)
+    total_beats = duration * 2  # Säädä beat:eja keston mukaan (120 BPM = 2 beats/s)
+    duration_per_step = total_beats / steps
+
+    if verbose:
+        print(f"Fade { 'in' if fade_in else 'out' }: {steps} steppiä, {duration_per_step} beats/step ({duration_per_step * 0.5} s/step)")
+
+    if fade_in:
+        # Aloita velocity 1:stä (ei 0), range(1, steps + 1)
+        for step in range(1, steps + 1):
+            for note, target_vel in zip(notes, velocities):
+                vel = int(target_vel * (step / steps))  # 1 -> target
+                mf.addNote(track, channel, note, time, duration_per_step, vel)
+                if verbose:
+                    print(f"Step {step}: vel={vel} for note {note}")
+            time += duration_per_step
+        # Loppuun hold target-velocityllä (0.2 s)
+        hold_beats = 0.4  # 0.2 s @ 120 BPM
+        for note, target_vel in zip(notes, velocities):
+            mf.addNote(track, channel, note, time, hold_beats, target_vel)
+        time += hold_beats
+    else:
+        # Fade_out: target -> 0
+        for step in range(steps + 1):
+            for note, target_vel in zip(notes, velocities):
+                vel = int(target_vel * (1 - (step / steps)))  # target -> 0
+                mf.addNote(track, channel, note, time, duration_per_step, vel)
+                if verbose:
+                    print(f"Step {step}: vel={vel} for note {note}")
+            time += duration_per_step
+        # Loppuun Note Off jokaiselle (velocity 0)
+        for note in notes:
+            mf.addNote(track, channel, note, time, 0.1, 0)
+
+    with open(file_name, "wb") as output_file:
+        mf.writeFile(output_file)
+    if verbose:
+        print(f"{file_name} luotu onnistuneesti!")
+
+
+def create_scene_files(scene_name, channels_dict, fade_in_duration, fade_out_duration,
+                       output_dir='.', verbose=True):
+    """Luo kohtauksen fade-in- ja fade-out-tiedostot"""
+    # Laske MIDI-nuotit: nuotti = 70 + (kanava - 1) = 69 + kanava
+    notes = [69 + channel for channel in channels_dict.keys()]
+    velocities = list(channels_dict.values())
+
+    fade_in_file = os.path.join(output_dir, f"{scene_name}_fade_in.mid")
+    fade_out_file = os.path.join(output_dir, f"{scene_name}_fade_out.mid")
+
+    create_fade_mid(fade_in_file, notes, velocities, fade_in_duration, fade_in=True, verbose=verbose)
+    create_fade_mid(fade_out_file, notes, velocities, fade_out_duration, fade_in=False, verbose=verbose)
+
+
+# --- Eräajon putki: tiedostot → rivit → kohtaukset → erät ---
+
+def expand_patterns(patterns):
+    """Globit ja polut → tiedostot (järjestyksessä, ei duplikaatteja)"""
+    seen = set()
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for path in matches:
+            if path not in seen and not os.path.isdir(path):
+                seen.add(path)
+                yield path
+
+
+def read_lines(paths, errors):
+    """Rivit tiedostoista yksi kerrallaan: (polku, rivinumero, rivi, tavut)"""
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line_num, line in enumerate(f, 1):
+                    yield path, line_num, line, len(line.encode('utf-8'))
+        except (OSError, UnicodeDecodeError) as e:
+            errors.append(f"{path}: {e}")
+
+
+def parse_scenes(lines, errors):
+    """Jäsennetyt kohtaukset: (kohtaus tai None, tavut) - virheet kerätään listaan"""
+    for path, line_num, line, size in lines:
         try:
-            with open(scene_name, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-            print(f"Lukemassa tiedostoa {scene_name}...")
-            for line_num, line in enumerate(lines, 1):
-                line = line.strip()
-                if not line or line.startswith('#'):  # Ohita tyhjät rivit ja kommentit
-                    continue
-                parts = line.split(';')
-                if len(parts) < 2:
-                    print(f"Rivi {line_num}: Virheellinen muoto. Ohitetaan.")
-                    continue
-                parsed_scene_name = parts[0].strip()
-                channels_str = parts[1].strip() if len(parts) > 1 else ''
-                fade_in_input = parts[2].strip() if len(parts) > 2 else ''
-                fade_out_input = parts[3].strip() if len(parts) > 3 else ''
-                
-                # Parsitaan kanavat ja arvot
-                channels_dict = {}
-                pairs = channels_str.split(',')
-                for pair in pairs:
-                    pair = pair.strip()
-                    if ':' in pair:
-                        channel, value = pair.split(':')
-                        channels_dict[int(channel.strip())] = int(value.strip())
-                    else:
-                        channels_dict[int(pair)] = 127  # Oletus 127 jos arvo puuttuu
-                
-                fade_in_duration = float(fade_in_input) if fade_in_input else 1.0
-                fade_out_duration = float(fade_out_input) if fade_out_input else 1.0
-                
-                # Laske MIDI-nuotit: nuotti = 70 + (kanava - 1) = 69 + kanava
-                notes = [69 + channel for channel in channels_dict.keys()]
-                velocities = list(channels_dict.values())
-                
-   
-                def create_fade_mid(file_name, notes, velocities, duration, fade_in=True):
-                    mf = MIDIFile(1)
-                    track = 0
-                    channel = 0
-                    time = 0
-                    mf.addTempo(track, time, 120)  # Tempo 120 BPM (0.5 s/beat) tarkempaan kontrolliin
-
-                    steps = 20  # Vähemmän steppejä, pidempi kesto/step (esim. 1 s = 50 ms/step)
-                    total_beats = duration * 2  # Säädä beat:eja keston mukaan (120 BPM = 2 beats/s)
-                    duration_per_step = total_beats / steps
-
-                    print(f"Fade { 'in' if fade_in else 'out' }: {steps} steppiä, {duration_per_step} beats/step ({duration_per_step * 0.5} s/step)")
-
-                    if fade_in:
-                        # Aloita velocity 1:stä (ei 0), range(1, steps + 1)
-                        for step in range(1, steps + 1):
-                            for note, target_vel in zip(notes, velocities):
-                                vel = int(target_vel * (step / steps))  # 1 -> target
-                                mf.addNote(track, channel, note, time, duration_per_step, vel)
-                                print(f"Step {step}: vel={vel} for note {note}")
-                            time += duration_per_step
-                        # Loppuun hold target-velocityllä (0.2 s)
-                        hold_beats = 0.4  # 0.2 s @ 120 BPM
-                        for note, target_vel in zip(notes, velocities):
-                            mf.addNote(track, channel, note, time, hold_beats, target_vel)
-                        time += hold_beats
-                    else:
-                        # Fade_out: target -> 0
-                        for step in range(steps + 1):
-                            for note, target_vel in zip(notes, velocities):
-                                vel = int(target_vel * (1 - (step / steps)))  # target -> 0
-                                mf.addNote(track, channel, note, time, duration_per_step, vel)
-                                print(f"Step {step}: vel={vel} for note {note}")
-                            time += duration_per_step
-                        # Loppuun Note Off jokaiselle (velocity 0)
-                        for note in notes:
-                            mf.addNote(track, channel, note, time, 0.1, 0)
-
-                    with open(file_name, "wb") as output_file:
-                        mf.writeFile(output_file)
-                    print(f"{file_name} luotu onnistuneesti!")
-
-                # Luo tiedostot
-                fade_in_file = f"{parsed_scene_name}_fade_in.mid"
-                fade_out_file = f"{parsed_scene_name}_fade_out.mid"
- 
-                create_fade_mid(fade_in_file, notes, velocities, fade_in_duration, fade_in=True)
-                create_fade_mid(fade_out_file, notes, velocities, fade_out_duration, fade_in=False)
-                print(f"Kohtaus '{parsed_scene_name}' käsitelty.")
-        except FileNotFoundError:
-            print(f"Tiedostoa '{scene_name}' ei löytynyt. Ohitetaan.")
-            continue
+            yield parse_scene_line(line), size
+        except ValueError as e:
+            errors.append(f"{path}:{line_num}: {e}")
+            yield None, size
+
+
+def batches(scenes, size=BATCH_SIZE):
+    """Kohtaukset erinä: (lista kohtauksia, erän tavut)"""
+    batch = []
+    batch_bytes = 0
+    for scene, scene_bytes in scenes:
+        batch_bytes += scene_bytes
+        if scene is not None:
+            batch.append(scene)
+        if len(batch) >= size:
+            yield batch, batch_bytes
+            batch = []
+            batch_bytes = 0
+    if batch or batch_bytes:
+        yield batch, batch_bytes
+
+
+def compile_batch(batch, output_dir):
+    """Työprosessi: kääntää erän, palauttaa (valmiit, virheet)"""
+    done = 0
+    errors = []
+    for scene_name, channels_dict, fade_in_duration, fade_out_duration in batch:
+        try:
+            create_scene_files(scene_name, channels_dict, fade_in_duration, fade_out_duration,
+                               output_dir, verbose=False)
+            done += 1
         except Exception as e:
-            print(f"Virhe tiedoston lukemisessa: {e}. Ohitetaan.")
-            continue
-        continue  # Jatka looppia seuraavalle syötteelle
+            errors.append(f"{scene_name}: {e}")
+    return done, errors
+
+
+def draw_progress(done_bytes, total_bytes, scenes, started):
+    fraction = done_bytes / total_bytes if total_bytes else 1.0
+    filled = int(fraction * PROGRESS_WIDTH)
+    sys.stderr.write(f"\r[{'#' * filled}{'.' * (PROGRESS_WIDTH - filled)}] {fraction * 100:5.1f}%  "
+                     f"{scenes} kohtausta  {time.monotonic() - started:.1f} s")
+    sys.stderr.flush()
+
+
+def batch_compile(patterns, output_dir='.', jobs=None, quiet=False):
+    """
+    Kääntää kaikki kohtaustiedostot rinnakkain
+
+    Palauttaa yhteenvedon: tiedostot, kohtaukset, luodut MIDI-tiedostot, virheet, kesto
+    """
+    started = time.monotonic()
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = list(expand_patterns(patterns))
+    total_bytes = sum(os.path.getsize(path) for path in paths if os.path.isfile(path))
+    errors = []
+    jobs = jobs or os.cpu_count() or 1
+
+    scenes_done = 0
+    done_bytes = 0
+    last_drawn = 0.0
+
+    def record(result, batch_bytes):
+        nonlocal scenes_done, done_bytes, last_drawn
+        done, batch_errors = result
+        scenes_done += done
+        done_bytes += batch_bytes
+        errors.extend(batch_errors)
+        if not quiet and time.monotonic() - last_drawn >= PROGRESS_INTERVAL:
+            last_drawn = time.monotonic()
+            draw_progress(done_bytes, total_bytes, scenes_done, started)
+
+    work = batches(parse_scenes(read_lines(paths, errors), errors))
+    if jobs == 1:
+        for batch, batch_bytes in work:
+            record(compile_batch(batch, output_dir), batch_bytes)
     else:
-        channels_str = input("Syötä kanavat ja arvot (esim. '1:127, 2:64' tai '1, 2:64' jossa puuttuva arvo = 127): ")
-        fade_in_input = input("Syötä fade-in kesto sekunneissa (enter = 1 s): ").strip()
-        fade_out_input = input("Syötä fade-out kesto sekunneissa (enter = 1 s): ").strip()
-
-        # Parsitaan kanavat ja arvot
-        channels_dict = {}
-        pairs = channels_str.split(',')
-        for pair in pairs:
-            pair = pair.strip()
-            if ':' in pair:
-                channel, value = pair.split(':')
-                channels_dict[int(channel.strip())] = int(value.strip())
-            else:
-                channels_dict[int(pair)] = 127  # Oletus 127 jos arvo puuttuu
-        
-        fade_in_duration = float(fade_in_input) if fade_in_input else 1.0
-        fade_out_duration = float(fade_out_input) if fade_out_input else 1.0
-        
-        # Laske MIDI-nuotit: nuotti = 70 + (kanava - 1) = 69 + kanava
-        notes = [69 + channel for channel in channels_dict.keys()]
-        velocities = list(channels_dict.values())
-   
-       
-        def create_fade_mid(file_name, notes, velocities, duration, fade_in=True):
-            mf = MIDIFile(1)
-            track = 0
-            channel = 0
-            time = 0
-            mf.addTempo(track, time, 120)  # Tempo 120 BPM (0.5 s/beat) tarkempaan kontrolliin
-
-            steps = 20  # Vähemmän steppejä, pidempi kesto/step (esim. 1 s = 50 ms/step)
-            total_beats = duration * 2  # Säädä beat:eja keston mukaan (120 BPM = 2 beats/s)
-            duration_per_step = total_beats / steps
-
-            print(f"Fade { 'in' if fade_in else 'out' }: {steps} steppiä, {duration_per_step} beats/step ({duration_per_step * 0.5} s/step)")
-
-            if fade_in:
-                # Aloita velocity 1:stä (ei 0), range(1, steps + 1)
-                for step in range(1, steps + 1):
-                    for note, target_vel in zip(notes, velocities):
-                        vel = int(target_vel * (step / steps))  # 1 -> target
-                        mf.addNote(track, channel, note, time, duration_per_step, vel)
-                        print(f"Step {step}: vel={vel} for note {note}")
-                    time += duration_per_step
-                # Loppuun hold target-velocityllä (0.2 s)
-                hold_beats = 0.4  # 0.2 s @ 120 BPM
-                for note, target_vel in zip(notes, velocities):
-                    mf.addNote(track, channel, note, time, hold_beats, target_vel)
-                time += hold_beats
-            else:
-                # Fade_out: target -> 0
-                for step in range(steps + 1):
-                    for note, target_vel in zip(notes, velocities):
-                        vel = int(target_vel * (1 - (step / steps)))  # target -> 0
-                        mf.addNote(track, channel, note, time, duration_per_step, vel)
-                        print(f"Step {step}: vel={vel} for note {note}")
-                    time += duration_per_step
-                # Loppuun Note Off jokaiselle (velocity 0)
-                for note in notes:
-                    mf.addNote(track, channel, note, time, 0.1, 0)
-
-            with open(file_name, "wb") as output_file:
-                mf.writeFile(output_file)
-            print(f"{file_name} luotu onnistuneesti!")
-
-    # Luo tiedostot
-        fade_in_file = f"{scene_name}_fade_in.mid"
-        fade_out_file = f"{scene_name}_fade_out.mid"
-        
-        create_fade_mid(fade_in_file, notes, velocities, fade_in_duration, fade_in=True)
-        create_fade_mid(fade_out_file, notes, velocities, fade_out_duration, fade_in=False)
\ No newline at end of file
+        pending = {}
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for batch, batch_bytes in work:
+                pending[pool.submit(compile_batch, batch, output_dir)] = batch_bytes
+                # Rajoitetaan jonossa olevat erät, jotta iso kirjasto ei nouse kerralla muistiin
+                while len(pending) >= jobs * 2:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        record(future.result(), pending.pop(future))
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record(future.result(), pending.pop(future))
+
+    if not quiet:
+        draw_progress(done_bytes, total_bytes, scenes_done, started)
+        sys.stderr.write("\n")
+
+    return {
+        'files': len(paths),
+        'scenes': scenes_done,
+        'midi_files': scenes_done * 2,
+        'errors': errors,
+        'elapsed_s': round(time.monotonic() - started, 2)
+    }
+
+
+def interactive():
+    # Loputon loopi kohtausten kyselylle
+    while True:
+        scene_name = input("Syötä kohtauksen nimi (tai 'exit' lopettaaksesi, tai tiedostonimi.txt/.rtf): ").strip()
+
+        if scene_name.lower() == 'exit':
+            print("Ohjelma lopetettu.")
+            break
+
+        is_file = scene_name.endswith('.txt') or scene_name.endswith('.rtf')
+        if is_file:
+            try:
+                with open(scene_name, 'r', encoding='utf-8') as f:
+                    lines = f.readlines()
+                print(f"Lukemassa tiedostoa {scene_name}...")
+                for line_num, line in enumerate(lines, 1):
+                    try:
+                        scene = parse_scene_line(line)
+                    except ValueError:
+                        print(f"Rivi {line_num}: Virheellinen muoto. Ohitetaan.")
+                        continue
+                    if scene is None:
+                        continue
+                    create_scene_files(*scene)
+                    print(f"Kohtaus '{scene[0]}' käsitelty.")
+            except FileNotFoundError:
+                print(f"Tiedostoa '{scene_name}' ei löytynyt. Ohitetaan.")
+                continue
+            except Exception as e:
+                print(f"Virhe tiedoston lukemisessa: {e}. Ohitetaan.")
+                continue
+            continue  # Jatka looppia seuraavalle syötteelle
+        else:
+            channels_str = input("Syötä kanavat ja arvot (esim. '1:127, 2:64' tai '1, 2:64' jossa puuttuva arvo = 127): ")
+            fade_in_input = input("Syötä fade-in kesto sekunneissa (enter = 1 s): ").strip()
+            fade_out_input = input("Syötä fade-out kesto sekunneissa (enter = 1 s): ").strip()
+
+            fade_in_duration = float(fade_in_input) if fade_in_input else 1.0
+            fade_out_duration = float(fade_out_input) if fade_out_input else 1.0
+
+            create_scene_files(scene_name, parse_channels(channels_str), fade_in_duration, fade_out_duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kohtausten fade-MIDI-tiedostot (ilman argumentteja: interaktiivinen)")
+    parser.add_argument('files', nargs='*', help="Kohtaustiedostot tai globit (esim. 'kirjasto/**/*.txt')")
+    parser.add_argument('-o', '--output-dir', default='.', help="Kohdekansio (oletus: nykyinen)")
+    parser.add_argument('-j', '--jobs', type=int, help="Rinnakkaiset prosessit (oletus: CPU-määrä)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Ei edistymispalkkia")
+    args = parser.parse_args()
+
+    if not args.files:
+        interactive()
+        return 0
+
+    summary = batch_compile(args.files, args.output_dir, args.jobs, args.quiet)
+    print(f"✅ {summary['scenes']} kohtausta → {summary['midi_files']} MIDI-tiedostoa "
+          f"({summary['files']} tiedostoa, {summary['elapsed_s']} s) → {args.output_dir}")
+    if summary['errors']:
+        print(f"⚠️  {len(summary['errors'])} virhettä:")
+        for error in summary['errors'][:20]:
+            print(f"   {error}")
+        if len(summary['errors']) > 20:
+            print(f"   ... ja {len(summary['errors']) - 20} muuta")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+🕘 Preset History - esitysten versiot delta-tallennuksena
+
+save-preset korvaa esityksen esitykset.json:ssa, joten vanha versio katoaa.
+Historia tallentaa jokaisen tallennuksen lisäyksenä (append-only JSONL)
+esitykset.json:n viereen (esitykset.history.jsonl):
+
+- delta: vain muuttuneet kentät, kohtaukset ja kanavat edelliseen versioon
+- snapshot: koko esitys joka SNAPSHOT_INTERVAL. versiolla (ja ensimmäisellä),
+  joten minkä tahansa version rakentamiseen riittää yksi snapshot + enintään
+  SNAPSHOT_INTERVAL - 1 deltaa
+
+Rivit indeksoidaan (esitys → versio → tiedosto-offset) yhdellä läpikäynnillä,
+joten versio luetaan hyppäämällä suoraan lähimpään snapshottiin.
+
+Käyttö:
+    history = PresetHistory("esitykset.history.jsonl")
+    version = history.record(preset)          # uusi versio (tai nykyinen jos ei muutoksia)
+    history.versions("Kalareissu")            # [{version, saved_at, type, changes}]
+    history.get("Kalareissu", 3)              # esitys versiossa 3
+    history.diff("Kalareissu", 2, 5)          # muutokset versiosta 2 versioon 5
+
+    python3 preset_history.py esitykset.history.jsonl Kalareissu [--version 3 | --diff 2 5]
+"""
+
+import argparse
+import copy
+import json
+import os
+import sys
+import threading
+
+SNAPSHOT_INTERVAL = 10
+IGNORED_FIELDS = ('saved_at',)   # Pelkkä aikaleiman muutos ei ole uusi versio
+
+TYPE_SNAPSHOT = 'snapshot'
+TYPE_DELTA = 'delta'
+
+
+def history_path(presets_file):
+    """esitykset.json → esitykset.history.jsonl"""
+    stem, _ = os.path.splitext(str(presets_file))
+    return stem + '.history.jsonl'
+
+
+def diff_fields(old, new, skip=()):
+    """Kenttämuutokset: {"set": {kenttä: arvo}, "unset": [kenttä]} (tyhjät pois)"""
+    changes = {}
+    changed = {key: value for key, value in new.items()
+               if key not in skip and (key not in old or old[key] != value)}
+    removed = [key for key in old if key not in skip and key not in new]
+    if changed:
+        changes['set'] = changed
+    if removed:
+        changes['unset'] = removed
+    return changes
+
+
+def apply_fields(target, changes):
+    for key in changes.get('unset', []):
+        target.pop(key, None)
+    target.update(copy.deepcopy(changes.get('set', {})))
+    return target
+
+
+def scene_names_unique(preset):
+    names = [scene.get('name') for scene in preset.get('scenes', [])]
+    return len(names) == len(set(names))
+
+
+def preset_delta(old, new):
+    """
+    Muutokset esitysversiosta toiseen
+
+    {"fields": {...}, "order": [nimet] jos kohtauslista muuttui,
+     "scenes": {nimi: {"fields": {...}, "channels": {...}} tai {"new": kohtaus}}}
+    Palauttaa None jos kohtausnimet eivät ole yksikäsitteisiä (tallennetaan snapshot).
+    """
+    if not scene_names_unique(old) or not scene_names_unique(new):
+        return None
+
+    delta = {}
+    fields = diff_fields(old, new, skip=('scenes',) + IGNORED_FIELDS)
+    if fields:
+        delta['fields'] = fields
+
+    old_scenes = {scene.get('name'): scene for scene in old.get('scenes', [])}
+    new_order = [scene.get('name') for scene in new.get('scenes', [])]
+    if new_order != [scene.get('name') for scene in old.get('scenes', [])]:
+        delta['order'] = new_order
+
+    scenes = {}
+    for scene in new.get('scenes', []):
+        name = scene.get('name')
+        if name not in old_scenes:
+            scenes[name] = {'new': scene}
+            continue
+        previous = old_scenes[name]
+        change = {}
+        scene_fields = diff_fields(previous, scene, skip=('channels',))
+        channels = diff_fields(previous.get('channels', {}), scene.get('channels', {}))
+        if scene_fields:
+            change['fields'] = scene_fields
+        if channels:
+            change['channels'] = channels
+        if change:
+            scenes[name] = change
+    if scenes:
+        delta['scenes'] = scenes
+    return delta
+
+
+def apply_delta(preset, delta):
+    """Rakentaa seuraavan version edellisestä ja deltasta"""
+    result = apply_fields({key: value for key, value in preset.items() if key != 'scenes'},
+                          delta.get('fields', {}))
+    scenes = {scene.get('name'): copy.deepcopy(scene) for scene in preset.get('scenes', [])}
+
+    for name, change in delta.get('scenes', {}).items():
+        if 'new' in change:
+            scenes[name] = copy.deepcopy(change['new'])
+            continue
+        scene = apply_fields(scenes[name], change.get('fields', {}))
+        if 'channels' in change:
+            scene['channels'] = apply_fields(scene.get('channels', {}), change['channels'])
+
+    order = delta.get('order', [scene.get('name') for scene in preset.get('scenes', [])])
+    result['scenes'] = [scenes[name] for name in order]
+    return result
+
+
+def delta_summary(delta):
+    """Lyhyt yhteenveto listaukseen"""
+    if delta is None:
+        return {}
+    channels = sum(len(change.get('channels', {}).get('set', {})) + len(change.get('channels', {}).get('unset', []))
+                   for change in delta.get('scenes', {}).values())
+    return {
+        'fields': sorted(set(delta.get('fields', {}).get('set', {})) | set(delta.get('fields', {}).get('unset', []))),
+        'scenes': sorted(delta.get('scenes', {})),
+        'channels': channels,
+        'reordered': 'order' in delta
+    }
+
+
+class PresetHistory:
+    """Append-only versiohistoria: esitys → [(versio, offset, tyyppi, aikaleima)]"""
+
+    def __init__(self, path, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.path = str(path)
+        self.snapshot_interval = snapshot_interval
+        self.lock = threading.Lock()
+        self.index = {}
+        self.latest = {}          # esitys → uusin versio rakennettuna (tallennusvertailuun)
+        self.indexed_size = 0
+
+    def _refresh(self):
+        """Indeksoi tiedostoon lisätyt rivit (toinen prosessi voi lisätä rivejä)"""
+        if not os.path.exists(self.path):
+            self.index, self.latest, self.indexed_size = {}, {}, 0
+            return
+        size = os.path.getsize(self.path)
+        if size < self.indexed_size:
+            self.index, self.latest, self.indexed_size = {}, {}, 0
+        if size == self.indexed_size:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self.indexed_size)
+            offset = self.indexed_size
+            for line in f:
+                if line.endswith(b'\n'):
+                    entry = json.loads(line)
+                    self.index.setdefault(entry['preset'], []).append(
+                        (entry['version'], offset, entry['type'], entry.get('saved_at')))
+                    self.latest.pop(entry['preset'], None)
+                    offset += len(line)
+            self.indexed_size = offset  # Keskeneräinen viimeinen rivi luetaan seuraavalla kerralla
+
+    def _read(self, offset):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def _build(self, name, version):
+        entries = self.index.get(name, [])
+        position = next((i for i, entry in enumerate(entries) if entry[0] == version), None)
+        if position is None:
+            raise KeyError(f"Esityksellä '{name}' ei ole versiota {version}")
+        start = max(i for i in range(position + 1) if entries[i][2] == TYPE_SNAPSHOT)
+        preset = self._read(entries[start][1])['data']
+        for _, offset, _, _ in entries[start + 1:position + 1]:
+            preset = apply_delta(preset, self._read(offset)['data'])
+        # Delta ei sisällä aikaleimaa (IGNORED_FIELDS) - version oma saved_at indeksistä
+        if entries[position][3] is not None:
+            preset['saved_at'] = entries[position][3]
+        return preset
+
+    def record(self, preset):
+        """Tallentaa uuden version, palauttaa versionumeron (ei muutoksia → nykyinen)"""
+        name = preset.get('name', '')
+        with self.lock:
+            self._refresh()
+            entries = self.index.get(name, [])
+            version = entries[-1][0] + 1 if entries else 1
+
+            delta = None
+            entry_type = TYPE_SNAPSHOT
+            if entries:
+                previous = self.latest.get(name) or self._build(name, entries[-1][0])
+                delta = preset_delta(previous, preset)
+                if delta == {}:
+                    return entries[-1][0]
+                since_snapshot = len(entries) - max(i for i, entry in enumerate(entries)
+                                                    if entry[2] == TYPE_SNAPSHOT)
+                if delta is not None and since_snapshot < self.snapshot_interval:
+                    entry_type = TYPE_DELTA
+
+            line = json.dumps({
+                'preset': name,
+                'version': version,
+                'type': entry_type,
+                'saved_at': preset.get('saved_at'),
+                'data': delta if entry_type == TYPE_DELTA else preset
+            }, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+            with open(self.path, 'ab') as f:
+                offset = f.tell()
+                f.write(line)
+            self.index.setdefault(name, []).append((version, offset, entry_type, preset.get('saved_at')))
+            self.indexed_size = offset + len(line)
+            self.latest[name] = copy.deepcopy(preset)
+            return version
+
+    def versions(self, name):
+        """Esityksen versiot vanhimmasta uusimpaan (delta-yhteenvedon kanssa)"""
+        with self.lock:
+            self._refresh()
+            listing = []
+            for version, offset, entry_type, saved_at in self.index.get(name, []):
+                item = {'version': version, 'saved_at': saved_at, 'type': entry_type}
+                if entry_type == TYPE_DELTA:
+                    item['changes'] = delta_summary(self._read(offset)['data'])
+                listing.append(item)
+            return listing
+
+    def latest_version(self, name):
+        with self.lock:
+            self._refresh()
+            entries = self.index.get(name)
+            return entries[-1][0] if entries else None
+
+    def get(self, name, version=None):
+        """Esitys annetussa versiossa (oletus uusin)"""
+        with self.lock:
+            self._refresh()
+            if version is None:
+                if not self.index.get(name):
+                    raise KeyError(f"Esityksellä '{name}' ei ole historiaa")
+                version = self.index[name][-1][0]
+            return self._build(name, int(version))
+
+    def diff(self, name, from_version, to_version):
+        """Muutokset versiosta toiseen (sama muoto kuin tallennettu delta)"""
+        old = self.get(name, from_version)
+        new = self.get(name, to_version)
+        delta = preset_delta(old, new)
+        if delta is None:
+            return {'fields': diff_fields(old, new, skip=IGNORED_FIELDS)}
+        return delta
+
+    def names(self):
+        with self.lock:
+            self._refresh()
+            return sorted(self.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Esitysten versiohistoria")
+    parser.add_argument('history_file')
+    parser.add_argument('preset', nargs='?', help="Esityksen nimi (tyhjä = listaa esitykset)")
+    parser.add_argument('--version', type=int, help="Tulosta esitys tässä versiossa")
+    parser.add_argument('--diff', type=int, nargs=2, metavar=('FROM', 'TO'))
+    args = parser.parse_args()
+
+    history = PresetHistory(args.history_file)
+    if args.preset is None:
+        for name in history.names():
+            print(f"🎭 {name}: {history.latest_version(name)} versiota")
+        return 0
+
+    try:
+        if args.version is not None:
+            print(json.dumps(history.get(args.preset, args.version), indent=2, ensure_ascii=False))
+            return 0
+        if args.diff:
+            print(json.dumps(history.diff(args.preset, *args.diff), indent=2, ensure_ascii=False))
+            return 0
+    except KeyError as e:
+        print(f"❌ {e.args[0]}")
+        return 1
+
+    for item in history.versions(args.preset):
+        changes = item.get('changes')
+        if changes:
+            detail = f"kohtaukset {', '.join(changes['scenes']) or '-'}, {changes['channels']} kanavaa"
+            if changes['fields']:
+                detail += f", kentät {', '.join(changes['fields'])}"
+        else:
+            detail = "koko esitys"
+        print(f"🕘 v{item['version']:<4} {item['type']:<8} {item['saved_at'] or '':<26} {detail}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+🔎 Preset Index - käänteinen kanavahakemisto esityskirjastolle
+
+Pitää muistissa hakemiston kanava → {(esitys, kohtaus): taso}, jotta
+kysymykset kuten "mitkä kohtaukset käyttävät kanavaa 27" tai "mitkä
+esitykset koskevat RGBW 33-36 -ryhmää" eivät vaadi koko esitykset.json:n
+lukemista ja läpikäyntiä. Tallennus päivittää vain muuttuneen esityksen
+rivit (update_preset), koko hakemisto rakennetaan uudelleen vain jos
+tiedostoa on muutettu palvelimen ohi (mtime).
+
+Rivit avataan esityksen sisäisellä tunnisteella ja kohtauksen paikalla, ei
+nimillä: samannimiset esitykset (ks. scripts/remove_duplicates.py) ja saman
+esityksen samannimiset kohtaukset pysyvät omina riveinään.
+
+Käyttö:
+    index = PresetIndex.from_file("esitykset.json")
+    index.query("33-36")                      # mikä tahansa kanavista
+    index.query([27, 28], match="all")        # kaikki kanavat samassa kohtauksessa
+
+    python3 preset_index.py esitykset.json 27 "RGBW 33-36" --match all
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+
+from scene_store import load_presets
+
+MATCH_ANY = "any"
+MATCH_ALL = "all"
+
+CHANNEL_RANGE_PATTERN = re.compile(r'(\d+)\s*-\s*(\d+)|(\d+)')
+
+
+def parse_channel_spec(spec):
+    """
+    Kanavamäärittely listaksi: "27", "33-36", "RGBW 33-36", "1,5,33-36" tai [27, 28]
+
+    Valaisinnimen etuliite (RGBW, Spot...) ohitetaan - vain numerot ja välit luetaan.
+    """
+    if isinstance(spec, int):
+        return [spec]
+    if not isinstance(spec, str):
+        channels = []
+        for item in spec:
+            channels.extend(parse_channel_spec(item))
+        return sorted(set(channels))
+
+    channels = set()
+    for first, last, single in CHANNEL_RANGE_PATTERN.findall(spec):
+        if single:
+            channels.add(int(single))
+        else:
+            low, high = sorted((int(first), int(last)))
+            channels.update(range(low, high + 1))
+    if not channels:
+        raise ValueError(f"Ei kanavia määrittelyssä '{spec}'")
+    return sorted(channels)
+
+
+class PresetIndex:
+    """Kanava → (esitys, kohtaus, taso) -hakemisto, päivitettävissä esitys kerrallaan"""
+
+    def __init__(self):
+        self.channels = {}     # kanava → {(tunniste, kohtauksen paikka): taso}
+        self.presets = {}      # tunniste → (esitys, [(kohtaus, {kanava: taso})])
+        self.ids = {}          # esitys → tunnisteet tiedostojärjestyksessä (duplikaatit mukana)
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.source_mtime = None
+
+    @classmethod
+    def from_presets(cls, presets):
+        index = cls()
+        with index.lock:
+            for preset in presets:
+                index._add(preset)
+        return index
+
+    @classmethod
+    def from_file(cls, path):
+        index = cls()
+        index.reload(path)
+        return index
+
+    def reload(self, path):
+        """Rakentaa hakemiston tiedostosta (puuttuva tiedosto = tyhjä kirjasto)"""
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        presets = load_presets(path)
+
+        with self.lock:
+            self.channels = {}
+            self.presets = {}
+            self.ids = {}
+            for preset in presets:
+                self._add(preset)
+            self.source_mtime = mtime
+
+    def refresh(self, path):
+        """Rakentaa uudelleen vain jos tiedosto on muuttunut viime latauksen jälkeen"""
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        if mtime != self.source_mtime:
+            self.reload(path)
+
+    def mark_synced(self, path):
+        """Tiedosto on kirjoitettu ja hakemisto päivitetty samaan tilaan"""
+        self.source_mtime = os.path.getmtime(path) if os.path.exists(path) else None
+
+    def _add(self, preset, preset_id=None):
+        """Lisää esityksen rivit (uusi tunniste, tai korvattavan esityksen vanha tunniste)"""
+        name = preset.get('name', '')
+        if preset_id is None:
+            preset_id = self.next_id
+            self.next_id += 1
+            self.ids.setdefault(name, []).append(preset_id)
+        scenes = []
+        for position, scene in enumerate(preset.get('scenes', [])):
+            levels = {int(channel): int(level) for channel, level in scene.get('channels', {}).items()}
+            scenes.append((scene.get('name', ''), levels))
+            for channel, level in levels.items():
+                self.channels.setdefault(channel, {})[(preset_id, position)] = level
+        self.presets[preset_id] = (name, scenes)
+
+    def _remove_rows(self, preset_id):
+        _, scenes = self.presets.pop(preset_id, ('', []))
+        for position, (_, levels) in enumerate(scenes):
+            for channel in levels:
+                users = self.channels.get(channel)
+                if users is None:
+                    continue
+                users.pop((preset_id, position), None)
+                if not users:
+                    del self.channels[channel]
+
+    def update_preset(self, preset):
+        """Korvaa esityksen rivit (uusi tai muokattu esitys) - kuten tallennus, ensimmäinen samanniminen"""
+        name = preset.get('name', '')
+        with self.lock:
+            ids = self.ids.get(name)
+            if ids:
+                self._remove_rows(ids[0])
+                self._add(preset, ids[0])
+            else:
+                self._add(preset)
+
+    def remove_preset(self, name):
+        """Poistaa ensimmäisen samannimisen esityksen rivit"""
+        with self.lock:
+            ids = self.ids.get(name)
+            if ids:
+                self._remove_rows(ids.pop(0))
+                if not ids:
+                    del self.ids[name]
+
+    def query(self, channels, match=MATCH_ANY, preset=None):
+        """
+        Kohtaukset jotka käyttävät annettuja kanavia
+
+        match: "any" = vähintään yksi kanavista, "all" = kaikki samassa kohtauksessa
+        preset: rajaa yhteen esitykseen
+        Palauttaa listan {"preset", "scene", "levels": {kanava: taso}} esitys/kohtaus-järjestyksessä.
+        """
+        if match not in (MATCH_ANY, MATCH_ALL):
+            raise ValueError(f"Tuntematon match '{match}'")
+        wanted = parse_channel_spec(channels)
+
+        hits = {}
+        with self.lock:
+            for channel in wanted:
+                for (preset_id, position), level in self.channels.get(channel, {}).items():
+                    name, scenes = self.presets[preset_id]
+                    if preset is None or name == preset:
+                        key = (name, scenes[position][0], preset_id, position)
+                        hits.setdefault(key, {})[channel] = level
+
+        if match == MATCH_ALL:
+            hits = {key: levels for key, levels in hits.items() if len(levels) == len(wanted)}
+
+        return [
+            {'preset': key[0], 'scene': key[1], 'levels': {str(ch): lv for ch, lv in sorted(levels.items())}}
+            for key, levels in sorted(hits.items())
+        ]
+
+    def summary(self):
+        """Kanavakohtainen käyttömäärä: {kanava: kohtauksia}"""
+        with self.lock:
+            return {str(channel): len(users) for channel, users in sorted(self.channels.items())}
+
+    def preset_names(self, results):
+        """Esitysten nimet kyselyn tuloksista (järjestys säilyy)"""
+        return list(dict.fromkeys(result['preset'] for result in results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hae kohtaukset kanavien mukaan")
+    parser.add_argument('presets_file')
+    parser.add_argument('channels', nargs='*', help='esim. 27, 33-36 tai "RGBW 33-36"')
+    parser.add_argument('--match', choices=(MATCH_ANY, MATCH_ALL), default=MATCH_ANY)
+    parser.add_argument('--preset', help='Rajaa yhteen esitykseen')
+    args = parser.parse_args()
+
+    index = PresetIndex.from_file(args.presets_file)
+    if not args.channels:
+        for channel, count in index.summary().items():
+            print(f"🎚️  Kanava {channel:>3}: {count} kohtausta")
+        return 0
+
+    results = index.query(args.channels, args.match, args.preset)
+    for result in results:
+        levels = ", ".join(f"{ch}:{lv}" for ch, lv in result['levels'].items())
+        print(f"🎭 {result['preset']} / {result['scene']}  [{levels}]")
+    print(f"🔎 {len(results)} kohtausta, {len(index.preset_names(results))} esitystä")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
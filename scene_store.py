@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+🗃️ Scene Store - kohtaukset kerran, esitykset viittauksina
+
+esitykset.json tallentaa jokaisen kohtauksen kanavakartan kokonaan jokaiseen
+esitykseen - sama BlenderScene-kartta toistuu eri esityksissä. Varastomuodossa
+kanavakartta tallennetaan kerran sisältönsä tiivisteellä, ja esityksen
+kohtaus on viittaus + käyttökohtaiset asetukset (nimi, fade-kestot, steps...):
+
+    {
+      "format": "scene-store", "version": 1,
+      "scenes": {"3f2a...": {"channels": {"21": 60, "22": 60}}},
+      "presets": [{"name": "Kalareissu", "steps": 20,
+                   "scenes": [{"ref": "3f2a...", "name": "Aamu",
+                               "fade_in_duration": 3.0, "fade_out_duration": 2.0}]}]
+    }
+
+load_presets() palauttaa aina vanhan listamuodon, joten palvelin, show_bundle
+ja muut lukijat toimivat kummallakin tiedostolla. save_presets() kirjoittaa
+samassa muodossa jossa tiedosto jo on.
+
+Käyttö:
+    python3 scene_store.py pack esitykset.json          # muunna paikallaan
+    python3 scene_store.py unpack esitykset.json -o vanha.json
+    python3 scene_store.py stats esitykset.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+STORE_FORMAT = "scene-store"
+STORE_VERSION = 1
+KEY_LENGTH = 16  # heksamerkkiä SHA-1:stä
+
+
+def canonical_channels(channels):
+    """Kanavakartta vertailukelpoiseksi: kanavat numerojärjestyksessä, tasot kokonaislukuina"""
+    return {str(channel): int(level) for channel, level in
+            sorted(channels.items(), key=lambda item: int(item[0]))}
+
+
+def scene_key(channels):
+    """Kanavakartan sisältötiiviste (sama kartta → sama avain kaikissa esityksissä)"""
+    payload = json.dumps(canonical_channels(channels), separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:KEY_LENGTH]
+
+
+def is_store(data):
+    return isinstance(data, dict) and data.get('format') == STORE_FORMAT
+
+
+def pack(presets):
+    """Esityslista → varasto (kanavakartat kerran, kohtaukset viittauksina)"""
+    scenes = {}
+    packed = []
+    for preset in presets:
+        refs = []
+        for scene in preset.get('scenes', []):
+            key = scene_key(scene.get('channels', {}))
+            scenes.setdefault(key, {'channels': {str(ch): int(lv) for ch, lv in scene.get('channels', {}).items()}})
+            use = {name: value for name, value in scene.items() if name != 'channels'}
+            refs.append(dict({'ref': key}, **use))
+        packed.append(dict(preset, scenes=refs))
+    return {'format': STORE_FORMAT, 'version': STORE_VERSION, 'scenes': scenes, 'presets': packed}
+
+
+def resolve_scene(store, use):
+    """Viittaus + käyttökohtaiset asetukset → täysi kohtaus"""
+    if use['ref'] not in store['scenes']:
+        raise ValueError(f"Kohtausviittausta '{use['ref']}' ei löydy varastosta")
+    scene = {name: value for name, value in use.items() if name != 'ref'}
+    scene['channels'] = dict(store['scenes'][use['ref']]['channels'])
+    return scene
+
+
+def unpack(store):
+    """Varasto → esityslista (vanha esitykset.json-muoto)"""
+    if store.get('version', STORE_VERSION) > STORE_VERSION:
+        raise ValueError(f"Tuntematon varastoversio {store.get('version')}")
+    return [dict(preset, scenes=[resolve_scene(store, use) for use in preset.get('scenes', [])])
+            for preset in store.get('presets', [])]
+
+
+def load_presets(path):
+    """Lukee esitykset kummasta tahansa muodosta listana (puuttuva tiedosto = tyhjä lista)"""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if is_store(data):
+        return unpack(data)
+    return data if isinstance(data, list) else [data]
+
+
+def save_presets(path, presets):
+    """Tallentaa esitykset samassa muodossa kuin olemassa oleva tiedosto (uusi = listamuoto)"""
+    store = False
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                store = is_store(json.load(f))
+            except ValueError:
+                store = False
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(pack(presets) if store else presets, f, indent=2, ensure_ascii=False)
+
+
+def store_stats(presets):
+    """Montako kohtauskäyttöä ja montako erillistä kanavakarttaa"""
+    store = pack(presets)
+    uses = sum(len(preset['scenes']) for preset in store['presets'])
+    return {
+        'presets': len(store['presets']),
+        'scene_uses': uses,
+        'unique_scenes': len(store['scenes']),
+        'list_bytes': len(json.dumps(presets, indent=2, ensure_ascii=False).encode('utf-8')),
+        'store_bytes': len(json.dumps(store, indent=2, ensure_ascii=False).encode('utf-8'))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Esitysten kohtausvarasto (deduplikointi)")
+    parser.add_argument('command', choices=('pack', 'unpack', 'stats'))
+    parser.add_argument('presets_file')
+    parser.add_argument('-o', '--output', help="Kohdetiedosto (oletus: sama tiedosto)")
+    args = parser.parse_args()
+
+    presets = load_presets(args.presets_file)
+
+    if args.command == 'stats':
+        stats = store_stats(presets)
+        print(f"🎭 {stats['presets']} esitystä, {stats['scene_uses']} kohtausta, "
+              f"{stats['unique_scenes']} erillistä kanavakarttaa")
+        print(f"💾 Listamuoto {stats['list_bytes']} tavua, varastomuoto {stats['store_bytes']} tavua")
+        return 0
+
+    output = args.output or args.presets_file
+    data = pack(presets) if args.command == 'pack' else presets
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    print(f"✅ {'Pakattu' if args.command == 'pack' else 'Purettu'}: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,18 @@
 #!/usr/bin/env python3
-import json
+import os
+import shutil
+import sys
 from collections import OrderedDict
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from preset_history import PresetHistory, history_path
+from scene_store import load_presets, save_presets
+
 def remove_duplicates(json_file):
     """Poistaa duplikaatti-esitykset JSON-tiedostosta, säilyttäen uusimman version."""
     
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Lista- tai kohtausvarastomuoto (scene_store) - luetaan aina listana
+    data = load_presets(json_file)
     
     print(f"Löydettiin {len(data)} esitystä yhteensä")
     
@@ -29,20 +35,30 @@ def remove_duplicates(json_file):
             unique_presets[name] = preset
             print(f"Lisätään uusi esitys: '{name}'")
     
+    # Hylätyt kopiot historiaan vanhemmiksi versioiksi (tallennusjärjestyksessä,
+    # säilytetty viimeisenä) - mitään ei hävitetä
+    history = PresetHistory(history_path(json_file))
+    for name, kept in unique_presets.items():
+        copies = [preset for preset in data if preset['name'] == name]
+        if len(copies) > 1:
+            older = sorted((preset for preset in copies if preset is not kept),
+                           key=lambda preset: preset.get('saved_at', ''))
+            for preset in older + [kept]:
+                history.record(preset)
+            print(f"Historiaan '{name}': {len(older)} vanhempaa versiota")
+    
     # Muutetaan takaisin listaksi
     cleaned_data = list(unique_presets.values())
     
     print(f"\nTulos: {len(cleaned_data)} uniikkia esitystä (poistettu {len(data) - len(cleaned_data)} duplikaattia)")
     
-    # Luo varmuuskopio
+    # Luo varmuuskopio (alkuperäinen tiedosto sellaisenaan)
     backup_file = json_file + '.backup'
-    with open(backup_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    shutil.copyfile(json_file, backup_file)
     print(f"Varmuuskopio luotu: {backup_file}")
     
-    # Tallenna puhdistettu versio
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(cleaned_data, f, indent=2, ensure_ascii=False)
+    # Tallenna puhdistettu versio samassa muodossa kuin alkuperäinen
+    save_presets(json_file, cleaned_data)
     print(f"Puhdistettu tiedosto tallennettu: {json_file}")
 
 if __name__ == "__main__":
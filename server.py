@@ -4,29 +4,408 @@
 import http.server
 import socketserver
 import json
-import subprocess
 import os
 import urllib.parse
 import tempfile
 import mimetypes
 from pathlib import Path
 import datetime
+import base64
+import hashlib
+import struct
+import threading
+
+from valot_python_backend import (
+    PROFILE_COMPATIBLE,
+    adaptive_envelope,
+    build_adaptive_crossfade_events,
+    build_crossfade_events,
+    compact_fade_events,
+    crossfade_channels,
+    generate,
+)
+from cue_stack import CueStack, CueStackRunner
+from level_frames import DEFAULT_FPS, DEFAULT_HOLD_SECONDS, MAX_FPS, scene_levels, show_levels
+from preset_history import PresetHistory, history_path
+from preset_index import MATCH_ANY, PresetIndex
+from scene_store import load_presets, save_presets
+from midi_player import (
+    MIDO_AVAILABLE,
+    MidiPlayer,
+    MidoSink,
+    events_to_messages,
+    list_output_ports,
+    scene_messages,
+)
 
 PORT = 8000
 SCRIPT_DIR = Path(__file__).parent
 MIDI_OUTPUT_DIR = SCRIPT_DIR / "generated_midi"
+FADE_CACHE_DIR = MIDI_OUTPUT_DIR / ".fade_cache"   # Esitysten yhteiset fade-tiedostot
 PRESETS_FILE = SCRIPT_DIR / "esitykset.json"
 
+# Live-tilan MIDI-ulostulo (tyhjä = vain WebSocket-asiakkaat)
+LIVE_MIDI_PORT = os.environ.get('MIDI_LIVE_PORT', '')
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC11B85'
+LIVE_PLAY_FADE_SECONDS = 0.5   # Blender live linkin muutoksen soittoaika
+# /live/scene-pyynnön generointiasetukset, jotka välitetään generate():lle kuten /generate-midi
+LIVE_GENERATE_SETTINGS = ('output_profile', 'compact_envelopes', 'midi_budget_bytes_per_second',
+                          'adaptive_steps', 'max_step_ms', 'perceptual_step', 'addressing')
+
 # Varmista että kansiot ovat olemassa
 MIDI_OUTPUT_DIR.mkdir(exist_ok=True)
 
+# Generointi vaihtaa työhakemistoa - vain yksi kerrallaan (palvelin on monisäikeinen)
+GENERATE_LOCK = threading.Lock()
+
+# esitykset.json:n luku-muokkaus-kirjoitus, hakemisto ja historia yhtenä - muuten
+# samanaikaiset tallennukset hävittävät toistensa esityksiä
+PRESETS_LOCK = threading.Lock()
+
+# Kanava → (esitys, kohtaus, taso) -hakemisto, ladataan ensimmäisellä kyselyllä
+PRESET_INDEX = PresetIndex()
+
+# Jokainen tallennus versioksi (delta edelliseen, snapshot välillä)
+PRESET_HISTORY = PresetHistory(history_path(PRESETS_FILE))
+
+
+class WebSocketHub:
+    """Live-viestien jakelu WebSocket-asiakkaille (binäärikehys = 3 MIDI-tavua)"""
+
+    def __init__(self):
+        self.clients = set()
+        self.lock = threading.Lock()
+
+    def add(self, connection):
+        with self.lock:
+            self.clients.add(connection)
+
+    def remove(self, connection):
+        with self.lock:
+            self.clients.discard(connection)
+
+    def send(self, message):
+        frame = bytes((0x82, len(message))) + bytes(message)
+        with self.lock:
+            clients = list(self.clients)
+        for connection in clients:
+            try:
+                connection.sendall(frame)
+            except OSError:
+                self.remove(connection)
+
+
+class LiveEngine:
+    """
+    Live-tila: fade lasketaan muistissa ja soitetaan heti ilman tiedostoja
+
+    Viestit menevät MIDI-porttiin (jos määritetty) ja kaikille
+    WebSocket-asiakkaille. Uusi cue keskeyttää edellisen.
+    Cue stack (/live/stack) yhdistää sen sijaan päällekkäiset cuet (HTP/LTP).
+    """
+
+    def __init__(self, port_name=''):
+        self.hub = WebSocketHub()
+        self.port_sink = None
+        self.port_name = ''
+        self.player = MidiPlayer(self)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.last_cue = None
+        self.last_stats = None
+        self.stack = CueStackRunner(CueStack(os.environ.get('MIDI_STACK_MODE', 'htp')), self)
+        if port_name:
+            self.set_port(port_name)
+
+    def set_port(self, port_name, virtual=False):
+        """Vaihtaa MIDI-ulostulon (tyhjä nimi = ei porttia)"""
+        with self.lock:
+            if self.port_sink is not None:
+                self.port_sink.close()
+                self.port_sink = None
+            self.port_name = ''
+            if port_name:
+                self.port_sink = MidoSink(port_name, virtual)
+                self.port_name = port_name
+
+    def send(self, message):
+        if self.port_sink is not None:
+            self.port_sink.send(message)
+        self.hub.send(message)
+
+    def fire(self, messages, cue_name):
+        """Käynnistää cuen taustasäikeessä, keskeyttää edellisen"""
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                self.player.stop()
+                self.thread.join()
+
+            def run():
+                self.last_stats = self.player.play(messages)
+                print(f"🎬 Live-cue valmis: {cue_name} (jitter p95 {self.last_stats.get('p95_ms', 0)} ms)")
+
+            self.last_cue = cue_name
+            self.thread = threading.Thread(target=run, daemon=True)
+            self.thread.start()
+
+    def status(self):
+        return {
+            'playing': self.thread is not None and self.thread.is_alive(),
+            'last_cue': self.last_cue,
+            'last_stats': self.last_stats,
+            'port': self.port_name,
+            'websocket_clients': len(self.hub.clients),
+            'mido_available': MIDO_AVAILABLE,
+            'stack': self.stack.status()
+        }
+
+
+def find_preset_scene(preset_name, scene_name):
+    """Hakee kohtauksen tallennetuista esityksistä"""
+    for preset in load_presets(PRESETS_FILE):
+        if preset.get('name') == preset_name:
+            for scene in preset.get('scenes', []):
+                if scene.get('name') == scene_name:
+                    return scene
+    return None
+
+
+def store_preset(data):
+    """
+    Tallentaa esityksen esitykset.json:iin (korvaa samannimisen) ja historiaan
+
+    Historiaton vanha esitys kirjataan ensin omaksi versiokseen, jotta
+    ensimmäinenkään korvaus ei hävitä mitään. Palauttaa uuden versionumeron.
+    """
+    with PRESETS_LOCK:
+        # Hakemisto samaan tilaan tiedoston kanssa ennen päivitystä
+        PRESET_INDEX.refresh(PRESETS_FILE)
+
+        # Lataa olemassa olevat esitykset
+        presets = load_presets(PRESETS_FILE)
+
+        # Etsi olemassa oleva esitys samalla nimellä
+        preset_name = data.get('name', '')
+        existing_index = -1
+        for i, preset in enumerate(presets):
+            if preset.get('name', '') == preset_name:
+                existing_index = i
+                break
+
+        if existing_index >= 0:
+            if PRESET_HISTORY.latest_version(preset_name) is None:
+                PRESET_HISTORY.record(presets[existing_index])
+            # Korvaa olemassa oleva esitys
+            presets[existing_index] = data
+            print(f"🔄 Korvattu olemassa oleva esitys: {preset_name}")
+        else:
+            # Lisää uusi esitys
+            presets.append(data)
+            print(f"➕ Lisätty uusi esitys: {preset_name}")
+
+        # Tallenna takaisin (samassa muodossa: lista tai kohtausvarasto)
+        save_presets(PRESETS_FILE, presets)
+
+        PRESET_INDEX.update_preset(data)
+        PRESET_INDEX.mark_synced(PRESETS_FILE)
+
+        return PRESET_HISTORY.record(data)
+
+
+def live_cue_messages(data):
+    """
+    Laskee live-cuen viestit pyynnöstä
+
+    - scene: kohtaus suoraan (kanavat, kestot, steps) tai preset + scene_name
+    - fade: "in", "out" tai "crossfade" (lähtö: from_scene tai from_scene_name)
+    """
+    def resolve(scene_key, name_key):
+        if scene_key in data:
+            return data[scene_key]
+        scene = find_preset_scene(data.get('preset'), data.get(name_key))
+        if scene is None:
+            raise ValueError(f"Kohtausta '{data.get(name_key)}' ei löytynyt")
+        return scene
+
+    scene = resolve('scene', 'scene_name')
+    fade = data.get('fade', 'in')
+    profile = data.get('output_profile', PROFILE_COMPATIBLE)
+    compact = data.get('compact_envelopes', True)
+
+    if fade == 'crossfade':
+        source = resolve('from_scene', 'from_scene_name')
+        notes, from_velocities, to_velocities = crossfade_channels(source['channels'], scene['channels'])
+        adaptive = adaptive_envelope(scene, data.get('adaptive_steps', False))
+        if adaptive:
+            events = build_adaptive_crossfade_events(notes, from_velocities, to_velocities,
+                                                     scene['fade_in_duration'], **adaptive)
+        else:
+            events = build_crossfade_events(notes, from_velocities, to_velocities,
+                                            scene['fade_in_duration'], scene.get('steps', 20))
+        if compact:
+            events = compact_fade_events(events)
+        return events_to_messages(events, profile), scene.get('name', 'live')
+
+    if fade not in ('in', 'out'):
+        raise ValueError(f"Tuntematon fade '{fade}'")
+    return scene_messages(scene, fade == 'in', profile, compact), scene.get('name', 'live')
+
+
+def live_stack_action(data):
+    """
+    Cue stack -toiminto pyynnöstä
+
+    - action: "fire" (oletus), "release" tai "release_all"
+    - fire: scene tai preset + scene_name, valinnaisesti fade ja release_others
+    - release: name (cuen nimi = kohtauksen nimi), valinnaisesti fade
+    """
+    action = data.get('action', 'fire')
+    stack = LIVE_ENGINE.stack
+
+    if action == 'fire':
+        scene = data.get('scene') or find_preset_scene(data.get('preset'), data.get('scene_name'))
+        if scene is None:
+            raise ValueError(f"Kohtausta '{data.get('scene_name')}' ei löytynyt")
+        name = stack.fire(scene, fade=data.get('fade'), release_others=data.get('release_others', False))
+        return {'success': True, 'action': action, 'cue': name, 'stack': stack.status()}
+    if action == 'release':
+        released = stack.release(data['name'], data.get('fade'))
+        return {'success': released, 'action': action, 'cue': data['name'], 'stack': stack.status()}
+    if action == 'release_all':
+        stack.release_all(data.get('fade'))
+        return {'success': True, 'action': action, 'stack': stack.status()}
+    raise ValueError(f"Tuntematon toiminto '{action}'")
+
+
+def compute_levels(data):
+    """
+    Esikatselun tasoruudut pyynnöstä: palauttaa (kanavat, ruudut, fps)
+
+    - scene tai preset + scene_name: yksi fade (fade: in/out/crossfade,
+      crossfaden lähtö from_scene tai from_scene_name)
+    - pelkkä preset: koko esitys (fade-in, crossfadet, fade-out, pito hold s)
+    """
+    fps = int(data.get('fps', DEFAULT_FPS))
+    if not 1 <= fps <= MAX_FPS:
+        raise ValueError(f"fps pitää olla 1-{MAX_FPS}")
+    options = {
+        'profile': data.get('output_profile', PROFILE_COMPATIBLE),
+        'compact': data.get('compact_envelopes', True),
+        'default_adaptive': data.get('adaptive_steps', False)
+    }
+
+    if 'scene' not in data and 'scene_name' not in data:
+        preset = next((p for p in load_presets(PRESETS_FILE) if p.get('name') == data.get('preset')), None)
+        if preset is None:
+            raise ValueError(f"Esitystä '{data.get('preset')}' ei löytynyt")
+        options['default_adaptive'] = data.get('adaptive_steps', preset.get('adaptive_steps', False))
+        channels, frames = show_levels(preset, fps, float(data.get('hold', DEFAULT_HOLD_SECONDS)), **options)
+        return channels, frames, fps
+
+    def resolve(scene_key, name_key):
+        if scene_key in data:
+            return data[scene_key]
+        scene = find_preset_scene(data.get('preset'), data.get(name_key))
+        if scene is None:
+            raise ValueError(f"Kohtausta '{data.get(name_key)}' ei löytynyt")
+        return scene
+
+    fade = data.get('fade', 'in')
+    source = resolve('from_scene', 'from_scene_name') if fade == 'crossfade' else None
+    channels, frames = scene_levels(resolve('scene', 'scene_name'), fade, fps, source, **options)
+    return channels, frames, fps
+
+
+def write_scene_midi(scene, output_dir, settings=None):
+    """
+    Generoi kohtauksen fade-in/fade-out tiedostot samalla generate():lla kuin /generate-midi
+
+    settings: pyynnön generointiasetukset (LIVE_GENERATE_SETTINGS: output_profile,
+    compact_envelopes, addressing...) - sama tulos kuin /generate-midi samoilla asetuksilla
+    """
+    data = {key: value for key, value in (settings or {}).items() if key in LIVE_GENERATE_SETTINGS}
+    data.update({'scenes': [scene], 'outputDir': str(output_dir), 'fade_cache_dir': str(FADE_CACHE_DIR)})
+    with GENERATE_LOCK:
+        result = generate(data)['results'][0]
+    return {'fade_in_file': result['fade_in_file'], 'fade_out_file': result['fade_out_file']}
+
+
+def apply_live_scene(data):
+    """
+    Blender live link: yhdistää muuttuneet kanavat kohtaukseen ja generoi MIDI:t
+
+    changes: {"kanava": velocity}, velocity 0 poistaa kanavan.
+    play: soita siirtymä edellisestä tilasta heti live-ulostuloon.
+    """
+    name = data.get('scene', 'BlenderLive')
+    with LIVE_SCENES_LOCK:
+        previous = LIVE_SCENES.get(name, {})
+        channels = dict(previous)
+        for channel, velocity in data.get('changes', {}).items():
+            if int(velocity) > 0:
+                channels[str(channel)] = int(velocity)
+            else:
+                channels.pop(str(channel), None)
+        LIVE_SCENES[name] = channels
+
+    scene = {
+        'name': name,
+        'channels': channels,
+        'fade_in_duration': data.get('fade_in_duration', 2.0),
+        'fade_out_duration': data.get('fade_out_duration', 3.0),
+        'steps': data.get('steps', 20)
+    }
+    files = write_scene_midi(scene, MIDI_OUTPUT_DIR, data)
+
+    if data.get('play'):
+        messages, _ = live_cue_messages({
+            'scene': dict(scene, fade_in_duration=data.get('play_duration', LIVE_PLAY_FADE_SECONDS)),
+            'from_scene': {'channels': previous},
+            'fade': 'crossfade'
+        })
+        LIVE_ENGINE.fire(messages, name)
+
+    return dict(files, success=True, scene=name, channels=len(channels),
+                changed=len(data.get('changes', {})))
+
+
+# Blender live linkin kohtaukset muistissa: {nimi: {"kanava": velocity}}
+LIVE_SCENES = {}
+LIVE_SCENES_LOCK = threading.Lock()
+
+LIVE_ENGINE = LiveEngine(LIVE_MIDI_PORT)
+
 class MIDIHandler(http.server.BaseHTTPRequestHandler):
     
+    # HTTP/1.1: JSON-vastaukset (Content-Length) pitävät yhteyden auki
+    # generation clientille, muut vastaukset sulkevat sen kuten ennenkin
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Otsakkeet ja runko erikseen - ei 40 ms viivettä
+    
+    def send_response(self, code, message=None):
+        self._response_code = code
+        self._content_length_sent = False
+        super().send_response(code, message)
+    
+    def send_header(self, keyword, value):
+        if keyword.lower() == 'content-length':
+            self._content_length_sent = True
+        super().send_header(keyword, value)
+    
+    def end_headers(self):
+        if not self._content_length_sent and self._response_code != 101:
+            super().send_header('Connection', 'close')
+            self.close_connection = True
+        super().end_headers()
+    
     def do_GET(self):
         """Käsittele GET-pyynnöt"""
         if self.path == '/':
             self.path = '/valot3.html'
         
+        if self.path.startswith('/live/'):
+            return self.handle_live_get()
+        
         if self.path.startswith('/download/'):
             # MIDI-tiedoston lataus
             filename = self.path[10:]  # Poista '/download/' alusta
@@ -49,18 +428,24 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
                 self.wfile.write(b'File not found')
                 print(f"❌ Tiedostoa ei löytynyt: {filename}")
                 
+        elif self.path.startswith('/presets/channels'):
+            self.handle_channel_query()
+                
+        elif self.path.startswith('/presets/history') or self.path.startswith('/presets/diff'):
+            self.handle_history_get()
+                
+        elif self.path.startswith('/levels?'):
+            self.handle_levels_get()
+                
         elif self.path == '/presets':
             # Palauta tallennetut esitykset
+            # (varastomuoto puretaan listaksi - UI näkee aina saman muodon)
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            if PRESETS_FILE.exists():
-                with open(PRESETS_FILE, 'r', encoding='utf-8') as f:
-                    self.wfile.write(f.read().encode('utf-8'))
-            else:
-                self.wfile.write(json.dumps([]).encode('utf-8'))
+            self.wfile.write(json.dumps(load_presets(PRESETS_FILE), ensure_ascii=False).encode('utf-8'))
                 
         else:
             # Staattinen tiedosto
@@ -89,8 +474,218 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
                 self.send_response(500)
                 self.end_headers()
 
+    def send_json(self, data, status=200):
+        """Lähetä JSON-vastaus CORS-otsakkeella"""
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_channel_query(self):
+        """
+        GET /presets/channels?channels=33-36&match=all&preset=Nimi
+
+        Ilman channels-parametria palauttaa kanavien käyttömäärät.
+        """
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        try:
+            PRESET_INDEX.refresh(PRESETS_FILE)
+            if 'channels' not in query:
+                self.send_json({'success': True, 'channels': PRESET_INDEX.summary()})
+                return
+            results = PRESET_INDEX.query(query['channels'], query.get('match', [MATCH_ANY])[0],
+                                         query.get('preset', [None])[0])
+            self.send_json({
+                'success': True,
+                'results': results,
+                'presets': PRESET_INDEX.preset_names(results)
+            })
+        except ValueError as e:
+            self.send_json({'success': False, 'error': str(e)}, 400)
+
+    def handle_history_get(self):
+        """
+        GET /presets/history?name=Nimi              → versiolista
+        GET /presets/history?name=Nimi&version=3    → esitys versiossa 3
+        GET /presets/diff?name=Nimi&from=2&to=5     → muutokset (oletus: edellinen → uusin)
+        """
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        name = query.get('name', [None])[0]
+        if name is None:
+            self.send_json({'success': False, 'error': 'name puuttuu'}, 400)
+            return
+        try:
+            if self.path.startswith('/presets/diff'):
+                latest = PRESET_HISTORY.latest_version(name)
+                if latest is None:
+                    raise KeyError(f"Esityksellä '{name}' ei ole historiaa")
+                to_version = int(query.get('to', [latest])[0])
+                from_version = int(query.get('from', [to_version - 1])[0])
+                self.send_json({
+                    'success': True,
+                    'name': name,
+                    'from': from_version,
+                    'to': to_version,
+                    'changes': PRESET_HISTORY.diff(name, from_version, to_version)
+                })
+            elif 'version' in query:
+                version = int(query['version'][0])
+                self.send_json({'success': True, 'version': version,
+                                'preset': PRESET_HISTORY.get(name, version)})
+            else:
+                self.send_json({'success': True, 'name': name, 'versions': PRESET_HISTORY.versions(name)})
+        except KeyError as e:
+            self.send_json({'success': False, 'error': e.args[0]}, 404)
+        except ValueError as e:
+            self.send_json({'success': False, 'error': str(e)}, 400)
+
+    def send_levels(self, data):
+        """
+        Tasoruudut binäärinä: rivit = ruudut, sarakkeet = X-Level-Channels, 1 tavu/taso
+
+        Selaimessa: new Uint8Array(await response.arrayBuffer())
+        """
+        try:
+            channels, frames, fps = compute_levels(data)
+        except RuntimeError as e:
+            self.send_json({'success': False, 'error': str(e)}, 501)
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json({'success': False, 'error': str(e)}, 400)
+            return
+
+        body = frames.tobytes()
+        self.send_response(200)
+        self.send_header('Content-type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Level-Channels', ','.join(str(channel) for channel in channels))
+        self.send_header('X-Level-Frames', str(len(frames)))
+        self.send_header('X-Level-FPS', str(fps))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'X-Level-Channels, X-Level-Frames, X-Level-FPS')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_levels_get(self):
+        """GET /levels?preset=Nimi[&scene=Kohtaus&fade=in|out|crossfade&from_scene=..][&fps=60&hold=1]"""
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        names = {'scene': 'scene_name', 'from_scene': 'from_scene_name'}
+        self.send_levels({names.get(key, key): values[0] for key, values in query.items()})
+
+    def handle_live_get(self):
+        """Live-tilan GET-reitit: tila, portit ja WebSocket-yhteys"""
+        if self.path == '/live/status':
+            self.send_json(LIVE_ENGINE.status())
+        elif self.path == '/live/scene':
+            with LIVE_SCENES_LOCK:
+                self.send_json(LIVE_SCENES)
+        elif self.path == '/live/ports':
+            self.send_json({'ports': list_output_ports(), 'mido_available': MIDO_AVAILABLE})
+        elif self.path == '/live/ws' and self.headers.get('Upgrade', '').lower() == 'websocket':
+            self.handle_websocket()
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def handle_websocket(self):
+        """
+        Avaa WebSocket-yhteyden jolle live-viestit lähetetään binäärikehyksinä
+
+        Asiakkaalta luetaan vain sulkeminen - yhteys pidetään auki kunnes se katkeaa.
+        """
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+
+        connection = self.connection
+        LIVE_ENGINE.hub.add(connection)
+        print(f"🔌 WebSocket-asiakas yhdistetty ({len(LIVE_ENGINE.hub.clients)} kpl)")
+        try:
+            while True:
+                header = self.rfile.read(2)
+                if len(header) < 2:
+                    break
+                opcode = header[0] & 0x0F
+                length = header[1] & 0x7F
+                if length == 126:
+                    length = struct.unpack('>H', self.rfile.read(2))[0]
+                elif length == 127:
+                    length = struct.unpack('>Q', self.rfile.read(8))[0]
+                if header[1] & 0x80:
+                    self.rfile.read(4)  # Maski - asiakkaan dataa ei käytetä
+                self.rfile.read(length)
+                if opcode == 0x8:
+                    connection.sendall(b'\x88\x00')
+                    break
+        except OSError:
+            pass
+        finally:
+            LIVE_ENGINE.hub.remove(connection)
+            self.close_connection = True
+            print("🔌 WebSocket-asiakas poistui")
+
+    def handle_live_post(self):
+        """Live-tilan POST-reitit: cuen laukaisu ja ulostulon valinta"""
+        try:
+            content_length = int(self.headers.get('Content-Length', 0))
+            data = json.loads(self.rfile.read(content_length).decode('utf-8') or '{}')
+
+            if self.path == '/live/fire':
+                messages, cue_name = live_cue_messages(data)
+                LIVE_ENGINE.fire(messages, cue_name)
+                print(f"⚡ Live-cue: {cue_name} ({len(messages)} viestiä)")
+                self.send_json({
+                    'success': True,
+                    'cue': cue_name,
+                    'messages': len(messages),
+                    'duration_s': round(messages[-1][0], 3) if messages else 0.0
+                })
+            elif self.path == '/live/stack':
+                result = live_stack_action(data)
+                print(f"🎚️  Cue stack: {result['action']} {result.get('cue', '')}")
+                self.send_json(result)
+            elif self.path == '/live/scene':
+                result = apply_live_scene(data)
+                print(f"🔗 Live link: {result['scene']} {result['changed']} muutosta → {result['fade_in_file']}")
+                self.send_json(result)
+            elif self.path == '/live/stop':
+                LIVE_ENGINE.player.stop()
+                self.send_json({'success': True})
+            elif self.path == '/live/output':
+                LIVE_ENGINE.set_port(data.get('port', ''), data.get('virtual', False))
+                self.send_json({'success': True, 'port': LIVE_ENGINE.port_name})
+            else:
+                self.send_response(404)
+                self.end_headers()
+
+        except Exception as e:
+            print(f"❌ Live-virhe: {e}")
+            self.send_json({'success': False, 'error': str(e)}, 500)
+
     def do_POST(self):
         """Käsittele POST-pyynnöt"""
+        if self.path.startswith('/live/'):
+            return self.handle_live_post()
+        
+        if self.path == '/levels':
+            # Esikatselu tallentamattomalle kohtaukselle (JSON sisään, Uint8-ruudut ulos)
+            try:
+                content_length = int(self.headers.get('Content-Length', 0))
+                data = json.loads(self.rfile.read(content_length).decode('utf-8') or '{}')
+            except ValueError as e:
+                self.send_json({'success': False, 'error': str(e)}, 400)
+                return
+            return self.send_levels(data)
+        
         if self.path == '/generate-midi':
             # MIDI-generaatio
             try:
@@ -113,73 +708,63 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
                 print(f"📁 Tallennushakemisto: {output_dir}")
                 
                 # Vaihda työhakemisto määriteltyyn tallennushakemistoon
+                GENERATE_LOCK.acquire()
                 original_cwd = os.getcwd()
-                os.chdir(output_dir)
                 
                 try:
-                    # Kutsu Python-skriptiä samassa ympäristössä
-                    backend_script = SCRIPT_DIR / 'valot_python_backend.py'
-                    
-                    # Käytä virtual environmentin Python-tulkkia
-                    import sys
-                    venv_python = SCRIPT_DIR / '.venv' / 'bin' / 'python'
-                    if venv_python.exists():
-                        python_executable = str(venv_python)
-                    else:
-                        python_executable = sys.executable
-                    
-                    print(f"🐍 Käytetään Python-tulkkia: {python_executable}")
+                    os.chdir(output_dir)
                     
-                    result = subprocess.run(
-                        [python_executable, str(backend_script)],
-                        input=json.dumps(data),
-                        text=True,
-                        capture_output=True,
-                        check=True
-                    )
+                    # Samat kohtaukset eri esityksissä jakavat fade-tiedostot
+                    data.setdefault('fade_cache_dir', str(FADE_CACHE_DIR))
                     
-                    response_data = json.loads(result.stdout)
+                    # Generoi samassa prosessissa (ei Python-tulkin käynnistystä per pyyntö)
+                    response_data = generate(data)
                     
                     # Lisää tallennushakemisto vastaukseen
                     response_data['output_directory'] = str(output_dir)
                     
-                    # Lähetä vastaus
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    self.wfile.write(json.dumps(response_data).encode('utf-8'))
+                    # Lähetä vastaus (Content-Length: yhteys voi jäädä auki seuraavalle pyynnölle)
+                    self.send_json(response_data)
                     
                     print(f"✅ Onnistuneesti luotu MIDI-tiedostot {len(response_data.get('results', []))} kohtaukselle hakemistoon {output_dir}")
+                    if response_data.get('over_budget'):
+                        print(f"⚠️ MIDI-kaista ylittyy harvennettunakin: {', '.join(response_data['over_budget'])}")
                     
                 finally:
                     os.chdir(original_cwd)
+                    GENERATE_LOCK.release()
                     
-            except subprocess.CalledProcessError as e:
-                print(f"❌ Python-skripti epäonnistui: {e}")
-                print(f"stderr: {e.stderr}")
-                error_response = {
-                    'success': False,
-                    'error': f'Python-skripti epäonnistui: {e.stderr}'
-                }
-                self.send_response(500)
-                self.send_header('Content-type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
-                
             except Exception as e:
                 print(f"❌ Odottamaton virhe: {e}")
                 error_response = {
                     'success': False,
                     'error': str(e)
                 }
-                self.send_response(500)
-                self.send_header('Content-type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps(error_response).encode('utf-8'))
-                
+                self.send_json(error_response, 500)
+
+        elif self.path == '/presets/restore':
+            # Palauta aiempi versio (undo) - tallentuu uudeksi versioksi, historia ei katkea
+            try:
+                content_length = int(self.headers.get('Content-Length', 0))
+                data = json.loads(self.rfile.read(content_length).decode('utf-8') or '{}')
+                name = data['name']
+                if 'version' in data:
+                    restored = int(data['version'])
+                else:
+                    restored = (PRESET_HISTORY.latest_version(name) or 1) - 1
+                preset = PRESET_HISTORY.get(name, restored)
+                preset['saved_at'] = datetime.datetime.now().isoformat()
+                version = store_preset(preset)
+                print(f"⏪ Palautettu esitys {name} versioon {restored} (uusi versio {version})")
+                self.send_json({'success': True, 'restored': restored, 'version': version, 'preset': preset})
+            except KeyError as e:
+                self.send_json({'success': False, 'error': f"Ei löydy: {e.args[0]}"}, 404)
+            except ValueError as e:
+                self.send_json({'success': False, 'error': str(e)}, 400)
+            except Exception as e:
+                print(f"❌ Virhe esityksen palautuksessa: {e}")
+                self.send_json({'success': False, 'error': str(e)}, 500)
+
         elif self.path == '/save-preset':
             # Tallenna esitys
             try:
@@ -187,37 +772,12 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
                 post_data = self.rfile.read(content_length)
                 data = json.loads(post_data.decode('utf-8'))
                 
-                # Lataa olemassa olevat esitykset
-                presets = []
-                if PRESETS_FILE.exists():
-                    with open(PRESETS_FILE, 'r', encoding='utf-8') as f:
-                        presets = json.load(f)
-                
                 # Lisää aikaleima
                 data['saved_at'] = datetime.datetime.now().isoformat()
                 
-                # Etsi olemassa oleva esitys samalla nimellä
-                preset_name = data.get('name', '')
-                existing_index = -1
-                for i, preset in enumerate(presets):
-                    if preset.get('name', '') == preset_name:
-                        existing_index = i
-                        break
-                
-                if existing_index >= 0:
-                    # Korvaa olemassa oleva esitys
-                    presets[existing_index] = data
-                    print(f"🔄 Korvattu olemassa oleva esitys: {preset_name}")
-                else:
-                    # Lisää uusi esitys
-                    presets.append(data)
-                    print(f"➕ Lisätty uusi esitys: {preset_name}")
-                
-                # Tallenna takaisin
-                with open(PRESETS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(presets, f, indent=2, ensure_ascii=False)
+                version = store_preset(data)
                 
-                response = {'success': True, 'message': 'Esitys tallennettu'}
+                response = {'success': True, 'message': 'Esitys tallennettu', 'version': version}
                 self.send_response(200)
                 self.send_header('Content-type', 'application/json')
                 self.send_header('Access-Control-Allow-Origin', '*')
@@ -243,6 +803,9 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
         if self.path == '/':
             self.path = '/valot3.html'
         
+        if self.path.startswith('/live/'):
+            return self.handle_live_get()
+        
         if self.path.startswith('/download/'):
             # MIDI-tiedoston lataus
             filename = self.path[10:]  # Poista '/download/' alusta
@@ -265,18 +828,24 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
                 self.wfile.write(b'File not found')
                 print(f"❌ Tiedostoa ei löytynyt: {filename}")
                 
+        elif self.path.startswith('/presets/channels'):
+            self.handle_channel_query()
+                
+        elif self.path.startswith('/presets/history') or self.path.startswith('/presets/diff'):
+            self.handle_history_get()
+                
+        elif self.path.startswith('/levels?'):
+            self.handle_levels_get()
+                
         elif self.path == '/presets':
             # Palauta tallennetut esitykset
+            # (varastomuoto puretaan listaksi - UI näkee aina saman muodon)
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            if PRESETS_FILE.exists():
-                with open(PRESETS_FILE, 'r', encoding='utf-8') as f:
-                    self.wfile.write(f.read().encode('utf-8'))
-            else:
-                self.wfile.write(json.dumps([]).encode('utf-8'))
+            self.wfile.write(json.dumps(load_presets(PRESETS_FILE), ensure_ascii=False).encode('utf-8'))
                 
         else:
             # Staattinen tiedosto
@@ -313,6 +882,11 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
 
+class ThreadingHTTPServer(socketserver.ThreadingTCPServer):
+    """Monisäikeinen: WebSocket-yhteydet pysyvät auki muiden pyyntöjen rinnalla"""
+    daemon_threads = True
+
+
 def main():
     """Käynnistä HTTP-palvelin"""
     print(f"🚀 Käynnistetään MIDI-generaattori palvelin...")
@@ -320,10 +894,12 @@ def main():
     print(f"📁 MIDI-tiedostot tallennetaan: {MIDI_OUTPUT_DIR}")
     print(f"🌐 Palvelin käynnistyy portissa {PORT}")
     print(f"🔗 Avaa selaimessa: http://localhost:{PORT}/valot3.html")
+    print(f"⚡ Live-tila: POST /live/fire, /live/stack, WebSocket ws://localhost:{PORT}/live/ws"
+          + (f", MIDI-portti {LIVE_ENGINE.port_name}" if LIVE_ENGINE.port_name else ""))
     print(f"⏹️  Lopeta palvelin: Ctrl+C")
     print("-" * 50)
 
-    with socketserver.TCPServer(("", PORT), MIDIHandler) as httpd:
+    with ThreadingHTTPServer(("", PORT), MIDIHandler) as httpd:
         try:
             httpd.serve_forever()
         except KeyboardInterrupt:
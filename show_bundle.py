@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+📦 Show Bundle - esityksen kaikki fadet yhdessä binääritiedostossa
+
+"Show compile" laskee esityksen jokaisen kohtauksen fade-in-, fade-out- ja
+crossfade-tapahtumat valmiiksi ja pakkaa ne yhteen tiedostoon:
+
+    Header (40 t)   magic, versio, cue-määrä, indeksin ja metadatan sijainnit
+    Tapahtumat      kiinteän levyiset tietueet (8 t): aika_us, status, data1, data2
+    Indeksi         kiinteän levyiset cue-merkinnät (80 t): offset, määrä, tyyppi, kesto, nimi
+    Metadata        JSON: esitys, kohtaukset, Multiplay-cue-lista, savukoneasetukset
+
+Tiedosto avataan mmap:lla. Cue n:n indeksimerkintä on kohdassa
+index_offset + n * 80, joten mihin tahansa cueen hypätään O(1) ajassa
+ja viestit luetaan suoraan tavuista ilman MIDI-jäsennystä.
+
+Käyttö:
+    python3 show_bundle.py compile esitykset.json "Kalareissu" -o kalareissu.show
+    python3 show_bundle.py info kalareissu.show
+    python3 show_bundle.py play kalareissu.show Aamu_fade_in --port "Scene Setter"
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+
+from valot_python_backend import (
+    MIDI_WIRE_BYTES_PER_SECOND,
+    OUTPUT_PROFILES,
+    PROFILE_COMPATIBLE,
+    adaptive_envelope,
+    fit_crossfade_to_budget,
+    fit_fade_to_budget,
+)
+from midi_player import events_to_messages
+from scene_store import load_presets
+
+BUNDLE_MAGIC = b'MFGSHOW\0'
+BUNDLE_VERSION = 1
+
+HEADER = struct.Struct('<8sHHIQQQ')   # magic, versio, liput, cue-määrä, indeksi, metadata, metadatan pituus
+EVENT = struct.Struct('<IBBBx')       # aika mikrosekunteina cuen alusta, status, data1, data2
+INDEX_ENTRY = struct.Struct('<QIIf60s')  # tapahtumien offset, määrä, tyyppi, kesto (s), nimi
+
+CUE_FADE_IN = 0
+CUE_FADE_OUT = 1
+CUE_CROSSFADE = 2
+CUE_TYPES = {CUE_FADE_IN: 'fade_in', CUE_FADE_OUT: 'fade_out', CUE_CROSSFADE: 'crossfade'}
+
+
+def load_preset(presets_file, preset_name):
+    """Hakee esityksen esitykset.json-tyyppisestä tiedostosta"""
+    for preset in load_presets(presets_file):
+        if preset.get('name') == preset_name:
+            return preset
+    raise ValueError(f"Esitystä '{preset_name}' ei löytynyt tiedostosta {presets_file}")
+
+
+def preset_cues(preset, profile=PROFILE_COMPATIBLE, budget=MIDI_WIRE_BYTES_PER_SECOND, compact=True):
+    """
+    Laskee esityksen cuet samalla matematiikalla kuin valot_python_backend
+
+    Palauttaa listan (nimi, tyyppi, kesto, viestit) - viestit: [(sekunnit, (status, data1, data2))]
+    Bundlessa ei ole osoitusta (yksi MIDI-kanava), joten kanavat yli 58 hylätään kuten generate():ssa.
+    """
+    cues = []
+    scenes = preset['scenes']
+    default_steps = preset.get('steps', 20)
+
+    for scene in scenes:
+        for channel in scene['channels']:
+            if 69 + int(channel) > 127:
+                raise ValueError(f"Kanava {channel} kohtauksessa {scene['name']} ylittää nuotin 127 "
+                                 f"- bundle ei tue addressing-asetusta")
+
+    for scene in scenes:
+        channels = scene['channels']
+        notes = [69 + int(channel) for channel in channels.keys()]
+        velocities = list(channels.values())
+        steps = scene.get('steps', default_steps)
+        adaptive = adaptive_envelope(scene, preset.get('adaptive_steps', False))
+
+        for is_fade_in, cue_type, duration in ((True, CUE_FADE_IN, scene['fade_in_duration']),
+                                               (False, CUE_FADE_OUT, scene['fade_out_duration'])):
+            events = fit_fade_to_budget(notes, velocities, duration, is_fade_in,
+                                        steps, budget, compact, profile, adaptive)[0]
+            cues.append((f"{scene['name']}_{CUE_TYPES[cue_type]}", cue_type, duration,
+                         events_to_messages(events, profile)))
+
+    # Crossfadet peräkkäisille kohtauksille (kuten backend)
+    for source, target in zip(scenes, scenes[1:]):
+        events = fit_crossfade_to_budget(source['channels'], target['channels'],
+                                         target['fade_in_duration'], target.get('steps', default_steps),
+                                         budget, compact, profile,
+                                         adaptive_envelope(target, preset.get('adaptive_steps', False)))[0]
+        cues.append((f"{source['name']}_to_{target['name']}_crossfade", CUE_CROSSFADE,
+                     target['fade_in_duration'], events_to_messages(events, profile)))
+
+    return cues
+
+
+def compile_show(preset, output_path, profile=PROFILE_COMPATIBLE, budget=MIDI_WIRE_BYTES_PER_SECOND,
+                 compact=True, cue_list=None, smoke=None):
+    """
+    Kääntää esityksen bundle-tiedostoksi
+
+    cue_list: Multiplay-cue-lista (create_multiplay_cue_list) metadataan
+    smoke: ESP32-savukoneasetukset metadataan
+    Palauttaa yhteenvedon (cuet, tapahtumat, tiedoston koko)
+    """
+    cues = preset_cues(preset, profile, budget, compact)
+
+    events_blob = bytearray()
+    index_blob = bytearray()
+
+    for name, cue_type, duration, messages in cues:
+        offset = HEADER.size + len(events_blob)
+        for seconds, (status, data1, data2) in messages:
+            events_blob += EVENT.pack(int(round(seconds * 1_000_000)), status, data1, data2)
+        index_blob += INDEX_ENTRY.pack(offset, len(messages), cue_type, duration,
+                                       name.encode('utf-8')[:60])
+
+    meta = json.dumps({
+        'preset': preset.get('name', ''),
+        'output_profile': profile,
+        'cues': [name for name, _, _, _ in cues],
+        'scenes': preset['scenes'],
+        'multiplay_cue_list': cue_list,
+        'smoke': smoke
+    }, ensure_ascii=False).encode('utf-8')
+
+    index_offset = HEADER.size + len(events_blob)
+    meta_offset = index_offset + len(index_blob)
+
+    with open(output_path, 'wb') as f:
+        f.write(HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, 0, len(cues),
+                            index_offset, meta_offset, len(meta)))
+        f.write(events_blob)
+        f.write(index_blob)
+        f.write(meta)
+
+    return {
+        'path': output_path,
+        'cues': len(cues),
+        'events': len(events_blob) // EVENT.size,
+        'bytes': meta_offset + len(meta)
+    }
+
+
+class ShowBundle:
+    """Muistiin mapattu bundle: cuet O(1) indeksillä, viestit suoraan tavuista"""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, self.cue_count, self.index_offset, meta_offset, meta_length = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"{path} ei ole show bundle")
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"Tuntematon bundle-versio {version}")
+
+        self.meta = json.loads(self.data[meta_offset:meta_offset + meta_length].decode('utf-8'))
+        self.names = {name: index for index, name in enumerate(self.meta['cues'])}
+
+    def __len__(self):
+        return self.cue_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def find(self, name):
+        """Palauttaa cuen indeksin nimellä"""
+        if name not in self.names:
+            raise KeyError(f"Cueta '{name}' ei ole bundlessa")
+        return self.names[name]
+
+    def cue(self, index):
+        """Lukee cuen indeksimerkinnän"""
+        if not 0 <= index < self.cue_count:
+            raise IndexError(index)
+        offset, count, cue_type, duration, _ = INDEX_ENTRY.unpack_from(
+            self.data, self.index_offset + index * INDEX_ENTRY.size)
+        return {
+            'name': self.meta['cues'][index],
+            'type': CUE_TYPES.get(cue_type, 'unknown'),
+            'offset': offset,
+            'events': count,
+            'duration_s': round(duration, 3)
+        }
+
+    def messages(self, index):
+        """Palauttaa cuen viestit [(sekunnit, (status, data1, data2))] midi_playerille"""
+        cue = self.cue(index)
+        end = cue['offset'] + cue['events'] * EVENT.size
+        return [(time_us / 1_000_000, (status, data1, data2))
+                for time_us, status, data1, data2 in EVENT.iter_unpack(self.data[cue['offset']:end])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Esityksen kääntäminen binääribundleksi")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compile_parser = commands.add_parser('compile', help="Käännä esitys bundleksi")
+    compile_parser.add_argument('presets', help="esitykset.json")
+    compile_parser.add_argument('preset', help="Esityksen nimi")
+    compile_parser.add_argument('-o', '--output', help="Bundle-tiedosto (oletus: <esitys>.show)")
+    compile_parser.add_argument('--profile', choices=OUTPUT_PROFILES, default=PROFILE_COMPATIBLE)
+    compile_parser.add_argument('--budget', type=int, default=MIDI_WIRE_BYTES_PER_SECOND,
+                                help="MIDI-kaistabudjetti tavua/s (0 = ei rajoitusta)")
+    compile_parser.add_argument('--cue-list', help="Multiplay-cue-lista JSON metadataan")
+    compile_parser.add_argument('--smoke', help="Savukoneasetukset JSON metadataan")
+
+    info_parser = commands.add_parser('info', help="Näytä bundlen cuet")
+    info_parser.add_argument('bundle')
+
+    play_parser = commands.add_parser('play', help="Soita cue bundlesta")
+    play_parser.add_argument('bundle')
+    play_parser.add_argument('cue', help="Cuen nimi tai numero")
+    play_parser.add_argument('--port', help="MIDI-ulostulon nimi")
+    play_parser.add_argument('--capture', action='store_true', help="Ei laitteistoa")
+
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        extras = {}
+        for key, path in (('cue_list', args.cue_list), ('smoke', args.smoke)):
+            if path:
+                with open(path, 'r', encoding='utf-8') as f:
+                    extras[key] = json.load(f)
+        output = args.output or f"{args.preset}.show"
+        try:
+            summary = compile_show(load_preset(args.presets, args.preset), output,
+                                   args.profile, args.budget, **extras)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"📦 {output}: {summary['cues']} cueta, {summary['events']} tapahtumaa, {summary['bytes']} tavua")
+
+    elif args.command == 'info':
+        with ShowBundle(args.bundle) as bundle:
+            print(f"📦 {bundle.meta['preset']} ({bundle.meta['output_profile']}), {len(bundle)} cueta")
+            for index in range(len(bundle)):
+                cue = bundle.cue(index)
+                print(f"   {index:3d}  {cue['name']:<40} {cue['type']:<10} "
+                      f"{cue['events']:5d} viestiä  {cue['duration_s']:.2f} s")
+
+    elif args.command == 'play':
+        from midi_player import CaptureSink, MidiPlayer, MidoSink
+
+        with ShowBundle(args.bundle) as bundle:
+            index = int(args.cue) if args.cue.isdigit() else bundle.find(args.cue)
+            messages = bundle.messages(index)
+            sink = CaptureSink() if args.capture else MidoSink(args.port)
+            try:
+                stats = MidiPlayer(sink).play(messages)
+            finally:
+                sink.close()
+            print(f"✅ {bundle.cue(index)['name']}: {stats['count']} viestiä, jitter p95 {stats.get('p95_ms', 0)} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
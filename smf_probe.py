@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+⏱️ SMF Probe - MIDI-tiedoston kesto ilman viestien jäsentämistä
+
+Lukee Standard MIDI Filen raakatavuista vain sen mitä kestoon tarvitaan:
+headerin aikajaon, raitojen delta-ajat ja tempo-metatapahtumat (FF 51).
+Muita tapahtumia ei muuteta viestiolioiksi - niiden datatavut vain
+hypätään yli (running status huomioiden). Sadat fade-tiedostot
+mitataan cue-listaa rakennettaessa murto-osassa sekuntia.
+
+Käyttö:
+    from smf_probe import midi_duration
+    midi_duration("Aamu_fade_in.mid")      # 2.0
+
+    python3 smf_probe.py generated_midi/*.mid
+"""
+
+import argparse
+import struct
+import sys
+
+DEFAULT_TEMPO = 500000  # µs/isku (120 BPM), SMF-oletus
+
+# Kanavaviestien datatavujen määrä statuksen ylänibbelin mukaan
+CHANNEL_DATA_BYTES = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+
+def read_variable_length(data, pos):
+    """Lukee VLQ-luvun, palauttaa (arvo, uusi_pos)"""
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos
+
+
+def scan_track(data, pos, end, tempos):
+    """
+    Käy raidan läpi: palauttaa raidan viimeisen tapahtuman tikin
+
+    Tempomuutokset lisätään listaan tempos muodossa (tikki, µs/isku).
+    """
+    tick = 0
+    running_status = None
+
+    while pos < end:
+        delta, pos = read_variable_length(data, pos)
+        tick += delta
+        status = data[pos]
+
+        if status == 0xFF:  # Meta
+            meta_type = data[pos + 1]
+            length, pos = read_variable_length(data, pos + 2)
+            if meta_type == 0x51 and length == 3:
+                tempos.append((tick, (data[pos] << 16) | (data[pos + 1] << 8) | data[pos + 2]))
+            elif meta_type == 0x2F:
+                return tick
+            pos += length
+        elif status in (0xF0, 0xF7):  # SysEx
+            length, pos = read_variable_length(data, pos + 1)
+            pos += length
+        else:
+            if status & 0x80:
+                running_status = status
+                pos += 1
+            elif running_status is None:
+                raise ValueError(f"Datatavu ilman statusta kohdassa {pos}")
+            pos += CHANNEL_DATA_BYTES[running_status & 0xF0]
+
+    return tick
+
+
+def ticks_to_seconds(ticks, ticks_per_beat, tempos):
+    """Muuntaa tikit sekunneiksi tempokartan [(tikki, µs/isku)] mukaan"""
+    seconds = 0.0
+    last_tick = 0
+    tempo = DEFAULT_TEMPO
+    for change_tick, change_tempo in sorted(tempos):
+        if change_tick >= ticks:
+            break
+        seconds += (change_tick - last_tick) * tempo / 1_000_000 / ticks_per_beat
+        last_tick = change_tick
+        tempo = change_tempo
+    return seconds + (ticks - last_tick) * tempo / 1_000_000 / ticks_per_beat
+
+
+def probe_bytes(data):
+    """Mittaa SMF-tavujen kesto, palauttaa sanakirjan (format, raidat, tikit, kesto)"""
+    if data[:4] != b'MThd':
+        raise ValueError("Ei MIDI-tiedosto (MThd puuttuu)")
+
+    header_length = struct.unpack_from('>I', data, 4)[0]
+    smf_format, track_count, division = struct.unpack_from('>HHH', data, 8)
+    pos = 8 + header_length
+
+    tempos = []
+    end_ticks = []
+    while pos + 8 <= len(data) and len(end_ticks) < track_count:
+        chunk_type = data[pos:pos + 4]
+        chunk_length = struct.unpack_from('>I', data, pos + 4)[0]
+        pos += 8
+        if chunk_type == b'MTrk':
+            track_end = min(pos + chunk_length, len(data))
+            if smf_format == 2:  # Itsenäiset sekvenssit peräkkäin
+                track_tempos = []
+                end_ticks.append((scan_track(data, pos, track_end, track_tempos), track_tempos))
+            else:
+                end_ticks.append((scan_track(data, pos, track_end, tempos), None))
+        pos += chunk_length
+
+    def track_seconds(track_ticks, track_tempos):
+        if division & 0x8000:  # SMPTE: -fps ylätavussa, tikit per ruutu alatavussa
+            fps = 256 - (division >> 8)
+            return track_ticks / ((29.97 if fps == 29 else fps) * (division & 0xFF))
+        return ticks_to_seconds(track_ticks, division, track_tempos)
+
+    ticks = max((track_ticks for track_ticks, _ in end_ticks), default=0)
+    if smf_format == 2:
+        duration = sum(track_seconds(track_ticks, track_tempos) for track_ticks, track_tempos in end_ticks)
+    else:
+        duration = track_seconds(ticks, tempos)
+
+    return {
+        'format': smf_format,
+        'tracks': len(end_ticks),
+        'division': division,
+        'ticks': ticks,
+        'tempo_changes': len(tempos),
+        'duration_s': duration
+    }
+
+
+def probe_file(path):
+    """Mittaa tiedoston (ks. probe_bytes)"""
+    with open(path, 'rb') as f:
+        return probe_bytes(f.read())
+
+
+def midi_duration(path):
+    """MIDI-tiedoston kesto sekunteina"""
+    return probe_file(path)['duration_s']
+
+
+def probe_durations(paths):
+    """Kestot usealle tiedostolle: {polku: sekunnit}, lukukelvoton/puuttuva → None"""
+    durations = {}
+    for path in paths:
+        try:
+            durations[path] = midi_duration(path)
+        except (OSError, ValueError, IndexError, KeyError, struct.error):
+            durations[path] = None
+    return durations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MIDI-tiedostojen kestot (tavutason skannaus)")
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    failed = 0
+    for path, duration in probe_durations(args.files).items():
+        if duration is None:
+            failed += 1
+            print(f"❌ {path}: ei luettavissa")
+        else:
+            print(f"⏱️  {duration:8.3f} s  {path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
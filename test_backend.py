@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+🧪 Backend Test - fade-tiedostojen generoinnin käyttäytyminen
+
+Testaa valot_python_backendin ilman palvelinta tai Blenderiä:
+1. Tiivistys ja budjetti pois → tiedostot tavulleen samat kuin alkuperäisellä backendilla
+2. Tiivistys säilyttää tasot, profiilit lähettävät samat nuotit
+3. Kaistabudjetin sovitus (kiinteä ja adaptiivinen), over_budget-merkintä
+4. MIDI-osoitus ja smf_probe-kestot
+
+Käyttö:
+    python3 test_backend.py      (tai python3 -m pytest test_backend.py)
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+
+import midi_addressing
+from smf_probe import midi_duration
+from valot_python_backend import (
+    MIDI_WIRE_BYTES_PER_SECOND,
+    PROFILE_COMPATIBLE,
+    PROFILE_SCENE_SETTER,
+    adaptive_envelope,
+    build_fade_events,
+    compact_fade_events,
+    fit_fade_to_budget,
+    generate,
+    peak_bytes_per_second,
+    longest_step_seconds,
+    write_fade_file,
+)
+
+try:
+    import mido
+    MIDO_AVAILABLE = True
+except ImportError:
+    MIDO_AVAILABLE = False
+
+# Alkuperäisen backendin (nuotti per step, ei tiivistystä eikä budjettia) tiedostot näille kohtauksille
+BASELINE_SCENES = [
+    {"name": "Kolme", "channels": {"1": 127, "13": 80, "40": 5},
+     "fade_in_duration": 2.0, "fade_out_duration": 3.0, "steps": 20},
+    {"name": "Yksi", "channels": {"58": 64},
+     "fade_in_duration": 0.5, "fade_out_duration": 1.5, "steps": 7},
+]
+BASELINE_SHA256 = {
+    "Kolme_fade_in.mid": "3c0a414eb162a9e334c116d470efb50dd38ea3232836287b5899451a829277aa",
+    "Kolme_fade_out.mid": "7080a45772f86f22290746aa2a315ec0ecb8b5c2b71a2be64f6ee2b2dbed4924",
+    "Yksi_fade_in.mid": "e6c3a1ff71cc034f8347875cce2643c090a0367c351a5806e1120df10acd2e51",
+    "Yksi_fade_out.mid": "d44ee254bacaa8ffe0dc3d7200938def8b6d2ea9aeea594edf0c07304ec76025",
+}
+
+RIG_NOTES = [69 + channel for channel in range(1, 41)]   # 40 kanavaa täysille
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_baseline_byte_identity():
+    """Ilman tiivistystä ja budjettia tiedostot ovat tavulleen alkuperäiset"""
+    print("🧪 Tavuvertailu alkuperäiseen backendiin")
+    with tempfile.TemporaryDirectory() as output_dir:
+        result = generate({
+            'scenes': BASELINE_SCENES,
+            'outputDir': output_dir,
+            'compact_envelopes': False,
+            'midi_budget_bytes_per_second': 0
+        })
+        assert result['success']
+        for filename, expected in BASELINE_SHA256.items():
+            actual = file_sha256(os.path.join(output_dir, filename))
+            print(f"   {filename}: {'✅' if actual == expected else '❌'}")
+            assert actual == expected, f"{filename} poikkeaa alkuperäisestä"
+
+
+def test_compaction_keeps_levels():
+    """Tiivistys poistaa vain toistot: jokaisen nuotin tasojono ja lopputaso säilyvät"""
+    print("🧪 Tiivistys")
+    events = build_fade_events([70, 71], [5, 127], 2.0, True, 20)
+    compacted = compact_fade_events(events)
+    assert len(compacted) < len(events)
+
+    for note in (70, 71):
+        raw = [vel for _, n, vel, _ in sorted(events) if n == note]
+        kept = [vel for _, n, vel, _ in sorted(compacted) if n == note]
+        assert kept == [vel for i, vel in enumerate(raw) if i == 0 or raw[i - 1] != vel]
+        assert kept[-1] == raw[-1]
+        # Viimeinen nuotti soi fade:n loppuun asti kuten tiivistämättä
+        last_raw = max(e for e in events if e[1] == note)
+        last_kept = max(e for e in compacted if e[1] == note)
+        assert abs((last_kept[0] + last_kept[3]) - (last_raw[0] + last_raw[3])) < 1e-9
+    print(f"   ✅ {len(events)} → {len(compacted)} tapahtumaa")
+
+
+def test_output_profiles():
+    """scene_setter lähettää samat note on -viestit kuin compatible, ilman note offeja"""
+    print("🧪 Tulostusprofiilit")
+    if not MIDO_AVAILABLE:
+        print("   ⚠️  mido puuttuu - ohitetaan")
+        return
+    events = compact_fade_events(build_fade_events([70, 82, 98], [127, 60, 9], 1.5, False, 12))
+    with tempfile.TemporaryDirectory() as output_dir:
+        compatible_path = os.path.join(output_dir, 'compatible.mid')
+        scene_setter_path = os.path.join(output_dir, 'scene_setter.mid')
+        write_fade_file(compatible_path, events, PROFILE_COMPATIBLE)
+        write_fade_file(scene_setter_path, events, PROFILE_SCENE_SETTER)
+
+        def note_ons(path):
+            elapsed = 0.0
+            result = []
+            for message in mido.MidiFile(path):
+                elapsed += message.time
+                if message.type == 'note_on' and message.velocity > 0:
+                    result.append((round(elapsed, 6), message.note, message.velocity))
+            return sorted(result)
+
+        compatible = note_ons(compatible_path)
+        scene_setter = note_ons(scene_setter_path)
+        assert compatible == scene_setter
+        assert os.path.getsize(scene_setter_path) < os.path.getsize(compatible_path)
+        assert not any(message.type == 'note_off' for message in mido.MidiFile(scene_setter_path))
+    print(f"   ✅ {len(compatible)} note on -viestiä molemmissa")
+
+
+def test_budget_fitting():
+    """Budjetti porrastaa ja hakee suurimman mahtuvan step-määrän"""
+    print("🧪 Kaistabudjetti")
+    velocities = [127] * len(RIG_NOTES)
+
+    events, steps, peak, adjustments = fit_fade_to_budget(
+        RIG_NOTES, velocities, 1.0, True, 20, MIDI_WIRE_BYTES_PER_SECOND)
+    assert peak <= MIDI_WIRE_BYTES_PER_SECOND
+    assert steps == 13 and 'steps 20->13' in adjustments
+
+    adaptive = adaptive_envelope({'adaptive_steps': True})
+    events, steps, peak, adjustments = fit_fade_to_budget(
+        RIG_NOTES, velocities, 1.0, True, 20, MIDI_WIRE_BYTES_PER_SECOND, adaptive=adaptive)
+    assert peak <= MIDI_WIRE_BYTES_PER_SECOND
+    assert steps == 10, f"adaptiivinen: {steps} steppiä"
+    assert longest_step_seconds(events) < 0.25
+
+    # Ilman budjettia adaptiivinen enintään kesto / max_step_ms tasomuutosta per kanava
+    events = fit_fade_to_budget(RIG_NOTES, velocities, 1.0, True, 20, 0, adaptive=adaptive)[0]
+    assert len(events) <= 10 * len(RIG_NOTES)
+
+    # 58 kanavaa 20 ms:ssa ei mahdu edes harvennettuna
+    notes = [69 + channel for channel in range(1, 59)]
+    adjustments = fit_fade_to_budget(notes, [127] * 58, 0.02, True, 20, MIDI_WIRE_BYTES_PER_SECOND)[3]
+    assert 'thinned' in adjustments and 'over_budget' in adjustments
+    print("   ✅ kiinteä 13, adaptiivinen 10 steppiä, ylitys merkitty")
+
+
+def test_addressing_round_trip():
+    """Jokainen kanava osoitteeksi ja takaisin, legacy-raja 58"""
+    print("🧪 MIDI-osoitus")
+    legacy = midi_addressing.from_spec(None)
+    assert legacy.address(58).note == 127
+    try:
+        legacy.address(59)
+        assert False, "kanava 59 ei saa mahtua legacy-osoitukseen"
+    except ValueError:
+        pass
+
+    banked = midi_addressing.from_spec({'mode': 'banked', 'midi_channels': 2, 'ports': 2})
+    assert banked.max_channel == 232
+    for channel in range(1, banked.max_channel + 1):
+        assert banked.channel_for(*banked.address(channel)) == channel
+
+    table = midi_addressing.from_spec({'mode': 'balanced', 'table': {'1': [0, 0, 70], '80': [1, 1, 80]}})
+    assert table.bank_size == midi_addressing.BANK_SIZE
+    assert table.max_channel == 80 and table.ports == 2
+    assert table.channel_for(1, 1, 80) == 80
+    print(f"   ✅ banked {banked.max_channel} kanavaa, taulukko-osoitus")
+
+
+def test_peak_per_midi_channel():
+    """Yhden portin usea MIDI-kanava: running status katkeaa kanavan vaihtuessa, huippu ei alitu"""
+    print("🧪 Kaista MIDI-kanavittain")
+    banked = midi_addressing.from_spec({'mode': 'banked', 'midi_channels': 2, 'ports': 1})
+    # Kanavat 1 ja 59 (MIDI-kanavat 1 ja 2) vuorotellen samoilla hetkillä
+    events = [(step * 0.01, 69 + channel, 100, 0.005) for step in range(50) for channel in (1, 59)]
+    unrouted = peak_bytes_per_second(events, profile=PROFILE_SCENE_SETTER)
+    routed = peak_bytes_per_second(events, profile=PROFILE_SCENE_SETTER, addressing=banked)
+    assert routed > unrouted
+    # Joka viesti vaihtaa kanavaa → täysi 3 tavun viesti (compatible: note on + note off, 3 tavua kumpikin)
+    assert routed == peak_bytes_per_second(events, profile=PROFILE_COMPATIBLE) / 2
+    print(f"   ✅ {unrouted:.0f} → {routed:.0f} tavua/s")
+
+
+def test_smf_probe_duration():
+    """smf_probe mittaa saman keston kuin mido"""
+    print("🧪 smf_probe")
+    with tempfile.TemporaryDirectory() as output_dir:
+        generate({'scenes': BASELINE_SCENES, 'outputDir': output_dir})
+        for filename in sorted(os.listdir(output_dir)):
+            if not filename.endswith('.mid'):
+                continue
+            duration = midi_duration(os.path.join(output_dir, filename))
+            if MIDO_AVAILABLE:
+                assert abs(duration - mido.MidiFile(os.path.join(output_dir, filename)).length) < 1e-6
+            print(f"   {filename}: {duration:.3f} s")
+        # Fade-out: steps + 1 steppiä + note off (0.1 beat) → 3.0 * 21/20 + 0.05 (tikkipyöristys)
+        assert abs(midi_duration(os.path.join(output_dir, 'Kolme_fade_out.mid')) - 3.2) < 0.01
+
+
+if __name__ == "__main__":
+    tests = [test_baseline_byte_identity, test_compaction_keeps_levels, test_output_profiles,
+             test_budget_fitting, test_addressing_round_trip, test_peak_per_midi_channel,
+             test_smf_probe_duration]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+🧪 midimaker5 Test - eräajo ja interaktiivisen tilan tiedostot
+
+1. Eräajon tiedostot tavulleen samat kuin alkuperäisen midimaker5:n (1 ja 2 prosessia)
+2. Virheelliset rivit ja puuttuvat tiedostot raportoidaan polku:rivi, muut kohtaukset valmistuvat
+3. Globit, duplikaatit ja erien tavukirjanpito (edistymispalkki päättyy 100 %:iin)
+
+Käyttö:
+    python3 test_midimaker.py      (tai python3 -m pytest test_midimaker.py)
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+
+import midimaker5
+
+SCENE_LINES = "Testi;1:127, 13:64;2;3\n# kommentti\n\nYksi;58;0.5;\n"
+
+# Alkuperäisen (interaktiivisen) midimaker5:n tiedostot samoille riveille
+BASELINE_SHA256 = {
+    "Testi_fade_in.mid": "76b4121fba9a9e56c94527e5804e6dfe208295d9bce5070577afdf918b92a77c",
+    "Testi_fade_out.mid": "908b24a06d07d753693e9faf2869dd984a445b17e576bf098e8118bee84c3661",
+    "Yksi_fade_in.mid": "6207817d6eb43e2376d2e54b7b32f995001e6931d6c9f2f6c0f4c389c23c22b3",
+    "Yksi_fade_out.mid": "1cdec97e44b4a747109526fdb5bbae6bc2591de09704ac493c2bf81222492658",
+}
+
+
+def write_file(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_batch_matches_baseline():
+    """Eräajo (1 ja 2 prosessia) tuottaa alkuperäisen midimaker5:n tavut"""
+    print("🧪 Eräajo vs. alkuperäinen")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'kohtaukset.txt')
+        write_file(source, SCENE_LINES)
+        for jobs in (1, 2):
+            output_dir = os.path.join(directory, f'out{jobs}')
+            summary = midimaker5.batch_compile([source], output_dir, jobs=jobs, quiet=True)
+            assert summary['scenes'] == 2 and summary['midi_files'] == 4 and not summary['errors']
+            assert sorted(os.listdir(output_dir)) == sorted(BASELINE_SHA256)
+            for filename, expected in BASELINE_SHA256.items():
+                assert file_sha256(os.path.join(output_dir, filename)) == expected, f"{filename} ({jobs} prosessia)"
+    print("   ✅ 4 tiedostoa tavulleen samat")
+
+
+def test_errors_are_collected():
+    """Virheellinen rivi ja puuttuva tiedosto: virhe listaan, muut kohtaukset valmistuvat, exit 1"""
+    print("🧪 Virheet")
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'rikki.txt')
+        write_file(source, "Hyvä;1:100;1;1\nEiKanavia\nHuono;x:1;1;1\nToinen;2;1;1\n")
+        missing = os.path.join(directory, 'puuttuu.txt')
+        output_dir = os.path.join(directory, 'out')
+
+        summary = midimaker5.batch_compile([source, missing], output_dir, jobs=1, quiet=True)
+        assert summary['scenes'] == 2
+        assert any(error.startswith(f"{source}:2:") for error in summary['errors'])
+        assert any(error.startswith(f"{source}:3:") for error in summary['errors'])
+        assert any(error.startswith(missing) for error in summary['errors'])
+        assert len(summary['errors']) == 3
+
+        argv = sys.argv
+        sys.argv = ['midimaker5.py', source, '-o', output_dir, '-q', '-j', '1']
+        try:
+            assert midimaker5.main() == 1
+        finally:
+            sys.argv = argv
+    print("   ✅ 3 virhettä raportoitu, 2 kohtausta valmiina")
+
+
+def test_globs_and_batches():
+    """Glob laajenee kerran per tiedosto, erät katkeavat BATCH_SIZE:n kohdalla, tavut täsmäävät"""
+    print("🧪 Globit ja erät")
+    with tempfile.TemporaryDirectory() as directory:
+        os.makedirs(os.path.join(directory, 'ala'))
+        first = os.path.join(directory, 'a.txt')
+        second = os.path.join(directory, 'ala', 'b.txt')
+        write_file(first, ''.join(f"K{i};1:{i % 127 + 1};0.1;0.1\n" for i in range(100)))
+        write_file(second, "Viimeinen;2;0.1;0.1\n")
+
+        pattern = os.path.join(directory, '**', '*.txt')
+        paths = list(midimaker5.expand_patterns([pattern, first]))
+        assert sorted(paths) == sorted([first, second])
+
+        errors = []
+        work = list(midimaker5.batches(midimaker5.parse_scenes(midimaker5.read_lines(paths, errors), errors)))
+        assert [len(batch) for batch, _ in work] == [64, 37]
+        assert sum(size for _, size in work) == os.path.getsize(first) + os.path.getsize(second)
+        assert not errors
+
+        summary = midimaker5.batch_compile([pattern], os.path.join(directory, 'out'), jobs=2, quiet=True)
+        assert summary['files'] == 2 and summary['scenes'] == 101
+    print("   ✅ 2 tiedostoa, erät 64 + 37")
+
+
+if __name__ == "__main__":
+    tests = [test_batch_matches_baseline, test_errors_are_collected, test_globs_and_batches]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+🧪 Player Test - midi_player:n ajastus ilman MIDI-laitteistoa
+
+Kello ja sleep korvataan simuloidulla kellolla, joten testi on deterministinen:
+1. Deadlinet ovat absoluuttisia: sleepin myöhästely ei kerry viestistä toiseen
+2. Aktiivinen odotus (SPIN_SECONDS) korjaa alle spin-ikkunan myöhästelyn
+3. stop() toisesta "säikeestä" keskeyttää toiston
+4. Viestijärjestys: note off ennen note onia samalla hetkellä, scene_setter ilman note offeja
+
+Käyttö:
+    python3 test_player.py      (tai python3 -m pytest test_player.py)
+"""
+
+import os
+import sys
+import tempfile
+
+from midi_player import NOTE_OFF, NOTE_ON, CaptureSink, MidiPlayer, events_to_messages, jitter_stats, scene_messages
+from valot_python_backend import PROFILE_SCENE_SETTER, build_fade_events, compact_fade_events, write_fade_file
+
+try:
+    import mido
+    MIDO_AVAILABLE = True
+except ImportError:
+    MIDO_AVAILABLE = False
+
+SCENE = {"name": "Aamu", "channels": {"1": 127, "13": 80}, "fade_in_duration": 1.0,
+         "fade_out_duration": 2.0, "steps": 10}
+
+
+class SimulatedClock:
+    """Monotoninen kello jota sleep siirtää eteenpäin (oversleep = sleepin myöhästely)"""
+
+    def __init__(self, oversleep=0.0, tick=0.00005):
+        self.now = 100.0
+        self.oversleep = oversleep
+        self.tick = tick          # Jokainen kellon luku kuluttaa hetken (aktiivinen odotus etenee)
+        self.sleeps = 0
+
+    def clock(self):
+        self.now += self.tick
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps += 1
+        self.now += seconds + self.oversleep
+
+
+def play(messages, oversleep, sink=None):
+    clock = SimulatedClock(oversleep)
+    sink = sink or CaptureSink(clock.clock)
+    player = MidiPlayer(sink, clock=clock.clock, sleep=clock.sleep)
+    start = clock.now + 0.05
+    return player.play(messages, start=start), sink, start, clock
+
+
+def test_deadlines_do_not_drift():
+    """Sleep myöhästyy 5 ms joka kerta → jokainen viesti ~3 ms myöhässä, ei kasvavasti"""
+    print("🧪 Absoluuttiset deadlinet")
+    messages = [(i * 0.01, (NOTE_ON, 70, i % 128)) for i in range(200)]
+    stats, sink, start, clock = play(messages, oversleep=0.005)
+    assert stats['count'] == 200 and not stats['stopped']
+
+    lateness = [sent - (start + offset) for (sent, _), (offset, _) in zip(sink.messages, messages)]
+    assert max(lateness) < 0.0035, f"max {max(lateness) * 1000:.2f} ms"
+    assert lateness[-1] - lateness[1] < 0.0005   # Ei kerry 200 viestin aikana
+    assert stats['duration_s'] == 1.99
+    print(f"   ✅ p99 {stats['p99_ms']} ms, max {stats['max_ms']} ms")
+
+
+def test_spin_absorbs_small_oversleep():
+    """Alle spin-ikkunan myöhästely korjataan aktiivisella odotuksella"""
+    print("🧪 Aktiivinen odotus")
+    messages = [(i * 0.02, (NOTE_ON, 71, 64)) for i in range(50)]
+    stats, sink, start, clock = play(messages, oversleep=0.001)
+    assert stats['max_ms'] < 0.2, stats
+    assert clock.sleeps <= len(messages)   # Yksi sleep per viesti, loppu aktiivisesti
+    print(f"   ✅ max {stats['max_ms']} ms")
+
+
+def test_stop_interrupts():
+    """stop() kesken toiston: lähetetyt viestit jäävät, loput eivät lähde"""
+    print("🧪 Keskeytys")
+
+    class StoppingSink(CaptureSink):
+        def send(self, message):
+            super().send(message)
+            if len(self.messages) == 10:
+                player.stop()
+
+    clock = SimulatedClock()
+    sink = StoppingSink(clock.clock)
+    player = MidiPlayer(sink, clock=clock.clock, sleep=clock.sleep)
+    stats = player.play([(i * 0.01, (NOTE_ON, 70, 1)) for i in range(100)])
+    assert stats['stopped'] and stats['count'] == 10 and len(sink.messages) == 10
+
+    # Seuraava toisto alkaa puhtaalta pöydältä
+    stats = player.play([(0.0, (NOTE_ON, 70, 0))])
+    assert not stats['stopped'] and stats['count'] == 1
+    print("   ✅ 10/100 viestiä ennen pysäytystä")
+
+
+def test_message_order():
+    """Samalla hetkellä note off ennen note onia, scene_setter vain note onit"""
+    print("🧪 Viestijärjestys")
+    events = compact_fade_events(build_fade_events([70, 82], [127, 80], 1.0, True, 10))
+    messages = events_to_messages(events)
+    assert [offset for offset, _ in messages] == sorted(offset for offset, _ in messages)
+    for (offset, message), (next_offset, next_message) in zip(messages, messages[1:]):
+        if offset == next_offset and message[0] == NOTE_ON:
+            assert next_message[0] != NOTE_OFF, "note off note onin jälkeen samalla hetkellä"
+    assert sum(1 for _, m in messages if m[0] == NOTE_OFF) == len(events)
+
+    scene_setter = events_to_messages(events, PROFILE_SCENE_SETTER)
+    assert all(m[0] == NOTE_ON for _, m in scene_setter) and len(scene_setter) == len(events)
+    assert scene_messages(SCENE, True) == messages
+    assert jitter_stats([]) == {'count': 0}
+    print(f"   ✅ {len(messages)} viestiä")
+
+
+def test_file_matches_scene():
+    """Tiedostosta luetut viestit = lennossa lasketut (tikkipyöristyksen tarkkuudella)"""
+    print("🧪 Tiedosto vs. lennossa")
+    if not MIDO_AVAILABLE:
+        print("   ⚠️  mido puuttuu - ohitetaan")
+        return
+    from midi_player import file_messages
+    events = compact_fade_events(build_fade_events([70, 82], [127, 80], 1.0, True, 10))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'Aamu_fade_in.mid')
+        write_fade_file(path, events)
+        from_file = [(t, m) for t, m in file_messages(path) if m[0] & 0xF0 == NOTE_ON and m[2] > 0]
+    live = [(t, m) for t, m in scene_messages(SCENE, True) if m[0] == NOTE_ON and m[2] > 0]
+    assert sorted(m for _, m in from_file) == sorted(m for _, m in live)
+    assert all(abs(a - b) < 0.005 for (a, _), (b, _) in zip(sorted(from_file), sorted(live)))
+    print(f"   ✅ {len(live)} note on -viestiä")
+
+
+if __name__ == "__main__":
+    tests = [test_deadlines_do_not_drift, test_spin_absorbs_small_oversleep, test_stop_interrupts,
+             test_message_order, test_file_matches_scene]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
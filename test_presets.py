@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+🧪 Preset Test - esitysten tallennusmuodot, historia ja hakemisto
+
+1. Historia: jokainen tallennettu versio rakentuu takaisin sellaisenaan
+   (deltat ja snapshotit, uusi PresetHistory lukee saman tiedoston)
+2. Kohtausvarasto: pack → unpack palauttaa saman listan, save_presets säilyttää muodon
+3. Hakemisto: samannimiset esitykset ja kohtaukset pysyvät omina riveinään
+
+Käyttö:
+    python3 test_presets.py      (tai python3 -m pytest test_presets.py)
+"""
+
+import copy
+import json
+import os
+import random
+import sys
+import tempfile
+
+from preset_history import SNAPSHOT_INTERVAL, TYPE_DELTA, TYPE_SNAPSHOT, PresetHistory
+from preset_index import PresetIndex
+from scene_store import is_store, load_presets, pack, save_presets, unpack
+
+
+def sample_preset(name="Kalareissu"):
+    return {
+        "name": name,
+        "steps": 20,
+        "saved_at": "2025-01-01T10:00:00",
+        "scenes": [
+            {"name": "Aamu", "channels": {"21": 60, "22": 60}, "fade_in_duration": 3.0, "fade_out_duration": 2.0},
+            {"name": "Ilta", "channels": {"33": 127, "34": 40, "35": 0, "36": 90},
+             "fade_in_duration": 1.0, "fade_out_duration": 4.0},
+        ]
+    }
+
+
+def mutate(preset, rng, version):
+    """Satunnainen muokkaus: tasot, kentät, kohtausten lisäys/poisto/järjestys (aina jokin muutos)"""
+    changed = random_edit(preset, rng, version)
+    while {**changed, 'saved_at': None} == {**preset, 'saved_at': None}:
+        changed = random_edit(changed, rng, version)
+    return changed
+
+
+def random_edit(preset, rng, version):
+    preset = copy.deepcopy(preset)
+    preset['saved_at'] = f"2025-01-01T10:{version:02d}:00"
+    action = rng.choice(['level', 'level', 'field', 'add', 'remove', 'reorder'])
+    scenes = preset['scenes']
+    if action == 'level' and scenes:
+        scene = rng.choice(scenes)
+        channel = str(rng.randint(1, 58))
+        if channel in scene['channels'] and rng.random() < 0.3:
+            del scene['channels'][channel]
+        else:
+            scene['channels'][channel] = rng.randint(1, 127)
+    elif action == 'field':
+        preset['steps'] = rng.randint(5, 40)
+    elif action == 'add':
+        scenes.append({"name": f"Kohtaus {version}", "channels": {str(rng.randint(1, 58)): 100},
+                       "fade_in_duration": 2.0, "fade_out_duration": 2.0})
+    elif action == 'remove' and len(scenes) > 1:
+        scenes.pop(rng.randrange(len(scenes)))
+    else:
+        rng.shuffle(scenes)
+    return preset
+
+
+def test_history_round_trip():
+    """Jokainen versio takaisin sellaisenaan, myös saved_at ja snapshot-rajan yli"""
+    print("🧪 Versiohistoria")
+    rng = random.Random(49)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'esitykset.history.jsonl')
+        history = PresetHistory(path)
+
+        saved = {}
+        preset = sample_preset()
+        for version in range(1, SNAPSHOT_INTERVAL * 2 + 5):
+            assert history.record(preset) == version
+            saved[version] = preset
+            preset = mutate(preset, rng, version + 1)
+
+        # Muuttamaton tallennus (vain aikaleima) ei luo versiota
+        unchanged = dict(saved[max(saved)], saved_at="2025-02-01T00:00:00")
+        assert history.record(unchanged) == max(saved)
+
+        reopened = PresetHistory(path)
+        for version, expected in saved.items():
+            assert reopened.get(expected['name'], version) == expected, f"versio {version} poikkeaa"
+
+        types = [item['type'] for item in reopened.versions('Kalareissu')]
+        assert types[0] == TYPE_SNAPSHOT and TYPE_DELTA in types
+        assert types.count(TYPE_SNAPSHOT) >= 2
+
+        diff = reopened.diff('Kalareissu', 1, 2)
+        assert diff, "peräkkäisten versioiden ero puuttuu"
+    print(f"   ✅ {len(saved)} versiota, {types.count(TYPE_SNAPSHOT)} snapshotia")
+
+
+def test_scene_store_round_trip():
+    """pack → unpack palauttaa saman listan, jaetut kanavakartat tallennetaan kerran"""
+    print("🧪 Kohtausvarasto")
+    first = sample_preset("Kalareissu")
+    second = sample_preset("Tanssilava")
+    second['scenes'][0]['fade_in_duration'] = 5.0   # Sama kartta, eri käyttöasetukset
+    presets = [first, second]
+
+    store = pack(presets)
+    assert len(store['scenes']) == 2
+    assert unpack(store) == presets
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'esitykset.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(store, f)
+        assert load_presets(path) == presets
+
+        # Tallennus säilyttää varastomuodon
+        save_presets(path, presets + [sample_preset("Kolmas")])
+        with open(path, 'r', encoding='utf-8') as f:
+            assert is_store(json.load(f))
+        assert [preset['name'] for preset in load_presets(path)] == ["Kalareissu", "Tanssilava", "Kolmas"]
+    print("   ✅ pack/unpack ja tallennusmuoto")
+
+
+def test_index_duplicates():
+    """Samannimiset esitykset ja kohtaukset eivät ylikirjoita toisiaan"""
+    print("🧪 Kanavahakemisto")
+    older = sample_preset()
+    newer = sample_preset()
+    newer['scenes'].append(dict(newer['scenes'][0], channels={"21": 10}))   # Toinen "Aamu"
+    index = PresetIndex.from_presets([older, newer])
+
+    hits = index.query(21)
+    assert sorted(hit['levels']['21'] for hit in hits) == [10, 60, 60]
+
+    # Korvaus päivittää ensimmäisen samannimisen (kuten tallennus), toinen säilyy
+    replacement = sample_preset()
+    replacement['scenes'] = [{"name": "Yö", "channels": {"5": 30}}]
+    index.update_preset(replacement)
+    assert sorted(hit['levels']['21'] for hit in index.query(21)) == [10, 60]
+    assert index.query(5) == [{'preset': 'Kalareissu', 'scene': 'Yö', 'levels': {'5': 30}}]
+
+    index.remove_preset('Kalareissu')
+    index.remove_preset('Kalareissu')
+    assert index.summary() == {}
+    print("   ✅ duplikaatit omina riveinään, ei jääneitä rivejä")
+
+
+if __name__ == "__main__":
+    tests = [test_history_round_trip, test_scene_store_round_trip, test_index_duplicates]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+🧪 Server Index Test - /presets/channels -kysely palvelimen läpi
+
+Palvelin käynnistetään samassa prosessissa vapaaseen porttiin, esitykset
+väliaikaiseen esitykset.json:iin (oikeaan tiedostoon ei kosketa):
+1. Kanavakysely (any/all, esitysrajaus), käyttömäärät ilman channels-parametria, virheet → 400
+2. /save-preset päivittää hakemiston heti, samannimiset kohtaukset omina riveinään
+3. Tiedoston ulkoinen muutos luetaan seuraavalla kyselyllä
+
+Käyttö:
+    python3 test_server_index.py      (tai python3 -m pytest test_server_index.py)
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+GENERATED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generated_midi')
+GENERATED_EXISTED = os.path.isdir(GENERATED_DIR)
+
+import server
+from preset_history import PresetHistory
+from preset_index import PresetIndex
+
+PRESETS = [
+    {"name": "Kalareissu", "steps": 20, "scenes": [
+        {"name": "Aamu", "channels": {"33": 127, "34": 60, "35": 0, "36": 90}},
+        {"name": "Ilta", "channels": {"33": 40, "21": 100}},
+    ]},
+    {"name": "Tanssilava", "steps": 20, "scenes": [
+        {"name": "Aamu", "channels": {"34": 10, "21": 5}},
+    ]},
+]
+
+
+class TestServer:
+    """server.MIDIHandler väliaikaisilla esityksillä ja omalla hakemistolla"""
+
+    def __enter__(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.presets_file = Path(self.directory.name) / 'esitykset.json'
+        write_presets(self.presets_file, PRESETS)
+
+        self.saved = (server.PRESETS_FILE, server.PRESET_INDEX, server.PRESET_HISTORY)
+        server.PRESETS_FILE = self.presets_file
+        server.PRESET_INDEX = PresetIndex()
+        server.PRESET_HISTORY = PresetHistory(str(self.presets_file.with_suffix('.history.jsonl')))
+
+        self.httpd = server.ThreadingHTTPServer(("127.0.0.1", 0), server.MIDIHandler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        server.PRESETS_FILE, server.PRESET_INDEX, server.PRESET_HISTORY = self.saved
+        self.directory.cleanup()
+        if not GENERATED_EXISTED and os.path.isdir(GENERATED_DIR) and not os.listdir(GENERATED_DIR):
+            os.rmdir(GENERATED_DIR)   # server.py luo kansion tuotaessa
+
+    def get(self, path):
+        try:
+            with urllib.request.urlopen(self.url + path, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    def post(self, path, data):
+        request = urllib.request.Request(self.url + path, data=json.dumps(data).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, json.loads(response.read())
+
+
+def write_presets(path, presets):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(presets, f, ensure_ascii=False)
+
+
+def test_channel_query():
+    """any/all, esitysrajaus ja käyttömäärät samat kuin PresetIndexillä suoraan"""
+    print("🧪 /presets/channels")
+    with TestServer() as test_server:
+        status, body = test_server.get('/presets/channels?channels=33-36&match=all')
+        assert status == 200 and body['success']
+        assert body['results'] == [{'preset': 'Kalareissu', 'scene': 'Aamu',
+                                    'levels': {'33': 127, '34': 60, '35': 0, '36': 90}}]
+
+        status, body = test_server.get('/presets/channels?channels=21')
+        assert [(hit['preset'], hit['scene']) for hit in body['results']] == [
+            ('Kalareissu', 'Ilta'), ('Tanssilava', 'Aamu')]
+        assert body['presets'] == ['Kalareissu', 'Tanssilava']
+
+        status, body = test_server.get('/presets/channels?channels=21&preset=Tanssilava')
+        assert body['results'] == [{'preset': 'Tanssilava', 'scene': 'Aamu', 'levels': {'21': 5}}]
+
+        status, body = test_server.get('/presets/channels')
+        assert body['channels'] == PresetIndex.from_presets(PRESETS).summary()
+
+        status, body = test_server.get('/presets/channels?channels=33&match=jotain')
+        assert status == 400 and not body['success']
+    print("   ✅ any/all, rajaus, käyttömäärät, 400")
+
+
+def test_save_updates_index():
+    """Tallennus näkyy heti kyselyssä, korvattu kohtaus poistuu, duplikaattinimet säilyvät"""
+    print("🧪 Tallennus → hakemisto")
+    with TestServer() as test_server:
+        assert test_server.get('/presets/channels?channels=34')[1]['presets'] == ['Kalareissu', 'Tanssilava']
+
+        replacement = {"name": "Tanssilava", "steps": 20, "scenes": [
+            {"name": "Aamu", "channels": {"50": 100}},
+            {"name": "Aamu", "channels": {"50": 20, "51": 7}},
+        ]}
+        status, body = test_server.post('/save-preset', replacement)
+        assert status == 200 and body['success']
+
+        body = test_server.get('/presets/channels?channels=34')[1]
+        assert body['presets'] == ['Kalareissu']
+        body = test_server.get('/presets/channels?channels=50')[1]
+        assert sorted(hit['levels']['50'] for hit in body['results']) == [20, 100]
+
+        # Ulkoinen muokkaus (esim. Electron-sovellus): uusi mtime → hakemisto luetaan uudelleen
+        write_presets(test_server.presets_file, PRESETS[:1])
+        stat = os.stat(test_server.presets_file)
+        os.utime(test_server.presets_file, (stat.st_atime, stat.st_mtime + 10))
+        body = test_server.get('/presets/channels?channels=50')[1]
+        assert body['results'] == [] and body['presets'] == []
+    print("   ✅ tallennus ja ulkoinen muutos näkyvät kyselyssä")
+
+
+if __name__ == "__main__":
+    tests = [test_channel_query, test_save_updates_index]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
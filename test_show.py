@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+🧪 Show Test - bundle, cue stack ja tasoruudut
+
+1. Show bundle: compile → ShowBundle palauttaa samat viestit ja kestot kuin preset_cues
+2. Cue stack: HTP (suurin voittaa) ja LTP (viimeisin ottaa kanavan) päällekkäisillä cueilla
+3. Tasoruudut: fade:n viimeinen ruutu = kohtauksen tasot, fade-out päättyy nollaan
+
+Käyttö:
+    python3 test_show.py      (tai python3 -m pytest test_show.py)
+"""
+
+import os
+import sys
+import tempfile
+
+from cue_stack import MODE_HTP, MODE_LTP, CueStack
+from show_bundle import ShowBundle, compile_show, preset_cues
+from valot_python_backend import PROFILE_SCENE_SETTER
+
+try:
+    from level_frames import MAX_FRAMES, NUMPY_AVAILABLE, scene_levels, show_levels
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+PRESET = {
+    "name": "Testiesitys",
+    "steps": 12,
+    "scenes": [
+        {"name": "Aamu", "channels": {"1": 127, "13": 80, "40": 5},
+         "fade_in_duration": 2.0, "fade_out_duration": 1.5},
+        {"name": "Ilta", "channels": {"13": 20, "58": 100},
+         "fade_in_duration": 1.0, "fade_out_duration": 3.0},
+    ]
+}
+
+
+def test_bundle_round_trip():
+    """Bundlesta luetut viestit = preset_cues (mikrosekuntitarkkuudella), kesto = fade-kesto"""
+    print("🧪 Show bundle")
+    for profile in ('compatible', PROFILE_SCENE_SETTER):
+        expected = preset_cues(PRESET, profile)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'testi.show')
+            summary = compile_show(PRESET, path, profile, cue_list={"cues": []})
+            assert summary['cues'] == len(expected) == 5
+
+            with ShowBundle(path) as bundle:
+                assert bundle.meta['preset'] == PRESET['name']
+                assert bundle.meta['scenes'] == PRESET['scenes']
+                for name, cue_type, duration, messages in expected:
+                    index = bundle.find(name)
+                    cue = bundle.cue(index)
+                    assert cue['events'] == len(messages)
+                    assert abs(cue['duration_s'] - duration) < 1e-3
+                    actual = bundle.messages(index)
+                    assert [m for _, m in actual] == [m for _, m in messages]
+                    assert all(abs(a - e) <= 1e-6 for (a, _), (e, _) in zip(actual, messages))
+        print(f"   ✅ {profile}: {summary['cues']} cueta, {summary['events']} viestiä")
+
+    # Nuotti yli 127 ei ole kelvollinen datatavu
+    too_wide = dict(PRESET, scenes=[dict(PRESET['scenes'][0], channels={"70": 100})])
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            compile_show(too_wide, os.path.join(directory, 'liian.show'))
+            assert False, "kanava 70 ei saa kääntyä bundleen"
+        except ValueError:
+            pass
+
+
+def run_until_settled(stack, start, end, tick=0.02):
+    now = start
+    while now <= end:
+        stack.tick(now)
+        now += tick
+    return now
+
+
+def test_cue_stack_htp():
+    """HTP: kanavan taso on cuejen suurin osuus, vapautus palaa jäljelle jääneeseen"""
+    print("🧪 Cue stack HTP")
+    stack = CueStack(MODE_HTP)
+    stack.fire({"name": "A", "channels": {"1": 100, "2": 50}, "fade_in_duration": 1.0,
+                "fade_out_duration": 1.0}, 0.0)
+    stack.fire({"name": "B", "channels": {"1": 40, "3": 90}, "fade_in_duration": 0.5,
+                "fade_out_duration": 0.5}, 0.2)
+    now = run_until_settled(stack, 0.0, 1.5)
+    assert stack.levels == {1: 100, 2: 50, 3: 90}
+
+    stack.release("A", now)
+    run_until_settled(stack, now, now + 1.5)
+    assert stack.levels.get(1) == 40 and stack.levels.get(2, 0) == 0 and stack.levels.get(3) == 90
+    assert set(stack.cues) == {"B"} and not stack.active
+    print("   ✅ suurin voittaa, vapautus B:n tasoon")
+
+
+def test_cue_stack_ltp():
+    """LTP: viimeisin cue faidaa kanavan nykytasosta, vapautus laskee nollaan"""
+    print("🧪 Cue stack LTP")
+    stack = CueStack(MODE_LTP)
+    stack.fire({"name": "A", "channels": {"1": 100, "2": 50}, "fade_in_duration": 1.0}, 0.0)
+    now = run_until_settled(stack, 0.0, 1.2)
+    stack.fire({"name": "B", "channels": {"1": 20}, "fade_in_duration": 1.0}, now)
+    assert stack.current_level(1, now) == 100   # Alkaa nykytasosta, ei nollasta
+    now = run_until_settled(stack, now, now + 1.2)
+    assert stack.levels == {1: 20, 2: 50}
+
+    stack.release("B", now, fade=0.5)
+    run_until_settled(stack, now, now + 1.0)
+    assert stack.levels[1] == 0 and stack.levels[2] == 50
+    assert "B" not in stack.cues and "A" in stack.cues
+    print("   ✅ viimeisin ottaa kanavan, koskematon pysyy")
+
+
+def test_level_frames():
+    """Ruudut päättyvät fade:n lopputilaan, koko esitys alkaa ja päättyy pimeään"""
+    print("🧪 Tasoruudut")
+    if not NUMPY_AVAILABLE:
+        print("   ⚠️  numpy puuttuu - ohitetaan")
+        return
+    scene = PRESET['scenes'][0]
+    channels, frames = scene_levels(scene, 'in', fps=60)
+    assert channels == [1, 13, 40]
+    assert frames.shape == (int(scene['fade_in_duration'] * 60) + 1, 3)
+    assert frames[0].tolist() != frames[-1].tolist()
+    assert frames[-1].tolist() == [127, 80, 5]
+    assert (frames[1:] >= frames[:-1]).all()   # Fade-in ei laske
+
+    channels, frames = scene_levels(scene, 'out', fps=60)
+    assert frames[0].tolist() == [127, 80, 5] and frames[-1].tolist() == [0, 0, 0]
+
+    channels, frames = show_levels(PRESET, fps=30, hold=0.5)
+    assert channels == [1, 13, 40, 58]
+    assert frames[0].max() <= 127 and frames[-1].tolist() == [0, 0, 0, 0]
+    ilta = [PRESET['scenes'][1]['channels'].get(str(channel), 0) for channel in channels]
+    assert ilta in frames.tolist()   # Crossfaden jälkeinen pito = Illan tasot
+    print(f"   ✅ {len(frames)} ruutua, {len(channels)} kanavaa")
+
+    # Liian pitkä tai virheellinen pito hylätään ennen ruutujen varaamista
+    for hold in (1e9, MAX_FRAMES / 60 / 2, -1.0, float('nan'), float('inf')):
+        try:
+            show_levels(PRESET, fps=60, hold=hold)
+            assert False, f"pito {hold} ei saa mennä läpi"
+        except ValueError:
+            pass
+    print("   ✅ valtava pito hylätty")
+
+
+if __name__ == "__main__":
+    tests = [test_bundle_round_trip, test_cue_stack_htp, test_cue_stack_ltp, test_level_frames]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    print(f"\n{'✅ Kaikki testit OK' if not failed else f'❌ {failed} testiä epäonnistui'}")
+    sys.exit(1 if failed else 0)
@@ -4,28 +4,65 @@
 import sys
 import json
 import os
+import struct
+import shutil
+import hashlib
+import math
 from midiutil import MIDIFile
 
-def create_fade_midi(filename, notes, velocities, duration, is_fade_in, steps=20):
-    """
-    Luo fade-in tai fade-out MIDI-tiedoston
+from midi_addressing import from_spec as addressing_from_spec, port_filename
+
+# MIDI-väylän kaista: DIN MIDI 31250 baudia, 10 bittiä/tavu → 3125 tavua/s
+MIDI_WIRE_BYTES_PER_SECOND = 3125
+BANDWIDTH_WINDOW_SECONDS = 0.05  # Huippukaistan mittausikkuna
+NOTE_MESSAGE_BYTES = 3           # Note on / note off = status + nuotti + velocity
+MIN_BUDGET_STEPS = 2             # Budjetti ei vähennä steppejä tätä pienemmäksi
+SECONDS_PER_BEAT = 0.5           # 120 BPM
+
+# Tulostusprofiilit:
+# - compatible: note on + note off jokaiselle stepille (midiutil), toimii kaikissa soittimissa
+# - scene_setter: pelkät note on -viestit running statuksella; uusi note on samalle
+#   nuotille asettaa Scene Setterissä suoraan uuden tason, velocity 0 sammuttaa
+PROFILE_COMPATIBLE = 'compatible'
+PROFILE_SCENE_SETTER = 'scene_setter'
+OUTPUT_PROFILES = (PROFILE_COMPATIBLE, PROFILE_SCENE_SETTER)
+RUNNING_STATUS_BYTES = 2         # Running statuksella note on = nuotti + velocity
+TICKS_PER_BEAT = 960
+
+# Adaptiivinen steppaus (adaptive_steps): kiinteän step-määrän sijaan tasomuutokset
+# valitaan havaitun kirkkauden (CIE L*) mukaan - kirkkaassa päässä pienet
+# velocity-muutokset jätetään pois, himmeässä päässä jokainen taso lähetetään
+ADAPTIVE_MAX_STEP_SECONDS = 0.1  # Tavoiteltu step-väli: tasomuutoksia enintään kesto / väli per kanava
+ADAPTIVE_PERCEPTUAL_STEP = 1.0   # Ohitettava kirkkausero (ΔL*), ~1 = juuri havaittava
+ADAPTIVE_MAX_STEPS = 127         # Tasomuutoksia enintään (budjetti voi pienentää)
+
+# Fade-välimuisti (fade_cache_dir): sama kanavakartta samoilla asetuksilla tuottaa
+# saman tiedoston, joten eri esitysten jaetut kohtaukset lasketaan vain kerran.
+# Versio mukaan avaimeen - nosta kun fade-matematiikka muuttuu.
+FADE_CACHE_VERSION = 3
+
+def build_fade_events(notes, velocities, duration, is_fade_in, steps=20, stagger=0.0):
     """
-    mf = MIDIFile(1)
-    track = 0
-    channel = 0
-    time = 0
-    mf.addTempo(track, time, 120)  # 120 BPM
+    Laskee fade-in tai fade-out tapahtumat ilman tiedostoa
 
+    Palauttaa listan (time_beats, note, velocity, duration_beats).
+    stagger: 0.0-1.0, kuinka suuren osan step-välistä kanavat porrastetaan
+    (kanava i alkaa i/n * stagger * step-välin verran myöhemmin)
+    """
     total_beats = duration * 2  # 120 BPM = 2 beats/second
     duration_per_step_beats = total_beats / steps
+    offsets = [stagger * duration_per_step_beats * i / max(1, len(notes)) for i in range(len(notes))]
+    
+    events = []
+    time = 0
     
     if is_fade_in:
         # Fade-in: 1 -> target velocity
         for step in range(1, steps + 1):
             factor = step / steps
-            for note, target_vel in zip(notes, velocities):
+            for offset, note, target_vel in zip(offsets, notes, velocities):
                 vel = max(1, int(target_vel * factor))  # Vähintään 1, ei 0
-                mf.addNote(track, channel, note, time, duration_per_step_beats, vel)
+                events.append((time + offset, note, vel, duration_per_step_beats))
             time += duration_per_step_beats
         
         # Jätä nuotit soimaan loputtomiin - ei note off komentoa!
@@ -34,14 +71,254 @@ def create_fade_midi(filename, notes, velocities, duration, is_fade_in, steps=20
         # Fade-out: target -> 0
         for step in range(steps + 1):
             factor = 1 - (step / steps)
-            for note, target_vel in zip(notes, velocities):
+            for offset, note, target_vel in zip(offsets, notes, velocities):
                 vel = int(target_vel * factor)
-                mf.addNote(track, channel, note, time, duration_per_step_beats, vel)
+                events.append((time + offset, note, vel, duration_per_step_beats))
             time += duration_per_step_beats
         
         # Varmista note off
-        for note in notes:
-            mf.addNote(track, channel, note, time, 0.1, 0)
+        for offset, note in zip(offsets, notes):
+            events.append((time + offset, note, 0, 0.1))
+    
+    return events
+
+def build_crossfade_events(notes, from_velocities, to_velocities, duration, steps=20, stagger=0.0):
+    """
+    Laskee suoran crossfaden kohtauksesta toiseen ilman tiedostoa
+
+    Vain kanavat joiden taso muuttuu interpoloidaan - yhteiset kanavat
+    samalla tasolla eivät käy nollassa. Lähtötaso on jo päällä, joten
+    ensimmäinen steppi on 1/steps matkasta ja viimeinen on tavoitetaso
+    (0 = sammutus).
+    Palauttaa listan (time_beats, note, velocity, duration_beats).
+    """
+    changed = [(note, start, target)
+               for note, start, target in zip(notes, from_velocities, to_velocities)
+               if start != target]
+    
+    total_beats = duration * 2  # 120 BPM = 2 beats/second
+    duration_per_step_beats = total_beats / steps
+    offsets = [stagger * duration_per_step_beats * i / max(1, len(changed)) for i in range(len(changed))]
+    
+    events = []
+    time = 0
+    
+    for step in range(1, steps + 1):
+        factor = step / steps
+        for offset, (note, start, target) in zip(offsets, changed):
+            vel = int(start + (target - start) * factor)
+            if target > 0:
+                vel = max(1, vel)  # Päälle jäävä kanava ei käy nollassa
+            events.append((time + offset, note, vel, duration_per_step_beats))
+        time += duration_per_step_beats
+    
+    return events
+
+def perceived_lightness(velocity):
+    """
+    Velocity (0-127) → havaittu kirkkaus CIE L* (0-100)
+
+    Olettaa että velocity ohjaa valotehoa lineaarisesti.
+    """
+    luminance = velocity / 127
+    if luminance <= 0.008856:
+        return 903.3 * luminance
+    return 116 * luminance ** (1 / 3) - 16
+
+def adaptive_level_times(start, target, duration, max_step_seconds=ADAPTIVE_MAX_STEP_SECONDS,
+                         perceptual_step=ADAPTIVE_PERCEPTUAL_STEP, max_steps=ADAPTIVE_MAX_STEPS):
+    """
+    Valitsee tasomuutokset lineaariselta rampilta start → target
+
+    Ehdokkaat ovat hetket jolloin ramppi saavuttaa seuraavan kokonaislukutason.
+    Ehdokas ohitetaan jos seuraavakin taso on vielä perceptual_step sisällä
+    viimeksi lähetetystä eikä tauko kasva yli max_step_seconds.
+    max_steps (kaistabudjetti) kasvattaa kirkkausaskelta, ohittaa taukorajan
+    ja pitää tasomuutokset vähintään duration / max_steps välein.
+    Palauttaa listan (sekunnit, velocity), viimeisenä tavoitetaso.
+    """
+    if start == target:
+        return []
+    
+    direction = 1 if target > start else -1
+    candidates = [(duration * (level - start) / (target - start), level)
+                  for level in range(start + direction, target + direction, direction)]
+    
+    max_steps = max(1, max_steps)
+    lightness_range = abs(perceived_lightness(target) - perceived_lightness(start))
+    threshold = max(perceptual_step, lightness_range / max_steps)
+    capped = threshold > perceptual_step
+    min_gap = duration / max_steps * (1 - 1e-9)
+    
+    chosen = []
+    last_time = 0.0
+    last_lightness = perceived_lightness(start)
+    for (time, level), (next_time, next_level) in zip(candidates, candidates[1:]):
+        if chosen and time - last_time < min_gap:
+            continue
+        visible = abs(perceived_lightness(next_level) - last_lightness) > threshold
+        too_long = not capped and next_time - last_time > max_step_seconds
+        if visible or too_long:
+            chosen.append((time, level))
+            last_time = time
+            last_lightness = perceived_lightness(level)
+    chosen.append(candidates[-1])
+    return chosen
+
+def adaptive_step_limit(duration, max_step_seconds=ADAPTIVE_MAX_STEP_SECONDS):
+    """Tasomuutosten enimmäismäärä kanavaa kohden: yksi per max_step_seconds (1 s / 100 ms = 10)"""
+    return max(1, min(ADAPTIVE_MAX_STEPS, math.ceil(duration / max_step_seconds - 1e-9)))
+
+def level_times_to_events(points, note, offset_beats, final_duration_beats):
+    """(sekunnit, velocity) -lista → tapahtumat; nuotti soi seuraavaan tasomuutokseen asti"""
+    events = []
+    for index, (time, vel) in enumerate(points):
+        if index + 1 < len(points):
+            duration_beats = (points[index + 1][0] - time) / SECONDS_PER_BEAT
+        else:
+            duration_beats = final_duration_beats
+        events.append((offset_beats + time / SECONDS_PER_BEAT, note, vel, duration_beats))
+    return events
+
+def build_adaptive_fade_events(notes, velocities, duration, is_fade_in, steps=ADAPTIVE_MAX_STEPS,
+                               stagger=0.0, max_step_seconds=ADAPTIVE_MAX_STEP_SECONDS,
+                               perceptual_step=ADAPTIVE_PERCEPTUAL_STEP):
+    """
+    Fade-in/fade-out havaitun kirkkauden mukaan valituilla stepeillä
+
+    Sama tapahtumamuoto kuin build_fade_events. steps = tasomuutosten
+    enimmäismäärä kanavaa kohden (kaistabudjetti), kuitenkin enintään
+    adaptive_step_limit - kirkkauskäyrä päättää mihin stepit sijoittuvat.
+    stagger porrastaa kanavat yhden step-välin sisään (max_step_seconds tai duration / steps).
+    """
+    steps = min(steps, adaptive_step_limit(duration, max_step_seconds))
+    stagger_beats = stagger * max(max_step_seconds, duration / max(1, steps)) / SECONDS_PER_BEAT
+    events = []
+    
+    for index, (note, target_vel) in enumerate(zip(notes, velocities)):
+        offset = stagger_beats * index / max(1, len(notes))
+        if is_fade_in:
+            points = adaptive_level_times(0, target_vel, duration, max_step_seconds, perceptual_step, steps)
+            final_beats = (points[-1][0] - points[-2][0]) / SECONDS_PER_BEAT if len(points) > 1 else \
+                max_step_seconds / SECONDS_PER_BEAT
+        else:
+            # Nykyinen taso heti alkuun, viimeisenä velocity 0 = note off
+            points = [(0.0, target_vel)] + adaptive_level_times(
+                target_vel, 0, duration, max_step_seconds, perceptual_step, steps)
+            final_beats = 0.1
+        events.extend(level_times_to_events(points, note, offset, final_beats))
+    
+    events.sort(key=lambda event: event[0])
+    return events
+
+def build_adaptive_crossfade_events(notes, from_velocities, to_velocities, duration,
+                                    steps=ADAPTIVE_MAX_STEPS, stagger=0.0,
+                                    max_step_seconds=ADAPTIVE_MAX_STEP_SECONDS,
+                                    perceptual_step=ADAPTIVE_PERCEPTUAL_STEP):
+    """
+    Crossfade havaitun kirkkauden mukaan valituilla stepeillä (ks. build_crossfade_events)
+
+    steps rajataan kuten build_adaptive_fade_events (adaptive_step_limit).
+    """
+    steps = min(steps, adaptive_step_limit(duration, max_step_seconds))
+    changed = [(note, start, target)
+               for note, start, target in zip(notes, from_velocities, to_velocities)
+               if start != target]
+    
+    stagger_beats = stagger * max(max_step_seconds, duration / max(1, steps)) / SECONDS_PER_BEAT
+    events = []
+    
+    for index, (note, start, target) in enumerate(changed):
+        offset = stagger_beats * index / max(1, len(changed))
+        points = adaptive_level_times(start, target, duration, max_step_seconds, perceptual_step, steps)
+        final_beats = (points[-1][0] - points[-2][0]) / SECONDS_PER_BEAT if len(points) > 1 else \
+            max_step_seconds / SECONDS_PER_BEAT
+        events.extend(level_times_to_events(points, note, offset, final_beats))
+    
+    events.sort(key=lambda event: event[0])
+    return events
+
+def longest_step_seconds(events):
+    """Pisin väli saman kanavan peräkkäisten tasomuutosten välillä (sekunteina)"""
+    times_by_note = {}
+    for time, note, _, _ in events:
+        times_by_note.setdefault(note, []).append(time)
+    
+    longest = 0.0
+    for times in times_by_note.values():
+        times.sort()
+        for previous, current in zip(times, times[1:]):
+            longest = max(longest, current - previous)
+    return longest * SECONDS_PER_BEAT
+
+def adaptive_envelope(settings, default=False):
+    """
+    Adaptiivisen steppauksen asetukset kohtaukselta/datalta, None = kiinteät stepit
+
+    adaptive_steps: true/false, max_step_ms (oletus 100), perceptual_step (ΔL*, oletus 1.0)
+    """
+    if not settings.get('adaptive_steps', default):
+        return None
+    return {
+        'max_step_seconds': settings.get('max_step_ms', ADAPTIVE_MAX_STEP_SECONDS * 1000) / 1000,
+        'perceptual_step': settings.get('perceptual_step', ADAPTIVE_PERCEPTUAL_STEP)
+    }
+
+def crossfade_channels(from_channels, to_channels):
+    """
+    Yhdistää kahden kohtauksen kanavakartat crossfadea varten
+
+    Palauttaa (notes, from_velocities, to_velocities) kaikille kanaville
+    jotka ovat päällä jommassakummassa kohtauksessa
+    """
+    channels = list(dict.fromkeys(list(from_channels.keys()) + list(to_channels.keys())))
+    notes = [69 + int(channel) for channel in channels]
+    from_velocities = [from_channels.get(channel, 0) for channel in channels]
+    to_velocities = [to_channels.get(channel, 0) for channel in channels]
+    return notes, from_velocities, to_velocities
+
+def compact_fade_events(events):
+    """
+    Tiivistää fade-tapahtumat: uusi nuotti vain kun kanavan velocity muuttuu
+
+    int()-pyöristyksen takia matalan tason kanavat toistavat samaa velocityä
+    useita steppejä peräkkäin. Toistot poistetaan ja edellinen nuotti
+    venytetään soimaan koko välin yli.
+    """
+    by_note = {}
+    for event in events:
+        by_note.setdefault(event[1], []).append(event)
+    
+    compacted = []
+    for note, note_events in by_note.items():
+        note_events.sort(key=lambda event: event[0])
+        current = None
+        for time, _, vel, duration_beats in note_events:
+            if current is not None and current[2] == vel:
+                # Sama taso jatkuu: venytä edellistä nuottia
+                current[3] = max(current[3], time + duration_beats - current[0])
+                continue
+            if current is not None:
+                compacted.append(tuple(current))
+            current = [time, note, vel, duration_beats]
+        compacted.append(tuple(current))
+    
+    compacted.sort(key=lambda event: event[0])
+    return compacted
+
+def write_fade_midi(filename, events, channel=0):
+    """
+    Kirjoittaa fade-tapahtumat MIDI-tiedostoon
+
+    Reititetyissä tapahtumissa (5. kenttä) on oma MIDI-kanava, muuten channel.
+    """
+    mf = MIDIFile(1)
+    track = 0
+    mf.addTempo(track, 0, 120)  # 120 BPM
+    
+    for event in events:
+        time, note, vel, duration_beats = event[:4]
+        mf.addNote(track, event[4] if len(event) > 4 else channel, note, time, duration_beats, vel)
 
     # Kirjoita tiedosto
     with open(filename, "wb") as output_file:
@@ -49,6 +326,501 @@ def create_fade_midi(filename, notes, velocities, duration, is_fade_in, steps=20
     
     return os.path.abspath(filename)
 
+def encode_variable_length(value):
+    """
+    Koodaa SMF:n muuttuvapituisen luvun (delta-aika)
+    """
+    buffer = [value & 0x7F]
+    value >>= 7
+    while value:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(buffer))
+
+def write_scene_setter_midi(filename, events, channel=0):
+    """
+    Kirjoittaa fade-tapahtumat tiivinä SMF-tiedostona (scene_setter-profiili)
+
+    - Vain note on -viestit: välillisiä note offeja ei kirjoiteta
+    - Running status: status-tavu kirjoitetaan vain kerran
+    - Nuotin kesto ohitetaan, taso pysyy kunnes seuraava note on muuttaa sen
+    - Reititetyissä tapahtumissa (5. kenttä) on oma MIDI-kanava, muuten channel
+    """
+    track = bytearray()
+    
+    # Tempo 120 BPM (500000 µs/beat)
+    track += b'\x00\xff\x51\x03' + (500000).to_bytes(3, 'big')
+    
+    running_status = None
+    previous_tick = 0
+    
+    for event in sorted(events, key=lambda event: event[0]):
+        time, note, vel = event[:3]
+        status = 0x90 | (event[4] if len(event) > 4 else channel)
+        tick = int(round(time * TICKS_PER_BEAT))
+        track += encode_variable_length(tick - previous_tick)
+        previous_tick = tick
+        
+        if status != running_status:
+            track.append(status)
+            running_status = status
+        track += bytes((note & 0x7F, vel & 0x7F))
+    
+    # End of track
+    track += b'\x00\xff\x2f\x00'
+    
+    with open(filename, "wb") as output_file:
+        output_file.write(b'MThd' + struct.pack('>LHHH', 6, 0, 1, TICKS_PER_BEAT))
+        output_file.write(b'MTrk' + struct.pack('>L', len(track)))
+        output_file.write(track)
+    
+    return os.path.abspath(filename)
+
+def write_fade_file(filename, events, profile=PROFILE_COMPATIBLE):
+    """
+    Kirjoittaa fade-tiedoston valitulla tulostusprofiililla
+    """
+    if profile == PROFILE_SCENE_SETTER:
+        return write_scene_setter_midi(filename, events)
+    return write_fade_midi(filename, events)
+
+def write_addressed_fade_files(filename, events, profile=PROFILE_COMPATIBLE, addressing=None):
+    """
+    Kirjoittaa fade-tapahtumat MIDI-osoituksen mukaan (midi_addressing)
+
+    Jokaiselle portille oma tiedosto (port_filename), myös tyhjä, jotta
+    jokaisella cuella on sama tiedostojoukko. Ilman osoitusta = write_fade_file.
+    Palauttaa polut porttijärjestyksessä.
+    """
+    if addressing is None:
+        return [write_fade_file(filename, events, profile)]
+    
+    routed = addressing.route(events)
+    return [write_fade_file(port_filename(filename, port), routed.get(port, []), profile)
+            for port in range(addressing.ports)]
+
+def create_fade_midi(filename, notes, velocities, duration, is_fade_in, steps=20, addressing=None):
+    """
+    Luo fade-in tai fade-out MIDI-tiedoston
+
+    addressing: midi_addressing-osoitus (tai sen asetukset) - kanavat yli 58
+    jaetaan MIDI-kanaville/porteille, portti 0 = filename
+    """
+    events = build_fade_events(notes, velocities, duration, is_fade_in, steps)
+    if addressing is None:
+        return write_fade_midi(filename, events)
+    return write_addressed_fade_files(filename, events, PROFILE_COMPATIBLE, addressing_from_spec(addressing))[0]
+
+def wire_messages(events, profile=PROFILE_COMPATIBLE):
+    """
+    Palauttaa väylälle lähtevät viestit listana (aika_sekunteina, tavut)
+    - compatible: jokainen nuotti = note on alussa + note off lopussa
+    - scene_setter: vain note on, running statuksella 2 tavua (ensimmäinen 3)
+    """
+    messages = []
+    if profile == PROFILE_SCENE_SETTER:
+        # Reititetyissä tapahtumissa (5. kenttä = MIDI-kanava) status vaihtuu kanavan vaihtuessa
+        previous_channel = None
+        for event in sorted(events, key=lambda event: event[0]):
+            channel = event[4] if len(event) > 4 else 0
+            size = RUNNING_STATUS_BYTES if channel == previous_channel else NOTE_MESSAGE_BYTES
+            messages.append((event[0] * SECONDS_PER_BEAT, size))
+            previous_channel = channel
+        return messages
+    
+    for event in events:
+        time, duration_beats = event[0], event[3]
+        messages.append((time * SECONDS_PER_BEAT, NOTE_MESSAGE_BYTES))
+        messages.append(((time + duration_beats) * SECONDS_PER_BEAT, NOTE_MESSAGE_BYTES))
+    messages.sort()
+    return messages
+
+def peak_bytes_per_second(events, window=BANDWIDTH_WINDOW_SECONDS, profile=PROFILE_COMPATIBLE,
+                          addressing=None):
+    """
+    Laskee fade-tiedoston huippukaistan (tavua/s) liukuvalla aikaikkunalla
+
+    addressing: usean portin osoituksella jokaisella portilla on oma väylä,
+    joten palautetaan kuormitetuimman portin huippu. Usealla MIDI-kanavalla
+    tapahtumat reititetään aina, jotta running status katkeaa kanavan vaihtuessa.
+    """
+    if addressing is not None and (addressing.ports > 1 or addressing.midi_channels > 1):
+        return max((peak_bytes_per_second(port_events, window, profile)
+                    for port_events in addressing.route(events).values()), default=0)
+    
+    messages = wire_messages(events, profile)
+    peak_bytes = 0
+    window_bytes = 0
+    window_start = 0
+    
+    for time, size in messages:
+        window_bytes += size
+        # Poista ikkunan ulkopuolelle jääneet viestit
+        while messages[window_start][0] <= time - window + 1e-9:
+            window_bytes -= messages[window_start][1]
+            window_start += 1
+        peak_bytes = max(peak_bytes, window_bytes)
+    
+    return peak_bytes / window
+
+def fit_events_to_budget(build_events, steps, budget, compact=True, profile=PROFILE_COMPATIBLE,
+                         addressing=None):
+    """
+    Sovittaa tapahtumat MIDI-väylän kaistabudjettiin
+
+    build_events(steps, stagger) laskee tapahtumat (fade tai crossfade)
+    1. Porrastaa kanavat step-välin sisään (purskeet tasoittuvat, steppejä ei menetetä)
+    2. Hakee suurimman step-määrän (vähintään MIN_BUDGET_STEPS) joka mahtuu budjettiin
+    3. Harventaa yhteen tasomuutokseen per kanavaa jos sekään ei riitä;
+       jos budjetti ylittyy silti, adjustments sisältää 'over_budget'
+    compact: poista toistuvat velocityt ennen kaistan mittausta (compact_fade_events)
+    profile: tulostusprofiili, vaikuttaa väylälle lähteviin tavuihin
+    addressing: MIDI-osoitus - budjetti on porttikohtainen
+    Palauttaa (events, steps, peak_bytes_per_second, adjustments)
+    """
+    def build(steps, stagger=0.0):
+        events = build_events(steps, stagger)
+        return compact_fade_events(events) if compact else events
+    
+    events = build(steps)
+    peak = peak_bytes_per_second(events, profile=profile, addressing=addressing)
+    adjustments = []
+    
+    if not budget or peak <= budget:
+        return events, steps, peak, adjustments
+    
+    # 1. Porrasta kanavat
+    stagger = 1.0
+    events = build(steps, stagger)
+    peak = peak_bytes_per_second(events, profile=profile, addressing=addressing)
+    adjustments.append('stagger')
+    
+    if peak <= budget:
+        return events, steps, peak, adjustments
+    
+    # 2. Suurin step-määrä joka mahtuu budjettiin, askel kerrallaan alaspäin
+    #    (huippu ei laske tasaisesti steppien mukana - suhteellinen arvio tai
+    #    binäärihaku voi ohittaa suuremman sopivan määrän)
+    original_steps = steps
+    fitted = None
+    for candidate_steps in range(steps - 1, MIN_BUDGET_STEPS - 1, -1):
+        candidate = build(candidate_steps, stagger)
+        candidate_peak = peak_bytes_per_second(candidate, profile=profile, addressing=addressing)
+        if candidate_peak <= budget:
+            fitted = (candidate, candidate_steps, candidate_peak)
+            break
+    
+    if fitted is not None:
+        events, steps, peak = fitted
+    else:
+        # 3. Harvenna: yksi tasomuutos per kanava, porrastettuna koko fade:n yli
+        steps = 1
+        events = build(steps, stagger)
+        peak = peak_bytes_per_second(events, profile=profile, addressing=addressing)
+    
+    if steps != original_steps:
+        adjustments.append(f'steps {original_steps}->{steps}')
+    if fitted is None:
+        adjustments.append('thinned')
+    if peak > budget:
+        # Ei mahdu edes harvennettuna - kutsuja näkee ylityksen (over_budget)
+        adjustments.append('over_budget')
+    
+    return events, steps, peak, adjustments
+
+def fit_fade_to_budget(notes, velocities, duration, is_fade_in, steps, budget, compact=True,
+                       profile=PROFILE_COMPATIBLE, adaptive=None, addressing=None):
+    """
+    Sovittaa fade-in/fade-out tapahtumat kaistabudjettiin (ks. fit_events_to_budget)
+
+    adaptive: adaptive_envelope()-asetukset - stepit valitaan havaitun kirkkauden
+    mukaan ja steps ohitetaan (enintään kesto / max_step_ms, budjetti voi vähentää)
+    """
+    if adaptive:
+        def build(steps, stagger):
+            return build_adaptive_fade_events(notes, velocities, duration, is_fade_in, steps, stagger, **adaptive)
+        limit = adaptive_step_limit(duration, adaptive['max_step_seconds'])
+        return fit_events_to_budget(build, limit, budget, compact, profile, addressing)
+    
+    def build(steps, stagger):
+        return build_fade_events(notes, velocities, duration, is_fade_in, steps, stagger)
+    
+    return fit_events_to_budget(build, steps, budget, compact, profile, addressing)
+
+def fit_crossfade_to_budget(from_channels, to_channels, duration, steps, budget, compact=True,
+                            profile=PROFILE_COMPATIBLE, adaptive=None, addressing=None):
+    """
+    Sovittaa crossfade-tapahtumat kaistabudjettiin (ks. fit_events_to_budget)
+    """
+    notes, from_velocities, to_velocities = crossfade_channels(from_channels, to_channels)
+    
+    if adaptive:
+        def build(steps, stagger):
+            return build_adaptive_crossfade_events(notes, from_velocities, to_velocities, duration,
+                                                   steps, stagger, **adaptive)
+        limit = adaptive_step_limit(duration, adaptive['max_step_seconds'])
+        return fit_events_to_budget(build, limit, budget, compact, profile, addressing)
+    
+    def build(steps, stagger):
+        return build_crossfade_events(notes, from_velocities, to_velocities, duration, steps, stagger)
+    
+    return fit_events_to_budget(build, steps, budget, compact, profile, addressing)
+
+def fade_cache_key(*parts):
+    """
+    Välimuistiavain fade-tiedostolle: kaikki tiedoston sisältöön vaikuttavat asetukset
+    """
+    payload = json.dumps([FADE_CACHE_VERSION] + list(parts), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+def cached_fade_file(cache_dir, key, filepath, profile, build, addressing=None):
+    """
+    Kirjoittaa fade-tiedoston välimuistin kautta
+
+    build() laskee (events, steps, peak, adjustments) - kutsutaan vain jos
+    avainta ei löydy välimuistista. Välimuistissa tiedosto + tilastot (.json),
+    tilastot kirjoitetaan viimeisenä joten niiden olemassaolo = valmis tiedosto.
+    addressing: usean portin osoituksella jokainen porttitiedosto (port_filename)
+    Palauttaa (polku, tilastot, osuma) - polku = portin 0 tiedosto
+    """
+    ports = range(addressing.ports) if addressing is not None else [0]
+    
+    if cache_dir:
+        cached_midi = os.path.join(cache_dir, key + '.mid')
+        cached_info = os.path.join(cache_dir, key + '.json')
+        if os.path.exists(cached_info) and os.path.exists(cached_midi):
+            with open(cached_info, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            for port in ports:
+                shutil.copyfile(port_filename(cached_midi, port), port_filename(filepath, port))
+            return os.path.abspath(filepath), info, True
+    
+    events, steps, peak, adjustments = build()
+    path = write_addressed_fade_files(filepath, events, profile, addressing)[0]
+    info = {
+        'steps': steps,
+        'peak': peak,
+        'adjustments': adjustments,
+        'events': len(events),
+        'longest_step_ms': round(longest_step_seconds(events) * 1000, 1)
+    }
+    
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Kopioi (ei linkitä): myöhempi kirjoitus output-tiedostoon ei saa muuttaa välimuistia
+        for port in ports:
+            cached_port = port_filename(cached_midi, port)
+            shutil.copyfile(port_filename(path, port), cached_port + '.tmp')
+            os.replace(cached_port + '.tmp', cached_port)
+        with open(cached_info + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        os.replace(cached_info + '.tmp', cached_info)
+    
+    return path, info, False
+
+def crossfade_pairs(data):
+    """
+    Palauttaa crossfade-parit (from_nimi, to_nimi)
+
+    - crossfade_pairs: eksplisiittinen lista [["A", "B"], ...]
+    - muuten peräkkäiset kohtaukset esityksen järjestyksessä
+      (crossfades: false poistaa automaattiset parit käytöstä)
+    """
+    if 'crossfade_pairs' in data:
+        return [tuple(pair) for pair in data['crossfade_pairs']]
+    if not data.get('crossfades', True):
+        return []
+    names = [scene['name'] for scene in data['scenes']]
+    return list(zip(names, names[1:]))
+
+def generate(data):
+    """
+    Luo kohtausten MIDI-tiedostot ja palauttaa tulokset sanakirjana
+
+    Sama kuin komentorivikäyttö, mutta kutsuttavissa samasta prosessista
+    (palvelin, Blender-vienti) ilman uuden Python-tulkin käynnistystä.
+    Virheet nostetaan poikkeuksina.
+    """
+    # Hae output-hakemisto
+    output_dir = data.get('outputDir', 'generated_midi')
+    
+    # Varmista että output-hakemisto on olemassa
+    os.makedirs(output_dir, exist_ok=True)
+    
+    results = []
+    crossfades = []
+    scene_settings = {}
+    
+    # MIDI-väylän kaistabudjetti (tavua/s), 0 tai None = ei rajoitusta
+    default_budget = data.get('midi_budget_bytes_per_second', MIDI_WIRE_BYTES_PER_SECOND)
+    
+    # Toistuvien velocity-steppien poisto (oletuksena päällä)
+    default_compact = data.get('compact_envelopes', True)
+    
+    # Tulostusprofiili: compatible (oletus) tai scene_setter
+    default_profile = data.get('output_profile', PROFILE_COMPATIBLE)
+    
+    # Adaptiivinen steppaus (oletuksena pois: kiinteä steps-määrä)
+    default_adaptive = data.get('adaptive_steps', False)
+    
+    # Jaettu fade-välimuisti (tyhjä = ei välimuistia)
+    cache_dir = data.get('fade_cache_dir')
+    cache_hits = 0
+    
+    # MIDI-osoitus (midi_addressing): ilman asetusta nuotti = 69 + kanava, kanava 0
+    addressing = addressing_from_spec(data['addressing']) if data.get('addressing') else None
+    addressing_key = addressing.to_dict() if addressing else None
+    for scene in data['scenes']:
+        for channel in scene['channels']:
+            if addressing is not None:
+                addressing.address(channel)  # Nostaa ValueErrorin jos kanava ei mahdu
+            elif 69 + int(channel) > 127:
+                raise ValueError(f"Kanava {channel} kohtauksessa {scene['name']} ylittää nuotin 127 "
+                                 f"- käytä addressing-asetusta (midi_addressing)")
+    if addressing is not None:
+        # Tuonti kääntää osoitteet takaisin kanaviksi tämän tiedoston avulla
+        with open(os.path.join(output_dir, 'addressing.json'), 'w', encoding='utf-8') as f:
+            json.dump(addressing_key, f, indent=2)
+    
+    for scene in data['scenes']:
+        scene_name = scene['name']
+        channels = scene['channels']  # {channel: velocity}
+        fade_in_duration = scene['fade_in_duration']
+        fade_out_duration = scene['fade_out_duration'] 
+        steps = scene.get('steps', 20)
+        budget = scene.get('midi_budget_bytes_per_second', default_budget)
+        compact = scene.get('compact_envelopes', default_compact)
+        profile = scene.get('output_profile', default_profile)
+        if profile not in OUTPUT_PROFILES:
+            raise ValueError(f"Tuntematon output_profile '{profile}' kohtauksessa {scene_name}")
+        adaptive = adaptive_envelope(dict(data, **scene), default_adaptive)
+        
+        scene_settings[scene_name] = {
+            'channels': channels,
+            'fade_in_duration': fade_in_duration,
+            'steps': steps,
+            'budget': budget,
+            'compact': compact,
+            'profile': profile,
+            'adaptive': adaptive
+        }
+        
+        # Muunna kanavat MIDI-nuoteiksi: nuotti = 69 + kanava
+        notes = [69 + int(channel) for channel in channels.keys()]
+        velocities = list(channels.values())
+        
+        # Luo tiedostonimet output-hakemistoon
+        fade_in_filename = f"{scene_name}_fade_in.mid"
+        fade_out_filename = f"{scene_name}_fade_out.mid"
+        
+        fade_in_filepath = os.path.join(output_dir, fade_in_filename)
+        fade_out_filepath = os.path.join(output_dir, fade_out_filename)
+        
+        # Laske fade-tapahtumat kaistabudjetin puitteissa ja luo MIDI-tiedostot
+        fade_in_path, fade_in, fade_in_hit = cached_fade_file(
+            cache_dir,
+            fade_cache_key('fade', notes, velocities, fade_in_duration, True, steps, budget, compact, profile,
+                           adaptive, addressing_key),
+            fade_in_filepath, profile,
+            lambda: fit_fade_to_budget(notes, velocities, fade_in_duration, True, steps, budget,
+                                       compact, profile, adaptive, addressing),
+            addressing)
+        fade_out_path, fade_out, fade_out_hit = cached_fade_file(
+            cache_dir,
+            fade_cache_key('fade', notes, velocities, fade_out_duration, False, steps, budget, compact, profile,
+                           adaptive, addressing_key),
+            fade_out_filepath, profile,
+            lambda: fit_fade_to_budget(notes, velocities, fade_out_duration, False, steps, budget,
+                                       compact, profile, adaptive, addressing),
+            addressing)
+        cache_hits += fade_in_hit + fade_out_hit
+        
+        results.append({
+            'scene': scene_name,
+            'fade_in_file': fade_in_filename,
+            'fade_out_file': fade_out_filename,
+            'fade_in_path': fade_in_path,
+            'fade_out_path': fade_out_path,
+            'channels_count': len(channels),
+            'output_profile': profile,
+            'steps': steps,
+            'step_mode': 'adaptive' if adaptive else 'fixed',
+            'fade_in_steps': fade_in['steps'],
+            'fade_out_steps': fade_out['steps'],
+            'fade_in_events': fade_in['events'],
+            'fade_out_events': fade_out['events'],
+            'fade_in_longest_step_ms': fade_in['longest_step_ms'],
+            'fade_out_longest_step_ms': fade_out['longest_step_ms'],
+            'peak_bytes_per_second': round(max(fade_in['peak'], fade_out['peak']), 1),
+            'fade_in_peak_bytes_per_second': round(fade_in['peak'], 1),
+            'fade_out_peak_bytes_per_second': round(fade_out['peak'], 1),
+            'budget_adjustments': {
+                'fade_in': fade_in['adjustments'],
+                'fade_out': fade_out['adjustments']
+            },
+            'over_budget': 'over_budget' in fade_in['adjustments'] + fade_out['adjustments']
+        })
+        if addressing is not None and addressing.ports > 1:
+            results[-1]['fade_in_port_files'] = [port_filename(fade_in_filename, port) for port in range(addressing.ports)]
+            results[-1]['fade_out_port_files'] = [port_filename(fade_out_filename, port) for port in range(addressing.ports)]
+    
+    # Crossfadet: lähtökohtauksen tasoista suoraan kohdekohtauksen tasoihin
+    for from_name, to_name in crossfade_pairs(data):
+        if from_name not in scene_settings or to_name not in scene_settings:
+            raise ValueError(f"Crossfade-paria {from_name} -> {to_name} ei löydy kohtauksista")
+        
+        source = scene_settings[from_name]
+        target = scene_settings[to_name]
+        
+        # Kesto, stepit ja profiili kohdekohtauksen fade-in:n mukaan
+        crossfade_filename = f"{from_name}_to_{to_name}_crossfade.mid"
+        crossfade_path, crossfade, crossfade_hit = cached_fade_file(
+            cache_dir,
+            fade_cache_key('crossfade', list(source['channels'].items()), list(target['channels'].items()),
+                           target['fade_in_duration'], target['steps'], target['budget'],
+                           target['compact'], target['profile'], target['adaptive'], addressing_key),
+            os.path.join(output_dir, crossfade_filename), target['profile'],
+            lambda: fit_crossfade_to_budget(
+                source['channels'], target['channels'], target['fade_in_duration'],
+                target['steps'], target['budget'], target['compact'], target['profile'], target['adaptive'],
+                addressing),
+            addressing)
+        cache_hits += crossfade_hit
+        
+        changed_channels = sum(
+            1 for channel in set(source['channels']) | set(target['channels'])
+            if source['channels'].get(channel, 0) != target['channels'].get(channel, 0))
+        
+        crossfades.append({
+            'from_scene': from_name,
+            'to_scene': to_name,
+            'file': crossfade_filename,
+            'path': crossfade_path,
+            'channels_changed': changed_channels,
+            'steps': crossfade['steps'],
+            'events': crossfade['events'],
+            'longest_step_ms': crossfade['longest_step_ms'],
+            'peak_bytes_per_second': round(crossfade['peak'], 1),
+            'budget_adjustments': crossfade['adjustments'],
+            'over_budget': 'over_budget' in crossfade['adjustments']
+        })
+        if addressing is not None and addressing.ports > 1:
+            crossfades[-1]['port_files'] = [port_filename(crossfade_filename, port) for port in range(addressing.ports)]
+    
+    # Palauta tulokset (lisää output_directory tietoihin)
+    return {
+        'success': True,
+        'output_directory': os.path.abspath(output_dir),
+        'midi_budget_bytes_per_second': default_budget,
+        'peak_bytes_per_second': max((r['peak_bytes_per_second'] for r in results), default=0),
+        'fade_cache_hits': cache_hits,
+        'over_budget': [r['scene'] for r in results if r['over_budget']] +
+                       [f"{c['from_scene']} -> {c['to_scene']}" for c in crossfades if c['over_budget']],
+        'addressing': addressing_key,
+        'results': results,
+        'crossfades': crossfades
+    }
+
 def main():
     """
     Pääfunktio joka lukee JSON-datan stdin:stä ja luo MIDI-tiedostot
@@ -58,54 +830,8 @@ def main():
         input_data = sys.stdin.read()
         data = json.loads(input_data)
         
-        # Hae output-hakemisto
-        output_dir = data.get('outputDir', 'generated_midi')
-        
-        # Varmista että output-hakemisto on olemassa
-        os.makedirs(output_dir, exist_ok=True)
-        
-        results = []
-        
-        for scene in data['scenes']:
-            scene_name = scene['name']
-            channels = scene['channels']  # {channel: velocity}
-            fade_in_duration = scene['fade_in_duration']
-            fade_out_duration = scene['fade_out_duration'] 
-            steps = scene.get('steps', 20)
-            
-            # Muunna kanavat MIDI-nuoteiksi: nuotti = 69 + kanava
-            notes = [69 + int(channel) for channel in channels.keys()]
-            velocities = list(channels.values())
-            
-            # Luo tiedostonimet output-hakemistoon
-            fade_in_filename = f"{scene_name}_fade_in.mid"
-            fade_out_filename = f"{scene_name}_fade_out.mid"
-            
-            fade_in_filepath = os.path.join(output_dir, fade_in_filename)
-            fade_out_filepath = os.path.join(output_dir, fade_out_filename)
-            
-            # Luo MIDI-tiedostot
-            fade_in_path = create_fade_midi(fade_in_filepath, notes, velocities, 
-                                          fade_in_duration, True, steps)
-            fade_out_path = create_fade_midi(fade_out_filepath, notes, velocities,
-                                           fade_out_duration, False, steps)
-            
-            results.append({
-                'scene': scene_name,
-                'fade_in_file': fade_in_filename,
-                'fade_out_file': fade_out_filename,
-                'fade_in_path': fade_in_path,
-                'fade_out_path': fade_out_path,
-                'channels_count': len(channels),
-                'steps': steps
-            })
-        
-        # Palauta tulokset JSON-muodossa (lisää output_directory tietoihin)
-        print(json.dumps({
-            'success': True,
-            'output_directory': os.path.abspath(output_dir),
-            'results': results
-        }, indent=2))
+        # Palauta tulokset JSON-muodossa
+        print(json.dumps(generate(data), indent=2))
         
     except Exception as e:
         print(json.dumps({
@@ -12,6 +12,8 @@ import mimetypes
 from pathlib import Path
 import datetime
 
+from scene_store import load_presets, save_presets
+
 PORT = 8000
 SCRIPT_DIR = Path(__file__).parent
 MIDI_OUTPUT_DIR = SCRIPT_DIR / "generated_midi"
@@ -56,11 +58,8 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            if PRESETS_FILE.exists():
-                with open(PRESETS_FILE, 'r', encoding='utf-8') as f:
-                    self.wfile.write(f.read().encode('utf-8'))
-            else:
-                self.wfile.write(json.dumps([]).encode('utf-8'))
+            # Aina listamuoto, myös varastomuotoisesta tiedostosta (scene_store)
+            self.wfile.write(json.dumps(load_presets(PRESETS_FILE), ensure_ascii=False).encode('utf-8'))
                 
         else:
             # Staattinen tiedosto
@@ -188,10 +187,7 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
                 data = json.loads(post_data.decode('utf-8'))
                 
                 # Lataa olemassa olevat esitykset
-                presets = []
-                if PRESETS_FILE.exists():
-                    with open(PRESETS_FILE, 'r', encoding='utf-8') as f:
-                        presets = json.load(f)
+                presets = load_presets(PRESETS_FILE)
                 
                 # Lisää aikaleima
                 data['saved_at'] = datetime.datetime.now().isoformat()
@@ -213,9 +209,8 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
                     presets.append(data)
                     print(f"➕ Lisätty uusi esitys: {preset_name}")
                 
-                # Tallenna takaisin
-                with open(PRESETS_FILE, 'w', encoding='utf-8') as f:
-                    json.dump(presets, f, indent=2, ensure_ascii=False)
+                # Tallenna takaisin samassa muodossa (lista tai kohtausvarasto)
+                save_presets(PRESETS_FILE, presets)
                 
                 response = {'success': True, 'message': 'Esitys tallennettu'}
                 self.send_response(200)
@@ -272,11 +267,8 @@ class MIDIHandler(http.server.BaseHTTPRequestHandler):
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            if PRESETS_FILE.exists():
-                with open(PRESETS_FILE, 'r', encoding='utf-8') as f:
-                    self.wfile.write(f.read().encode('utf-8'))
-            else:
-                self.wfile.write(json.dumps([]).encode('utf-8'))
+            # Aina listamuoto, myös varastomuotoisesta tiedostosta (scene_store)
+            self.wfile.write(json.dumps(load_presets(PRESETS_FILE), ensure_ascii=False).encode('utf-8'))
                 
         else:
             # Staattinen tiedosto